@@ -1,20 +1,21 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import random
+from panels import chart, data_provider, debug_sidebar, panel
 
 # Set page config
 st.set_page_config(page_title="API Platform Dashboard", layout="wide")
 
-# Function to generate random data
-def random_metric(min_val, max_val):
-    return random.randint(min_val, max_val)
+provider = data_provider()
 
 # Function to calculate and format ratio
 def calculate_ratio(part, whole):
-    ratio = part / whole
+    ratio = part / whole if whole else 0
     return f"{part} / {whole} ({ratio:.2%})"
 
+# Function to format a possibly missing number
+def format_value(value, unit="", precision=0):
+    return "n/a" if value is None else f"{value:,.{precision}f}{unit}"
+
 # Sidebar for navigation with larger font
 st.sidebar.markdown("<h1 style='font-size: 30px;'></h1>", unsafe_allow_html=True)
 
@@ -59,178 +60,189 @@ def display_metrics(metrics_list):
         with cols[i % 3]:
             st.metric(metric['label'], metric['value'])
 
-# Page content
-if page == "System Performance and Reliability":
-    st.header("System Performance and Reliability")
-    
-    uptime = random_metric(99, 100)
-    total_requests = random_metric(1000000, 10000000)
-    total_data_served = random_metric(100, 1000)
-    total_data_ingested = random_metric(50, 500)
-    
+# Panel data, refreshed in the background by the shared scheduler
+def load_performance_metrics():
+    totals = provider.request_totals(days=30)
+    p50, p95, p99 = provider.latency_percentiles(days=30)
+    return [
+        {"label": "Platform Uptime", "value": format_value(provider.uptime(days=30), "%", 2)},
+        {"label": "Total Requests Served", "value": f"{totals['requests']:,}"},
+        {"label": "Total Data Served", "value": f"{totals['bytes_served'] / 1e9:.2f} GB"},
+        {"label": "Total Data Ingested", "value": f"{totals['bytes_ingested'] / 1e9:.2f} GB"},
+        {"label": "p50 Response Time", "value": format_value(p50, " ms")},
+        {"label": "p95 Response Time", "value": format_value(p95, " ms")},
+        {"label": "p99 Response Time", "value": format_value(p99, " ms")},
+    ]
+
+def load_errors():
+    return pd.DataFrame(provider.heavy_hitters("errors", days=30, limit=5), columns=['Error', 'Frequency', 'Max Overcount'])
+
+def load_success_rates():
+    return pd.DataFrame(provider.success_rate_by("subgraph", days=30), columns=['Subgraph', 'Success Rate (%)'])
+
+def load_success_rate_series():
+    rows = pd.DataFrame(provider.success_rate_series("subgraph", days=30),
+                        columns=['Time', 'Subgraph', 'Success Rate (%)'])
+    rows['Time'] = pd.to_datetime(rows['Time'], unit='s')
+    return rows
+
+def load_source_latency():
+    return pd.DataFrame(provider.average_latency_by("data_source", days=30), columns=['Source', 'Latency (ms)'])
+
+def load_productivity_metrics():
+    activity = provider.activity_counts(days=30)
+    total_devs, active_devs = provider.developers(days=30)
+    return [
+        {"label": "Resolved/Open Comments Ratio", "value": calculate_ratio(activity["resolved_comment"], activity["comment"])},
+        {"label": "Developers Engaging on Portal", "value": calculate_ratio(active_devs, total_devs)},
+        {"label": "Unique On-Demand Compositions", "value": provider.distinct_objects("composition", days=30)},
+    ]
+
+def load_top_objects():
+    return pd.DataFrame(provider.activity_top("comment", "object", days=30, limit=5), columns=['Object', 'Comments'])
+
+def load_activity_leaders():
+    # Subgraph with most comments, subgraph with most builds, top team
+    return [provider.activity_top(kind, column, days=30, limit=1)
+            for kind, column in (("comment", "subgraph"), ("build", "subgraph"), ("change", "team"))]
+
+def load_dev_subgraph():
+    return pd.DataFrame(provider.developers_by("subgraph"), columns=['Subgraph', 'Developers'])
+
+def load_top_devs():
+    return pd.DataFrame(provider.activity_top_per_group("change", "subgraph", "developer", days=30, limit=3),
+                        columns=['Subgraph', 'Developer', 'Contributions'])
+
+def load_changes_metrics():
+    activity = provider.activity_counts(days=30)
+    total_changes = activity["change"] + activity["auto_change"]
+    return [
+        {"label": "Automatic Model Changes without API Breaks", "value": calculate_ratio(activity["auto_change"], total_changes)},
+        {"label": "Deprecated API Endpoints", "value": provider.deprecated_endpoints(days=30)},
+        {"label": "New Builds Applied (Last Week)", "value": provider.activity_counts(days=7)["build"]},
+        {"label": "Build Validations Prompted", "value": activity["validation"]},
+    ]
+
+def load_deprecated_endpoints():
+    return pd.DataFrame(provider.heavy_hitters("deprecated_endpoints", days=30, limit=5),
+                        columns=['Endpoint', 'Usage', 'Max Overcount'])
+
+def load_security():
+    summary = provider.model_summary()
+    role_count, max_perm_role = provider.roles()
     metrics = [
-        {"label": "Platform Uptime", "value": f"{uptime}%"},
-        {"label": "Total Requests Served", "value": f"{total_requests:,}"},
-        {"label": "Total Data Served", "value": f"{total_data_served} GB"},
-        {"label": "Total Data Ingested", "value": f"{total_data_ingested} GB"},
-        {"label": "p50 Response Time", "value": f"{random_metric(50, 100)} ms"},
-        {"label": "p95 Response Time", "value": f"{random_metric(100, 200)} ms"},
-        {"label": "p99 Response Time", "value": f"{random_metric(200, 500)} ms"},
+        {"label": "Models Protected by Authorization Rules", "value": calculate_ratio(summary["protected"], summary["models"])},
+        {"label": "Well Documented Models", "value": calculate_ratio(summary["documented"], summary["models"])},
+        {"label": "Number of Roles", "value": role_count},
     ]
+    return metrics, summary["public"], max_perm_role
+
+def load_schema_metrics():
+    summary = provider.model_summary()
+    total_models = summary["models"]
+    return [
+        {"label": "Entities Delivered", "value": total_models},
+        {"label": "Methods Delivered", "value": summary["commands"]},
+        {"label": "Introspected Models", "value": calculate_ratio(summary["introspected"], total_models)},
+        {"label": "Models with Relationships", "value": calculate_ratio(summary["with_relationships"], total_models)},
+        {"label": "Queries Across Subgraphs", "value": f"{provider.request_totals(days=30)['cross_subgraph']:,}"},
+    ]
+
+def load_top_entities():
+    return pd.DataFrame(provider.heavy_hitters("entities", days=30, limit=10),
+                        columns=['Entity/Method', 'Usage Count', 'Max Overcount'])
+
+def load_top_region():
+    return provider.top_by("region", days=30, limit=1)
+
+# Panel renderers
+def render_activity_leaders(leaders):
+    max_comments_subgraph, max_builds_subgraph, top_team = leaders
+    st.subheader("Subgraph with Max Comments")
+    st.info(f"Subgraph with maximum comments: {max_comments_subgraph[0][0] if max_comments_subgraph else 'n/a'}")
+    st.subheader("Subgraph with Most Builds")
+    st.info(f"Subgraph with most builds: {max_builds_subgraph[0][0] if max_builds_subgraph else 'n/a'}")
+    st.subheader("Top Developer Team")
+    st.info(f"Top Developer Team: {top_team[0][0] if top_team else 'n/a'}")
+
+def render_security(security):
+    metrics, public_models, max_perm_role = security
     display_metrics(metrics)
+    st.subheader("Public Endpoints (No Auth)")
+    if public_models > 0:
+        st.warning(f"Warning: {public_models} public endpoint(s) available without authentication")
+    else:
+        st.success("No public endpoints available without authentication")
+    st.subheader("Role with Maximum Permissions")
+    st.info(f"Role with maximum permissions: {max_perm_role}")
+
+def render_top_region(top_region):
+    st.info(f"Region with most requests: {top_region[0][0] if top_region else 'n/a'}")
+
+# Page content
+if page == "System Performance and Reliability":
+    st.header("System Performance and Reliability")
+    panel("performance_metrics", load_performance_metrics, display_metrics)
     
     st.subheader("Most Common API Errors")
-    errors = pd.DataFrame({
-        'Error': [f'Error_{i}' for i in range(1, 6)],
-        'Frequency': [random_metric(10, 1000) for _ in range(5)]
-    })
-    fig = px.pie(errors, names='Error', values='Frequency', title='Most Common API Errors')
-    st.plotly_chart(fig)
+    panel("errors", load_errors, lambda errors: st.plotly_chart(chart(
+        "pie", errors, names='Error', values='Frequency', title='Most Common API Errors', hover_data=['Max Overcount'])))
     
     st.subheader("Success Rate per Subgraph")
-    subgraphs = pd.DataFrame({
-        'Subgraph': [f'Subgraph_{i}' for i in range(1, 6)],
-        'Success Rate (%)': [random_metric(95, 100) for _ in range(5)]
-    })
-    fig = px.bar(subgraphs, x='Subgraph', y='Success Rate (%)', title='Success Rate per Subgraph')
-    st.plotly_chart(fig)
+    panel("success_rates", load_success_rates, lambda subgraphs: st.plotly_chart(chart(
+        "bar", subgraphs, x='Subgraph', y='Success Rate (%)', title='Success Rate per Subgraph')))
+    
+    st.subheader("Success Rate over Time")
+    panel("success_rate_series", load_success_rate_series, lambda series: st.plotly_chart(chart(
+        "line", series, x='Time', y='Success Rate (%)', color='Subgraph', title='Success Rate per Hour')))
     
     st.subheader("Data Source Latency")
-    sources = pd.DataFrame({
-        'Source': [f'Source_{i}' for i in range(1, 6)],
-        'Latency (ms)': [random_metric(10, 500) for _ in range(5)]
-    })
-    fig = px.bar(sources, x='Source', y='Latency (ms)', title='Data Source Latency')
-    st.plotly_chart(fig)
+    panel("source_latency", load_source_latency, lambda sources: st.plotly_chart(chart(
+        "bar", sources, x='Source', y='Latency (ms)', title='Data Source Latency')))
 
 elif page == "Developer Productivity and Collaboration":
     st.header("Developer Productivity and Collaboration")
-    
-    total_comments = random_metric(500, 2000)
-    resolved_comments = random_metric(400, total_comments)
-    total_devs = random_metric(50, 200)
-    active_devs = random_metric(30, total_devs)
-    
-    metrics = [
-        {"label": "Resolved/Open Comments Ratio", "value": calculate_ratio(resolved_comments, total_comments)},
-        {"label": "Developers Engaging on Portal", "value": calculate_ratio(active_devs, total_devs)},
-        {"label": "Unique On-Demand Compositions", "value": random_metric(50, 200)},
-    ]
-    display_metrics(metrics)
+    panel("productivity_metrics", load_productivity_metrics, display_metrics)
     
     st.subheader("Top 5 Metadata Objects with Comments")
-    top_objects = pd.DataFrame({
-        'Object': [f'Object_{i}' for i in range(1, 6)],
-        'Comments': [random_metric(10, 100) for _ in range(5)]
-    })
-    fig = px.bar(top_objects, x='Object', y='Comments', title='Top 5 Metadata Objects with Comments')
-    st.plotly_chart(fig)
+    panel("top_objects", load_top_objects, lambda top_objects: st.plotly_chart(chart(
+        "bar", top_objects, x='Object', y='Comments', title='Top 5 Metadata Objects with Comments')))
     
-    st.subheader("Subgraph with Max Comments")
-    max_comments_subgraph = f"Subgraph_{random_metric(1, 5)}"
-    st.info(f"Subgraph with maximum comments: {max_comments_subgraph}")
-    
-    st.subheader("Subgraph with Most Builds")
-    max_builds_subgraph = f"Subgraph_{random_metric(1, 5)}"
-    st.info(f"Subgraph with most builds: {max_builds_subgraph}")
+    panel("activity_leaders", load_activity_leaders, render_activity_leaders)
     
     st.subheader("Developers per Subgraph")
-    dev_subgraph = pd.DataFrame({
-        'Subgraph': [f'Subgraph_{i}' for i in range(1, 6)],
-        'Developers': [random_metric(5, 30) for _ in range(5)]
-    })
-    fig = px.bar(dev_subgraph, x='Subgraph', y='Developers', title='Developers per Subgraph')
-    st.plotly_chart(fig)
-    
-    st.subheader("Top Developer Team")
-    top_team = f"Team_{random_metric(1, 5)}"
-    st.info(f"Top Developer Team: {top_team}")
+    panel("dev_subgraph", load_dev_subgraph, lambda dev_subgraph: st.plotly_chart(chart(
+        "bar", dev_subgraph, x='Subgraph', y='Developers', title='Developers per Subgraph')))
     
     st.subheader("Top 3 Developers per Subgraph")
-    top_devs = pd.DataFrame({
-        'Subgraph': [f'Subgraph_{i}' for _ in range(3) for i in range(1, 6)],
-        'Developer': [f'Dev_{random_metric(1, 20)}' for _ in range(15)],
-        'Contributions': [random_metric(10, 100) for _ in range(15)]
-    })
-    fig = px.bar(top_devs, x='Developer', y='Contributions', color='Subgraph', title='Top 3 Developers per Subgraph')
-    st.plotly_chart(fig)
+    panel("top_devs", load_top_devs, lambda top_devs: st.plotly_chart(chart(
+        "bar", top_devs, x='Developer', y='Contributions', color='Subgraph', title='Top 3 Developers per Subgraph')))
 
 elif page == "API Changes and Evolution":
     st.header("API Changes and Evolution")
-    
-    total_changes = random_metric(50, 200)
-    auto_changes = random_metric(10, total_changes)
-    
-    metrics = [
-        {"label": "Automatic Model Changes without API Breaks", "value": calculate_ratio(auto_changes, total_changes)},
-        {"label": "Deprecated API Endpoints", "value": random_metric(5, 20)},
-        {"label": "New Builds Applied (Last Week)", "value": random_metric(20, 100)},
-        {"label": "Build Validations Prompted", "value": random_metric(30, 150)},
-    ]
-    display_metrics(metrics)
+    panel("changes_metrics", load_changes_metrics, display_metrics)
     
     st.subheader("Top 5 Deprecated API Endpoints with Maximum Usage")
-    deprecated_endpoints = pd.DataFrame({
-        'Endpoint': [f'Endpoint_{i}' for i in range(1, 6)],
-        'Usage': [random_metric(100, 1000) for _ in range(5)]
-    })
-    fig = px.bar(deprecated_endpoints, x='Endpoint', y='Usage', title='Top 5 Deprecated API Endpoints with Maximum Usage')
-    st.plotly_chart(fig)
+    panel("deprecated_endpoints", load_deprecated_endpoints, lambda deprecated_endpoints: st.plotly_chart(chart(
+        "bar", deprecated_endpoints, x='Endpoint', y='Usage', title='Top 5 Deprecated API Endpoints with Maximum Usage',
+        hover_data=['Max Overcount'])))
 
 elif page == "Security and Governance":
     st.header("Security and Governance")
-    
-    total_models = random_metric(500, 1000)
-    protected_models = random_metric(300, total_models)
-    documented_models = random_metric(200, total_models)
-    public_models = random_metric(0, 5)
-    
-    metrics = [
-        {"label": "Models Protected by Authorization Rules", "value": calculate_ratio(protected_models, total_models)},
-        {"label": "Well Documented Models", "value": calculate_ratio(documented_models, total_models)},
-        {"label": "Number of Roles", "value": random_metric(5, 20)},
-    ]
-    display_metrics(metrics)
-    
-    st.subheader("Public Endpoints (No Auth)")
-    if public_models > 0:
-        st.warning(f"Warning: {public_models} public endpoint(s) available without authentication")
-    else:
-        st.success("No public endpoints available without authentication")
-    
-    st.subheader("Role with Maximum Permissions")
-    max_perm_role = f"Role_{random_metric(1, 5)}"
-    st.info(f"Role with maximum permissions: {max_perm_role}")
+    panel("security", load_security, render_security)
 
 else:  # Schema and Data Management
     st.header("Schema and Data Management")
-    
-    total_entities = random_metric(100, 500)
-    total_methods = random_metric(200, 1000)
-    total_models = random_metric(500, 1000)
-    introspected_models = random_metric(300, total_models)
-    models_with_relationships = random_metric(200, total_models)
-    
-    metrics = [
-        {"label": "Entities Delivered", "value": total_entities},
-        {"label": "Methods Delivered", "value": total_methods},
-        {"label": "Introspected Models", "value": calculate_ratio(introspected_models, total_models)},
-        {"label": "Models with Relationships", "value": calculate_ratio(models_with_relationships, total_models)},
-        {"label": "Queries Across Subgraphs", "value": random_metric(50, 200)},
-    ]
-    display_metrics(metrics)
+    panel("schema_metrics", load_schema_metrics, display_metrics)
     
     st.subheader("Top 10 Entities and Methods")
-    top_10 = pd.DataFrame({
-        'Entity/Method': [f'Item_{i}' for i in range(1, 11)],
-        'Usage Count': [random_metric(1000, 10000) for _ in range(10)]
-    })
-    fig = px.bar(top_10, x='Entity/Method', y='Usage Count', title='Top 10 Entities and Methods')
-    st.plotly_chart(fig)
+    panel("top_entities", load_top_entities, lambda top_10: st.plotly_chart(chart(
+        "bar", top_10, x='Entity/Method', y='Usage Count', title='Top 10 Entities and Methods', hover_data=['Max Overcount'])))
     
     st.subheader("Region with Most Requests")
-    top_region = f"Region_{random_metric(1, 5)}"
-    st.info(f"Region with most requests: {top_region}")
+    panel("top_region", load_top_region, render_top_region)
+
+debug_sidebar()
 
 # Footer
 st.sidebar.markdown("---")
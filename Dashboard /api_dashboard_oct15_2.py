@@ -1,20 +1,24 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-import random
+from panels import chart, data_provider, debug_sidebar, panel
 
 # Set page config
 st.set_page_config(page_title="API Platform Dashboard", layout="wide")
 
-# Function to generate random data
-def random_metric(min_val, max_val):
-    return random.randint(min_val, max_val)
+provider = data_provider()
+
+# Reliability rating from the error/success ratio
+def reliability_rating(ratio):
+    if ratio < 0.01:
+        return "Gold"
+    return "Silver" if ratio < 0.05 else "Bronze"
 
 # Dashboard title
 st.title("API Platform Dashboard")
 
-# Sidebar navigation
+# Sidebar navigation: links to the section anchors, so navigating only
+# scrolls the page instead of rerunning it
 st.sidebar.title("Navigation")
 categories = [
     "Security and Governance",
@@ -24,181 +28,181 @@ categories = [
 ]
 
 for category in categories:
-    if st.sidebar.button(category):
-        st.query_params["section"] = category.lower().replace(" ", "_")
-
-# Get the current section from URL parameters
-current_section = st.query_params.get("section", "")
+    st.sidebar.markdown(f"[{category}](#{category.lower().replace(' ', '_')})")
+
+# Panel data, refreshed in the background by the shared scheduler
+def load_public_endpoints():
+    return provider.model_summary()["public"]
+
+def load_performance():
+    return pd.DataFrame(provider.latency_summary_by("team", days=30),
+                        columns=["Team", "Min Latency", "Median Latency", "Max Latency"])
+
+def load_reliability():
+    return pd.DataFrame(provider.error_ratio_by("team", days=30), columns=["Team", "Error/Success Ratio"])
+
+def load_dev_count():
+    return dict(provider.developers_by("team"))
+
+def load_most_builds():
+    return provider.activity_top("build", "team", days=30, limit=1)
+
+def load_most_changes():
+    return provider.activity_top("change", "team", days=30, limit=1)
+
+def load_top_devs():
+    return pd.DataFrame(provider.activity_top_per_group("change", "team", "developer", days=30, limit=3),
+                        columns=["Team", "Developer", "Commits"])
+
+def load_most_traffic():
+    return provider.top_by("subgraph", days=30, limit=1)
+
+def load_top_models():
+    return pd.DataFrame(provider.heavy_hitters("models", days=30, limit=3),
+                        columns=["Subgraph", "Model", "Requests", "Max Overcount"])
+
+def load_top_fields():
+    return pd.DataFrame(provider.heavy_hitters("fields", days=30, limit=3),
+                        columns=["Subgraph", "Field", "Model", "Requests", "Max Overcount"])
+
+def load_unused_api():
+    return pd.DataFrame(provider.unused_model_percentage(days=30), columns=["Subgraph", "Unused Models (%)"])
+
+def load_deprecated():
+    return provider.deprecated_models()
+
+# Panel renderers
+def render_public_endpoints(public_endpoints):
+    if public_endpoints > 0:
+        st.warning(f"Warning: {public_endpoints} model(s) exposed without auth!")
+        st.markdown("""
+        **How to fix this security issue:**
+        1. Identify the exposed models in your API configuration.
+        2. Implement proper authentication mechanisms:
+           - Use OAuth 2.0 or JWT for token-based authentication.
+           - Set up API keys for simpler use cases.
+        3. Update your API gateway or server configuration to require authentication for these endpoints.
+        4. Test the endpoints to ensure they now require proper authentication.
+        5. Monitor access logs to verify that unauthorized access attempts are blocked.
+        6. Regularly audit your API endpoints to prevent future exposure.
+        """)
+    else:
+        st.success("No models exposed without auth.")
+
+def render_performance(performance_df):
+    st.plotly_chart(chart("bar", performance_df, x="Team", y=["Min Latency", "Median Latency", "Max Latency"],
+                          title="Team Performance (Latency in ms)"))
+
+def render_reliability(reliability_df):
+    st.plotly_chart(chart("bar", reliability_df, x="Team", y="Error/Success Ratio",
+                          title="Team Reliability (Error/Success Ratio)"))
+
+def render_reliability_rating(reliability_df):
+    for team, ratio in zip(reliability_df["Team"], reliability_df["Error/Success Ratio"]):
+        st.text(f"{team}: {reliability_rating(ratio)}")
+
+def render_most_builds(rows):
+    for most_builds_team, most_builds_count in rows:
+        st.info(f"Team with most builds: {most_builds_team} ({most_builds_count} builds)")
+
+def render_most_changes(rows):
+    for most_changes_team, most_changes_count in rows:
+        st.info(f"Team pushing most changes: {most_changes_team} ({most_changes_count} changes)")
+
+def render_top_devs(top_devs_df):
+    st.plotly_chart(chart("bar", top_devs_df, x="Developer", y="Commits", color="Team", facet_col="Team",
+                          labels={"Developer": "Developer", "Commits": "Number of Commits"},
+                          title="Top 3 Developers per Team"))
+
+def render_most_traffic(rows):
+    for most_traffic_subgraph, most_traffic_requests in rows:
+        st.info(f"Subgraph with most traffic: {most_traffic_subgraph} ({most_traffic_requests:,} requests)")
+
+def render_top_models(top_models_df):
+    st.plotly_chart(chart("bar", top_models_df, x="Model", y="Requests", color="Subgraph", facet_col="Subgraph",
+                          labels={"Model": "Model", "Requests": "Number of Requests"},
+                          title="Top 3 Models per Subgraph",
+                          hover_data=["Max Overcount"]))
+
+def render_top_fields(top_fields_df):
+    st.plotly_chart(chart("bar", top_fields_df, x="Field", y="Requests", color="Subgraph", facet_col="Subgraph",
+                          labels={"Field": "Field", "Requests": "Number of Requests"},
+                          title="Top 3 Fields per Subgraph",
+                          hover_data=["Model", "Max Overcount"]))
+
+def render_unused_api(unused_api_df):
+    st.plotly_chart(chart("bar", unused_api_df, x="Subgraph", y="Unused Models (%)",
+                          title="Percentage of Unused Models per Subgraph"))
+
+def render_deprecated(rows):
+    for subgraph, deprecated_objects in rows:
+        st.text(f"{subgraph}: {deprecated_objects} deprecated object(s)")
 
 # Security and Governance
 st.header("1. Security and Governance", anchor="security_and_governance")
-if current_section == "security_and_governance":
-    st.query_params.clear()
 
 # Public endpoint alert
 st.subheader("1.1 Public endpoint alert")
-public_endpoints = random_metric(0, 3)
-if public_endpoints > 0:
-    st.warning(f"Warning: {public_endpoints} model(s) exposed without auth!")
-    st.markdown("""
-    **How to fix this security issue:**
-    1. Identify the exposed models in your API configuration.
-    2. Implement proper authentication mechanisms:
-       - Use OAuth 2.0 or JWT for token-based authentication.
-       - Set up API keys for simpler use cases.
-    3. Update your API gateway or server configuration to require authentication for these endpoints.
-    4. Test the endpoints to ensure they now require proper authentication.
-    5. Monitor access logs to verify that unauthorized access attempts are blocked.
-    6. Regularly audit your API endpoints to prevent future exposure.
-    """)
-else:
-    st.success("No models exposed without auth.")
+panel("public_endpoints", load_public_endpoints, render_public_endpoints)
 
 # System Performance and Reliability
 st.header("2. System Performance and Reliability", anchor="system_performance_and_reliability")
-if current_section == "system_performance_and_reliability":
-    st.query_params.clear()
 
 # Performance per team
 st.subheader("2.1 Performance per team (last 30 days)")
-teams = ["Team A", "Team B", "Team C"]
-performance_data = []
-for team in teams:
-    performance_data.append({
-        "Team": team,
-        "Min Latency": random_metric(10, 50),
-        "Max Latency": random_metric(100, 500),
-        "Median Latency": random_metric(50, 100)
-    })
-performance_df = pd.DataFrame(performance_data)
-fig_performance = px.bar(performance_df, x="Team", y=["Min Latency", "Median Latency", "Max Latency"], 
-                         title="Team Performance (Latency in ms)")
-st.plotly_chart(fig_performance)
+panel("performance", load_performance, render_performance)
 
 # Reliability per team
 st.subheader("2.2 Reliability per team (last 30 days)")
-reliability_data = []
-for team in teams:
-    reliability_data.append({
-        "Team": team,
-        "Error/Success Ratio": random.uniform(0, 0.1)
-    })
-reliability_df = pd.DataFrame(reliability_data)
-fig_reliability = px.bar(reliability_df, x="Team", y="Error/Success Ratio", 
-                         title="Team Reliability (Error/Success Ratio)")
-st.plotly_chart(fig_reliability)
+panel("reliability", load_reliability, render_reliability)
 
 # Team Reliability Rating
 st.subheader("2.3 Team Reliability Rating")
-for team in teams:
-    rating = random.choice(["Bronze", "Silver", "Gold"])
-    st.text(f"{team}: {rating}")
+panel("reliability_rating", load_reliability, render_reliability_rating)
 
 # Developer Productivity
 st.header("3. Developer Productivity", anchor="developer_productivity")
-if current_section == "developer_productivity":
-    st.query_params.clear()
 
 # Number of developers per team
 st.subheader("3.1 Number of developers per team")
-dev_count = {team: random_metric(5, 20) for team in teams}
-st.bar_chart(dev_count)
+panel("dev_count", load_dev_count, st.bar_chart)
 
 # Team with most builds
 st.subheader("3.2 Team with most builds (last 30 days)")
-most_builds_team = random.choice(teams)
-most_builds_count = random_metric(100, 500)
-st.info(f"Team with most builds: {most_builds_team} ({most_builds_count} builds)")
+panel("most_builds", load_most_builds, render_most_builds)
 
 # Team pushing most changes to production
 st.subheader("3.3 Team pushing most changes to production (last 30 days)")
-most_changes_team = random.choice(teams)
-most_changes_count = random_metric(50, 200)
-st.info(f"Team pushing most changes: {most_changes_team} ({most_changes_count} changes)")
+panel("most_changes", load_most_changes, render_most_changes)
 
 # Top 3 developers per team
 st.subheader("3.4 Top 3 developers per team")
-top_devs_data = []
-for team in teams:
-    for rank in range(1, 4):
-        top_devs_data.append({
-            "Team": team,
-            "Rank": rank,
-            "Developer": f"Dev_{random_metric(1, 100)}",
-            "Commits": random_metric(50, 200)
-        })
-top_devs_df = pd.DataFrame(top_devs_data)
-fig_top_devs = px.bar(top_devs_df, x="Developer", y="Commits", color="Team", facet_col="Team",
-                      labels={"Developer": "Developer", "Commits": "Number of Commits"},
-                      title="Top 3 Developers per Team")
-st.plotly_chart(fig_top_devs)
+panel("top_devs", load_top_devs, render_top_devs)
 
 # API Usage Trends
 st.header("4. API Usage Trends", anchor="api_usage_trends")
-if current_section == "api_usage_trends":
-    st.query_params.clear()
 
 # Subgraph with most traffic
 st.subheader("4.1 Subgraph with most traffic (last 30 days)")
-subgraphs = ["Subgraph A", "Subgraph B", "Subgraph C"]
-most_traffic_subgraph = random.choice(subgraphs)
-most_traffic_requests = random_metric(1000000, 10000000)
-st.info(f"Subgraph with most traffic: {most_traffic_subgraph} ({most_traffic_requests:,} requests)")
+panel("most_traffic", load_most_traffic, render_most_traffic)
 
 # Top 3 Models per Subgraph
 st.subheader("4.2 Top 3 Models per Subgraph")
-top_models_data = []
-for subgraph in subgraphs:
-    for rank in range(1, 4):
-        top_models_data.append({
-            "Subgraph": subgraph,
-            "Rank": rank,
-            "Model": f"Model_{random_metric(1, 100)}",
-            "Requests": random_metric(10000, 1000000)
-        })
-top_models_df = pd.DataFrame(top_models_data)
-fig_top_models = px.bar(top_models_df, x="Model", y="Requests", color="Subgraph", facet_col="Subgraph",
-                        labels={"Model": "Model", "Requests": "Number of Requests"},
-                        title="Top 3 Models per Subgraph")
-st.plotly_chart(fig_top_models)
+panel("top_models", load_top_models, render_top_models)
 
 # Top 3 Fields per Subgraph
 st.subheader("4.3 Top 3 Fields per Subgraph")
-top_fields_data = []
-for subgraph in subgraphs:
-    for rank in range(1, 4):
-        top_fields_data.append({
-            "Subgraph": subgraph,
-            "Rank": rank,
-            "Field": f"Field_{random_metric(1, 100)}",
-            "Model": f"Model_{random_metric(1, 100)}",
-            "Requests": random_metric(5000, 500000)
-        })
-top_fields_df = pd.DataFrame(top_fields_data)
-fig_top_fields = px.bar(top_fields_df, x="Field", y="Requests", color="Subgraph", facet_col="Subgraph",
-                        labels={"Field": "Field", "Requests": "Number of Requests"},
-                        title="Top 3 Fields per Subgraph",
-                        hover_data=["Model"])
-st.plotly_chart(fig_top_fields)
+panel("top_fields", load_top_fields, render_top_fields)
 
 # Unused API percentage
 st.subheader("4.4 Unused API percentage")
-unused_api_data = []
-for subgraph in subgraphs:
-    unused_api_data.append({
-        "Subgraph": subgraph,
-        "Unused Models (%)": random.uniform(0, 30)
-    })
-unused_api_df = pd.DataFrame(unused_api_data)
-fig_unused_api = px.bar(unused_api_df, x="Subgraph", y="Unused Models (%)", 
-                        title="Percentage of Unused Models per Subgraph")
-st.plotly_chart(fig_unused_api)
+panel("unused_api", load_unused_api, render_unused_api)
 
 # Deprecated features
 st.subheader("4.5 Deprecated features")
-for subgraph in subgraphs:
-    deprecated_objects = random_metric(0, 10)
-    st.text(f"{subgraph}: {deprecated_objects} deprecated object(s)")
+panel("deprecated", load_deprecated, render_deprecated)
+
+debug_sidebar()
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,286 @@
+import gzip
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import pandas as pd
+
+from data_provider import duckdb, duckdb_provider, histogram_quantiles, sqlite_provider, write_synthetic
+from downsampling import MAX_CATEGORIES, MAX_POINTS, fit_budget, lttb
+from heavy_hitters import CAPACITY, SpaceSaving
+from ingest import ingest, pa
+from sketches import LatencySketch, merge_sketches
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+QUANTILES = (0.5, 0.95, 0.99, 0.999)
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def exact_quantiles(values, quantiles):
+    if numpy is not None:
+        return list(numpy.percentile(values, [q * 100 for q in quantiles], method="lower"))
+    values = sorted(values)
+    return [values[int(q * (len(values) - 1))] for q in quantiles]
+
+def bench_sketches(requests, buckets=720):
+    # One sketch per hourly bucket, merged into a 30-day window.
+    rng = random.Random(0)
+    values = [rng.lognormvariate(4.2, 0.6) * (3 if rng.random() < 0.02 else 1) for _ in range(requests)]
+
+    def build():
+        sketches = [LatencySketch() for _ in range(buckets)]
+        for i, value in enumerate(values):
+            sketches[i % buckets].add(value)
+        return sketches
+
+    sketches, build_time = timed(build)
+    blobs = [sketch.to_bytes() for sketch in sketches]
+    merged, merge_time = timed(lambda: merge_sketches(LatencySketch.from_bytes(blob) for blob in blobs))
+    exact, exact_time = timed(exact_quantiles, values, QUANTILES)
+    print(f"Latency sketches ({requests:,} values, {buckets} buckets, "
+          f"{sum(map(len, blobs)) / buckets / 1024:.1f} KB per sketch):")
+    print(f"  build: {build_time:.2f}s, load + merge window: {merge_time * 1000:.1f} ms, "
+          f"exact {'numpy.percentile' if numpy is not None else 'sorted'}: {exact_time * 1000:.1f} ms")
+    for q, estimate, value in zip(QUANTILES, merged.quantiles(QUANTILES), exact):
+        print(f"  p{q * 100:g}: {estimate:.2f} vs {value:.2f} ms (error {abs(estimate - value) / value:.2%})")
+
+def bench_provider(requests):
+    with tempfile.TemporaryDirectory() as tmp:
+        provider = sqlite_provider(os.path.join(tmp, "telemetry.db"))
+        write_synthetic(provider.connection, requests)
+        histogram, scan_time = timed(provider.latency_histogram, 30)
+        _, build_time = timed(provider.refresh_sketches)
+        sketched, query_time = timed(provider.latency_percentiles, 30, QUANTILES)
+        _, team_time = timed(provider.latency_summary_by, "team", 30)
+        print(f"Store percentiles ({requests:,} requests):")
+        print(f"  per-ms histogram scan: {scan_time * 1000:.0f} ms, sketch refresh (once): {build_time:.2f}s")
+        print(f"  from sketches: {query_time * 1000:.0f} ms, per team: {team_time * 1000:.0f} ms")
+        print(f"  histogram {histogram_quantiles(histogram, QUANTILES)} vs sketches "
+              f"{[round(value, 1) for value in sketched]}")
+
+def bench_rollups(requests):
+    with tempfile.TemporaryDirectory() as tmp:
+        provider = sqlite_provider(os.path.join(tmp, "telemetry.db"))
+        write_synthetic(provider.connection, requests)
+        _, build_time = timed(provider.refresh_rollups)
+        since = provider.since(30)
+        raw, raw_time = timed(provider.query, "SELECT team, SUM(CASE WHEN error IS NULL THEN 0 ELSE 1 END),"
+                              " SUM(CASE WHEN error IS NULL THEN 1 ELSE 0 END) FROM requests WHERE ts >= ?"
+                              " GROUP BY team ORDER BY team", (since - since % 3600,))
+        rolled, rollup_time = timed(provider.error_ratio_by, "team", 30)
+        assert [(team, errors / successes) for team, errors, successes in raw] == rolled, "rollups differ from raw rows"
+        _, totals_time = timed(provider.request_totals, 30)
+        print(f"Rollups ({requests:,} requests):")
+        print(f"  initial rollup: {build_time:.2f}s, incremental refresh: {timed(provider.refresh_rollups)[1] * 1000:.0f} ms")
+        print(f"  30-day error ratio per team: raw scan {raw_time * 1000:.0f} ms, rollups {rollup_time * 1000:.0f} ms")
+        print(f"  30-day totals from rollups: {totals_time * 1000:.0f} ms")
+
+def bench_heavy_hitters(events, distinct=1_000_000, subgraphs=10, limit=10, chunk=1_000_000):
+    # Zipf-distributed field ids, each belonging to one subgraph, fed in
+    # chunks the way the store hands over per-hour counts.
+    rng = random.Random(0)
+    cum_weights = list(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, distinct + 1)))
+    summaries = [SpaceSaving() for _ in range(subgraphs)]
+    exact = Counter()
+    summary_time = 0
+    for start in range(0, events, chunk):
+        batch = rng.choices(range(distinct), cum_weights=cum_weights, k=min(chunk, events - start))
+        exact.update(batch)
+        began = time.perf_counter()
+        per_subgraph = [{} for _ in range(subgraphs)]
+        for field, count in Counter(batch).items():
+            per_subgraph[field % subgraphs][field] = count
+        for summary, counts in zip(summaries, per_subgraph):
+            summary.update(counts)
+        summary_time += time.perf_counter() - began
+
+    recall = worst = 0
+    guaranteed = 0
+    for subgraph, summary in enumerate(summaries):
+        true_top = Counter({field: count for field, count in exact.items() if field % subgraphs == subgraph})
+        true_keys = {field for field, _ in true_top.most_common(limit)}
+        top = summary.top(limit)
+        recall += len(true_keys & {field for field, _, _ in top})
+        for field, count, error in top:
+            assert count - error <= exact[field] <= count, "count outside its error bound"
+            worst = max(worst, (count - exact[field]) / exact[field])
+        guaranteed += summary.guaranteed(limit)
+    floor = max(summary.floor for summary in summaries)
+    print(f"Heavy hitters ({events:,} events over {len(exact):,} distinct fields, {subgraphs} subgraphs, "
+          f"{CAPACITY} counters each):")
+    print(f"  summarizing: {summary_time:.2f}s ({events / summary_time / 1e6:.1f}M events/s)")
+    print(f"  top {limit} recall: {recall / (limit * subgraphs):.0%}, {guaranteed} of {limit * subgraphs} guaranteed, "
+          f"worst overcount {worst:.2%}")
+    print(f"  max unmonitored count: {floor:,} (bound events/capacity per subgraph: "
+          f"{max(summary.total for summary in summaries) // CAPACITY:,})")
+
+def bench_downsampling(points):
+    # A noisy daily cycle with one outage spike, reduced with LTTB.
+    rng = random.Random(0)
+    x = list(range(points))
+    y = [99 - abs(rng.gauss(0, 0.3)) - (30 if i == points // 3 else 0) for i in x]
+    kept, lttb_time = timed(lttb, x, y, MAX_POINTS)
+    print(f"Downsampling ({points:,} points to {MAX_POINTS:,}): LTTB {lttb_time * 1000:.0f} ms, "
+          f"outage kept: {points // 3 in set(kept.tolist())}")
+
+def check_shared_facet(subgraphs=100, models=3):
+    # Top-3 panels colour and facet by the same column; with more subgraphs
+    # than the budget, the figure keeps MAX_CATEGORIES of them and sums the
+    # rest per model into OTHER without losing requests.
+    rows = [(f"Subgraph {s}", f"Model_{s}_{m}", s * models + m) for s in range(subgraphs) for m in range(models)]
+    frame = pd.DataFrame(rows, columns=["Subgraph", "Model", "Requests"])
+    reduced = fit_budget("bar", frame, {"x": "Model", "y": "Requests", "color": "Subgraph", "facet_col": "Subgraph"})
+    assert reduced["Subgraph"].nunique() <= MAX_CATEGORIES, "facets over budget"
+    assert reduced.groupby("Subgraph")["Model"].nunique().max() <= MAX_CATEGORIES, "bars over budget"
+    assert reduced["Requests"].sum() == frame["Requests"].sum(), "requests lost"
+
+def write_logs(directory, megabytes, files=4, days=30, seed=0, now=None):
+    # Gateway logs shaped like the synthetic store, split over `files` JSON
+    # lines files of which the last is gzipped. Returns the record count.
+    rng = random.Random(seed)
+    now = int(now or time.time())
+    subgraphs = ["Subgraph A", "Subgraph B", "Subgraph C"]
+    regions = ["us-east", "us-west", "eu-west", "ap-south", "sa-east"]
+    sources = ["postgres", "mongodb", "clickhouse", "http", "snowflake"]
+    errors = ["timeout", "permission_denied", "validation_failed", "upstream_error", "rate_limited"]
+    records = 0
+    for index in range(files):
+        name = os.path.join(directory, f"gateway-{index}.jsonl" + (".gz" if index == files - 1 else ""))
+        lines = []
+        size = 0
+        while size < megabytes * 2 ** 20 / files:
+            subgraph = rng.randrange(3)
+            model = rng.randrange(1, 41)
+            line = json.dumps({
+                "request_id": f"{seed}-{index}-{len(lines)}",
+                "timestamp": (now - rng.randrange(days * 86400)) * 1000 + rng.randrange(1000),
+                "team": f"Team {'ABC'[subgraph]}", "subgraph": subgraphs[subgraph], "model": f"Model_{model}",
+                "field": f"field_{rng.randrange(1, 13)}", "endpoint": f"/{'abc'[subgraph]}/model_{model}",
+                "region": rng.choice(regions), "data_source": sources[model % len(sources)],
+                "error": rng.choice(errors) if rng.random() < 0.03 else None,
+                "latency_ms": round(rng.lognormvariate(4.2, 0.5), 1), "bytes_served": rng.randrange(200, 50_000),
+                "bytes_ingested": rng.randrange(0, 2_000), "deprecated": rng.random() < 0.05,
+                "cross_subgraph": rng.random() < 0.05,
+            }) + "\n"
+            lines.append(line)
+            size += len(line)
+        with (gzip.open if name.endswith(".gz") else open)(name, "wt", encoding="utf-8") as file:
+            file.writelines(lines)
+        records += len(lines)
+    return records
+
+def bench_ingest(megabytes, processes=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = os.path.join(tmp, "logs")
+        os.mkdir(logs)
+        records, generate_time = timed(write_logs, logs, megabytes)
+        outputs = [os.path.join(tmp, "telemetry.db")] + ([os.path.join(tmp, "parquet")] if pa is not None else [])
+        print(f"Ingestion ({megabytes} MB of logs, {records:,} requests, generated in {generate_time:.1f}s, "
+              f"{processes or os.cpu_count()} process(es)):")
+        for output in outputs:
+            stats = ingest([logs], output, processes)
+            assert stats["records"] == records, "records lost"
+            again = ingest([logs], output, processes)
+            assert again["records"] == 0, "checkpoint did not skip ingested ranges"
+            print(f"  {os.path.basename(output)}: {stats['seconds']:.2f}s "
+                  f"({stats['bytes'] / 2 ** 20 / stats['seconds'] * 60:,.0f} MB/min), re-run {again['seconds']:.2f}s")
+        stored = sqlite_provider(outputs[0]).query("SELECT COUNT(*) FROM requests")[0][0]
+        assert stored == records, "duplicate or missing rows in the store"
+
+def check_rotation():
+    # A log rotated by renaming, and then compressed, must not be ingested
+    # again; lines appended after the rename and a log recreated under the
+    # old name are new.
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = os.path.join(tmp, "logs")
+        os.mkdir(logs)
+        records = write_logs(logs, 1, files=2)
+        outputs = [os.path.join(tmp, "telemetry.db")] + ([os.path.join(tmp, "parquet")] if pa is not None else [])
+        for output in outputs:
+            assert ingest([logs], output, processes=1)["records"] == records
+        current = os.path.join(logs, "gateway-0.jsonl")
+        rotated = os.path.join(logs, "gateway-0.1.jsonl")
+        os.rename(current, rotated)
+        with open(rotated, encoding="utf-8") as file:
+            line = file.readline()
+        with open(rotated, "a", encoding="utf-8") as file:
+            file.write(line)
+        with open(current, "w", encoding="utf-8") as file:
+            file.write(line.replace('"request_id": "', '"request_id": "new-'))
+        for output in outputs:
+            assert ingest([logs], output, processes=1)["records"] == 2, "rotated log ingested again"
+        # Compressed after rotation, the way logrotate does it
+        with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+            target.write(source.read())
+        os.remove(rotated)
+        for output in outputs:
+            assert ingest([logs], output, processes=1)["records"] == 0, "compressed log ingested again"
+        assert sqlite_provider(outputs[0]).query("SELECT COUNT(*) FROM requests")[0][0] == records + 2
+
+def check_missing_fields():
+    # A request without a latency or subgraph is stored alike in both
+    # stores, and its latency is left out of the latency statistics.
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = os.path.join(tmp, "logs")
+        os.mkdir(logs)
+        now = int(time.time())
+        with open(os.path.join(logs, "gateway.jsonl"), "w", encoding="utf-8") as file:
+            file.write(json.dumps({"ts": now - 60, "team": "Team A", "subgraph": "Subgraph A", "latency_ms": 80}) + "\n")
+            file.write(json.dumps({"ts": now - 30, "team": "Team A"}) + "\n")
+        sqlite = sqlite_provider(os.path.join(tmp, "telemetry.db"))
+        providers = [sqlite]
+        ingest([logs], os.path.join(tmp, "telemetry.db"), processes=1)
+        if pa is not None and duckdb is not None:
+            ingest([logs], os.path.join(tmp, "parquet"), processes=1)
+            providers.append(duckdb_provider(os.path.join(tmp, "parquet")))
+        for provider in providers:
+            rows = provider.query("SELECT subgraph, latency_ms FROM requests ORDER BY ts")
+            assert [tuple(row) for row in rows] == [("Subgraph A", 80), ("unknown", None)], rows
+            assert provider.latency_histogram(1) == [(80, 1)], "missing latency counted"
+
+def check_late_partitions():
+    # A dashboard reading a Parquet dataset in place must pick up logs
+    # ingested for days it has already summarized.
+    if pa is None or duckdb is None:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "parquet")
+        records = 0
+        for seed in range(2):
+            logs = os.path.join(tmp, f"logs-{seed}")
+            os.mkdir(logs)
+            records += write_logs(logs, 1, files=1, seed=seed)
+            ingest([logs], output, processes=1)
+            if seed == 0:
+                provider = duckdb_provider(output)
+                assert provider.request_totals(30)["requests"] == records
+        assert provider.request_totals(30)["requests"] == records, "late partitions left stale rollups"
+        assert provider.latency_sketches(30).count == records, "late partitions left stale sketches"
+        assert sum(row[-2] for row in provider.heavy_hitters("entities", 30, 1000)) == records, \
+            "late partitions left stale heavy hitters"
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    heavy_hitter_events = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000
+    log_megabytes = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+    bench_sketches(requests)
+    bench_provider(requests // 4)
+    bench_rollups(requests // 4)
+    bench_heavy_hitters(heavy_hitter_events)
+    bench_downsampling(requests)
+    bench_ingest(log_megabytes)
+    check_shared_facet()
+    check_rotation()
+    check_missing_fields()
+    check_late_partitions()
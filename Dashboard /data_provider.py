@@ -0,0 +1,814 @@
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from heavy_hitters import SpaceSaving
+from sketches import MIN_LATENCY, LatencySketch
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# Request log, one row per served request.
+REQUEST_COLUMNS = ("ts", "team", "subgraph", "model", "field", "endpoint", "region", "data_source",
+                   "error", "latency_ms", "bytes_served", "bytes_ingested", "deprecated", "cross_subgraph")
+# Developer activity, one row per event. `kind` is one of ACTIVITY_KINDS.
+ACTIVITY_COLUMNS = ("ts", "team", "subgraph", "developer", "object", "kind")
+ACTIVITY_KINDS = ("build", "validation", "change", "auto_change", "comment", "resolved_comment", "composition")
+# Catalog of the metadata the requests are served from.
+MODEL_COLUMNS = ("subgraph", "model", "kind", "protected", "documented", "public", "introspected",
+                 "has_relationships", "deprecated")
+ROLE_COLUMNS = ("role", "model")
+# Version of the catalog summary written by the metadata analyzer (summary.py).
+SUMMARY_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    ts INTEGER, team TEXT, subgraph TEXT, model TEXT, field TEXT, endpoint TEXT, region TEXT,
+    data_source TEXT, error TEXT, latency_ms REAL, bytes_served INTEGER, bytes_ingested INTEGER,
+    deprecated INTEGER, cross_subgraph INTEGER
+);
+CREATE INDEX IF NOT EXISTS requests_ts ON requests (ts);
+CREATE TABLE IF NOT EXISTS activity (
+    ts INTEGER, team TEXT, subgraph TEXT, developer TEXT, object TEXT, kind TEXT
+);
+CREATE INDEX IF NOT EXISTS activity_kind_ts ON activity (kind, ts);
+CREATE TABLE IF NOT EXISTS models (
+    subgraph TEXT, model TEXT, kind TEXT, protected INTEGER, documented INTEGER, public INTEGER,
+    introspected INTEGER, has_relationships INTEGER, deprecated INTEGER
+);
+CREATE TABLE IF NOT EXISTS roles (role TEXT, model TEXT);
+CREATE TABLE IF NOT EXISTS latency_sketches (bucket INTEGER, team TEXT, subgraph TEXT, sketch BLOB);
+CREATE INDEX IF NOT EXISTS latency_sketches_bucket ON latency_sketches (bucket);
+CREATE TABLE IF NOT EXISTS heavy_hitters (resolution INTEGER, bucket INTEGER, panel TEXT, grp TEXT, summary TEXT);
+CREATE INDEX IF NOT EXISTS heavy_hitters_bucket ON heavy_hitters (panel, resolution, bucket);
+CREATE TABLE IF NOT EXISTS request_minutes (bucket INTEGER, requests INTEGER, errors INTEGER);
+CREATE INDEX IF NOT EXISTS request_minutes_bucket ON request_minutes (bucket);
+"""
+
+class Rollup:
+    # Counts of a raw table pre-aggregated per minute, hour and day bucket
+    # and `dimensions`. `measures` maps each rollup column to the aggregate
+    # computing it from raw rows; buckets combine by summing. Measures are
+    # integers except for those named in `real`, kept as doubles.
+    def __init__(self, table, source, dimensions, measures, real=()):
+        self.table = table
+        self.source = source
+        self.dimensions = dimensions
+        self.measures = measures
+        self.real = real
+
+    def columns(self):
+        return ["resolution", "bucket", *self.dimensions, *self.measures]
+
+    def schema(self):
+        columns = [f"{dimension} TEXT" for dimension in self.dimensions]
+        columns += [f"{measure} {'DOUBLE' if measure in self.real else 'INTEGER'}" for measure in self.measures]
+        return (f"CREATE TABLE IF NOT EXISTS {self.table} (resolution INTEGER, bucket INTEGER, {', '.join(columns)});\n"
+                f"CREATE INDEX IF NOT EXISTS {self.table}_bucket ON {self.table} (resolution, bucket);\n")
+
+    def from_raw(self):
+        # params: resolution, resolution, start, end
+        dimensions = ", ".join(self.dimensions)
+        groups = ", ".join(str(i) for i in range(2, len(self.dimensions) + 3))
+        return (f"INSERT INTO {self.table} SELECT ?, ts - ts % ?, {dimensions}, {', '.join(self.measures.values())}"
+                f" FROM {self.source} WHERE ts >= ? AND ts < ? GROUP BY {groups}")
+
+    def from_rollup(self):
+        # params: resolution, resolution, finer resolution, start, end
+        dimensions = ", ".join(self.dimensions)
+        groups = ", ".join(str(i) for i in range(2, len(self.dimensions) + 3))
+        sums = ", ".join(f"SUM({measure})" for measure in self.measures)
+        return (f"INSERT INTO {self.table} SELECT ?, bucket - bucket % ?, {dimensions}, {sums}"
+                f" FROM {self.table} WHERE resolution = ? AND bucket >= ? AND bucket < ? GROUP BY {groups}")
+
+    def window(self, ranges, tail, where="", params=()):
+        # Subquery with one row per rollup bucket in `ranges` plus the raw
+        # rows from `tail` on, aggregated, and columns dimensions + measures.
+        dimensions = ", ".join(self.dimensions)
+        where = f" AND {where}" if where else ""
+        conditions = " OR ".join("(resolution = ? AND bucket >= ? AND bucket < ?)" for _ in ranges) or "1 = 0"
+        sql = (f"SELECT {dimensions}, {', '.join(self.measures)} FROM {self.table} WHERE ({conditions}){where}"
+               f" UNION ALL SELECT {dimensions}, {', '.join(self.measures.values())} FROM {self.source}"
+               f" WHERE ts >= ?{where} GROUP BY {dimensions}")
+        return sql, (*[value for bucket_range in ranges for value in bucket_range], *params, tail, *params)
+
+# A model is served from one data source, so grouping by it as well adds
+# next to no rows.
+REQUEST_ROLLUP = Rollup("request_rollups", "requests", ("team", "subgraph", "model", "field", "data_source"), {
+    "requests": "COUNT(*)",
+    "errors": "SUM(CASE WHEN error IS NULL THEN 0 ELSE 1 END)",
+    "bytes_served": "SUM(bytes_served)",
+    "bytes_ingested": "SUM(bytes_ingested)",
+    "cross_subgraph": "SUM(cross_subgraph)",
+    "latencies": "COUNT(latency_ms)",
+    "latency_ms": "SUM(latency_ms)",
+}, real=("latency_ms",))
+ACTIVITY_ROLLUP = Rollup("activity_rollups", "activity", ("team", "subgraph", "kind"), {"events": "COUNT(*)"})
+ROLLUPS = (REQUEST_ROLLUP, ACTIVITY_ROLLUP)
+SCHEMA += "".join(rollup.schema() for rollup in ROLLUPS)
+
+# Columns panels may group requests / activity by. Only these names are
+# ever formatted into SQL.
+REQUEST_DIMENSIONS = {"team", "subgraph", "model", "field", "endpoint", "region", "data_source", "error"}
+ACTIVITY_DIMENSIONS = {"team", "subgraph", "developer", "object"}
+# Latency sketches are kept per hour, team and subgraph.
+SKETCH_BUCKET = HOUR
+SKETCH_DIMENSIONS = ("team", "subgraph")
+# Top-N panels served from Space-Saving summaries kept per hour, day and
+# group: panel -> (group column or None, key columns, request filter).
+HEAVY_HITTERS = {
+    "models": ("subgraph", ("model",), ""),
+    "fields": ("subgraph", ("field", "model"), ""),
+    "entities": (None, ("model",), ""),
+    "deprecated_endpoints": (None, ("endpoint",), "deprecated = 1"),
+    "errors": (None, ("error",), "error IS NOT NULL"),
+}
+
+def check_dimension(column, allowed):
+    if column not in allowed:
+        raise ValueError(f"Cannot group by {column!r} (allowed: {', '.join(sorted(allowed))})")
+    return column
+
+def window_ranges(since, now):
+    # (resolution, start, end) bucket ranges covering the window from the
+    # hour containing `since` to the current minute: whole days in the
+    # middle, hours at either end and minutes of the current hour. Returns
+    # them with the start of the current minute, which is read raw.
+    start = since - since % HOUR
+    hour = now - now % HOUR
+    minute = now - now % MINUTE
+    first_day = start + (-start) % DAY
+    last_day = hour - hour % DAY
+    if first_day < last_day:
+        ranges = [(HOUR, start, first_day), (DAY, first_day, last_day), (HOUR, last_day, hour)]
+    else:
+        ranges = [(HOUR, start, hour)]
+    ranges.append((MINUTE, hour, minute))
+    return [bucket_range for bucket_range in ranges if bucket_range[1] < bucket_range[2]], minute
+
+def histogram_quantiles(histogram, quantiles):
+    # Nearest-rank quantiles from (value, count) rows sorted by value.
+    total = sum(count for _, count in histogram)
+    if not total:
+        return [None] * len(quantiles)
+    results = []
+    for q in quantiles:
+        rank = max(1, q * total)
+        seen = 0
+        for value, count in histogram:
+            seen += count
+            if seen >= rank:
+                results.append(value)
+                break
+    return results
+
+class SQLProvider:
+    # Dashboard queries over a requests/activity/models/roles store. Every
+    # method is one aggregate query, so only the (small) result rows leave
+    # the database; the SQL sticks to what SQLite and DuckDB both accept.
+    # `partitions` is the directory of a Parquet dataset the requests are
+    # read from in place; files landing there for a day invalidate that
+    # day's summaries.
+    def __init__(self, connection, name, partitions=None):
+        self.connection = connection
+        self.name = name
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.partitions = partitions
+        self.watermarks = partition_watermarks(partitions) if partitions else {}
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def insert(self, sql, rows):
+        with self.lock:
+            self.connection.executemany(sql, rows)
+            if isinstance(self.connection, sqlite3.Connection):
+                self.connection.commit()
+
+    def write(self, sql, params=()):
+        with self.lock:
+            self.connection.execute(sql, params)
+            if isinstance(self.connection, sqlite3.Connection):
+                self.connection.commit()
+
+    def since(self, days):
+        return int(time.time()) - days * DAY
+
+    def check_partitions(self):
+        # Discards the summaries from the earliest day whose partition
+        # files changed since the last check, e.g. late logs ingested while
+        # the dashboard runs.
+        if not self.partitions:
+            return
+        watermarks = partition_watermarks(self.partitions)
+        changed = [day for day in watermarks.keys() | self.watermarks.keys()
+                   if watermarks.get(day) != self.watermarks.get(day)]
+        self.watermarks = watermarks
+        if changed:
+            self.discard_summaries(min(changed))
+
+    # Rollups
+
+    def last_bucket(self, rollup, resolution):
+        return self.query(f"SELECT MAX(bucket) FROM {rollup.table} WHERE resolution = ?", (resolution,))[0][0]
+
+    def refresh_rollups(self):
+        # Rolls complete hours up from the raw rows and complete days up from
+        # the hours, in both cases only after the last stored bucket. Minute
+        # buckets are kept for the current hour only, except for the
+        # per-minute request and error counts uptime is computed from. Rows
+        # logged later for an already rolled-up period are not picked up
+        # unless the period is discarded first (see check_partitions).
+        self.check_partitions()
+        with self.refresh_lock:
+            now = int(time.time())
+            minute, hour, day = now - now % MINUTE, now - now % HOUR, now - now % DAY
+            for rollup in ROLLUPS:
+                last = self.last_bucket(rollup, HOUR)
+                start = 0 if last is None else last + HOUR
+                if start < hour:
+                    self.write(rollup.from_raw(), (HOUR, HOUR, start, hour))
+                last = self.last_bucket(rollup, DAY)
+                start = 0 if last is None else last + DAY
+                if start < day:
+                    self.write(rollup.from_rollup(), (DAY, DAY, HOUR, start, day))
+                last = self.last_bucket(rollup, MINUTE)
+                start = hour if last is None else max(hour, last + MINUTE)
+                if start < minute:
+                    self.write(rollup.from_raw(), (MINUTE, MINUTE, start, minute))
+                self.write(f"DELETE FROM {rollup.table} WHERE resolution = ? AND bucket < ?", (MINUTE, hour))
+            last = self.query("SELECT MAX(bucket) FROM request_minutes")[0][0]
+            start = 0 if last is None else last + MINUTE
+            if start < minute:
+                self.write("INSERT INTO request_minutes SELECT ts - ts % ?, COUNT(*),"
+                           " SUM(CASE WHEN error IS NULL THEN 0 ELSE 1 END) FROM requests"
+                           " WHERE ts >= ? AND ts < ? GROUP BY 1", (MINUTE, start, minute))
+            return now
+
+    def discard_summaries(self, since):
+        # Drops the rollups, sketches and heavy-hitter summaries of requests
+        # from the day containing `since` on, so the next refresh rebuilds
+        # them including rows that were loaded late.
+        day = since - since % DAY
+        with self.refresh_lock:
+            for rollup in ROLLUPS:
+                if rollup.source == "requests":
+                    self.write(f"DELETE FROM {rollup.table} WHERE bucket >= ?", (day,))
+            self.write("DELETE FROM request_minutes WHERE bucket >= ?", (day,))
+            self.write("DELETE FROM latency_sketches WHERE bucket >= ?", (day,))
+            self.write("DELETE FROM heavy_hitters WHERE bucket >= ?", (day,))
+
+    def rollup_window(self, rollup, days, where="", params=()):
+        # (subquery, params) with the rollup rows of the window; see
+        # Rollup.window.
+        ranges, tail = window_ranges(self.since(days), self.refresh_rollups())
+        return rollup.window(ranges, tail, where, params)
+
+    def rollup_query(self, rollup, select, days, group=None, where="", params=(), order=""):
+        # `select` aggregates the rollup measures over the window, grouped
+        # by `group` if given.
+        window, window_params = self.rollup_window(rollup, days, where, params)
+        grouping = f" GROUP BY {group}" if group else ""
+        columns = f"{group}, {select}" if group else select
+        return self.query(f"SELECT {columns} FROM ({window}) AS buckets{grouping}{order}", window_params)
+
+    # Requests
+
+    def request_totals(self, days):
+        requests, errors, served, ingested, cross = self.rollup_query(
+            REQUEST_ROLLUP, "SUM(requests), SUM(errors), SUM(bytes_served), SUM(bytes_ingested), SUM(cross_subgraph)",
+            days)[0]
+        return {
+            "requests": requests or 0,
+            "errors": errors or 0,
+            "bytes_served": served or 0,
+            "bytes_ingested": ingested or 0,
+            "cross_subgraph": cross or 0,
+        }
+
+    def uptime(self, days):
+        # Share of minutes with traffic in which at least one request
+        # succeeded, from the stored per-minute counts plus the current
+        # minute.
+        now = self.refresh_rollups()
+        since, minute = self.since(days), now - now % MINUTE
+        minutes, down = self.query(
+            "SELECT COUNT(*), SUM(CASE WHEN requests = errors THEN 1 ELSE 0 END) FROM ("
+            " SELECT requests, errors FROM request_minutes WHERE bucket >= ? AND bucket < ?"
+            " UNION ALL SELECT COUNT(*), SUM(CASE WHEN error IS NULL THEN 0 ELSE 1 END) FROM requests"
+            " WHERE ts >= ? GROUP BY ts - ts % 60) AS minutes",
+            (since - since % MINUTE, minute, minute))[0]
+        return 100 * (1 - (down or 0) / minutes) if minutes else None
+
+    def latency_histogram(self, days, where="", params=()):
+        # Latencies rounded to whole milliseconds, so the result has at most
+        # a few thousand rows however many requests there are.
+        return self.query(
+            "SELECT ROUND(latency_ms) AS bucket, COUNT(*) FROM requests"
+            f" WHERE ts >= ? AND latency_ms IS NOT NULL {where} GROUP BY ROUND(latency_ms) ORDER BY bucket",
+            (self.since(days), *params))
+
+    def latency_percentiles(self, days, quantiles=(0.5, 0.95, 0.99)):
+        return self.latency_sketches(days).quantiles(quantiles)
+
+    def latency_summary_by(self, column, days):
+        # (value, min, median, max) latency per value of `column`.
+        if column in SKETCH_DIMENSIONS:
+            sketches = self.latency_sketches(days, column)
+            return [(value, sketch.min, sketch.quantile(0.5), sketch.max)
+                    for value, sketch in sorted(sketches.items())]
+        column = check_dimension(column, REQUEST_DIMENSIONS)
+        histograms = {}
+        for value, bucket, count in self.query(
+                f"SELECT {column}, ROUND(latency_ms) AS bucket, COUNT(*) FROM requests"
+                f" WHERE ts >= ? AND latency_ms IS NOT NULL GROUP BY {column}, ROUND(latency_ms)"
+                f" ORDER BY {column}, bucket",
+                (self.since(days),)):
+            histograms.setdefault(value, []).append((bucket, count))
+        return [(value, histogram[0][0], histogram_quantiles(histogram, [0.5])[0], histogram[-1][0])
+                for value, histogram in histograms.items()]
+
+    def build_sketches(self, start, end):
+        # {(bucket, team, subgraph): sketch} for requests in [start, end).
+        # The sketch bucket of every latency is computed by the store, so
+        # the scan returns one row per occupied bucket.
+        sketches = {}
+        for bucket, team, subgraph, key, count, low, high in self.query(
+                "SELECT ts - ts % ?, team, subgraph,"
+                " CASE WHEN latency_ms > ? THEN CAST(CEIL(LN(latency_ms) / ?) AS INTEGER) END,"
+                " COUNT(*), MIN(latency_ms), MAX(latency_ms) FROM requests"
+                " WHERE ts >= ? AND ts < ? AND latency_ms IS NOT NULL GROUP BY 1, 2, 3, 4",
+                (SKETCH_BUCKET, MIN_LATENCY, LatencySketch().log_gamma, start, end)):
+            sketch = sketches.get((bucket, team, subgraph))
+            if sketch is None:
+                sketch = sketches[bucket, team, subgraph] = LatencySketch()
+            sketch.add_key(key, count, low, high)
+        return sketches
+
+    def refresh_sketches(self):
+        # Stores sketches for the complete hours since the last stored one.
+        # Requests logged later for an hour that is already stored are not
+        # picked up.
+        self.check_partitions()
+        with self.refresh_lock:
+            current = int(time.time()) // SKETCH_BUCKET * SKETCH_BUCKET
+            last = self.query("SELECT MAX(bucket) FROM latency_sketches")[0][0]
+            start = 0 if last is None else last + SKETCH_BUCKET
+            if start < current:
+                sketches = self.build_sketches(start, current)
+                self.insert("INSERT INTO latency_sketches VALUES (?, ?, ?, ?)",
+                            [(*key, sketch.to_bytes()) for key, sketch in sketches.items()])
+            return current
+
+    def latency_sketches(self, days, group=None):
+        # Latency sketch of the window merged from the stored hourly
+        # sketches plus the current hour, or {value: sketch} per `group`
+        # ("team" or "subgraph"). The window starts at the beginning of the
+        # hour `days` ago.
+        current = self.refresh_sketches()
+        since = self.since(days)
+        rows = [(team, subgraph, LatencySketch.from_bytes(sketch)) for team, subgraph, sketch in self.query(
+            "SELECT team, subgraph, sketch FROM latency_sketches WHERE bucket >= ?",
+            (since - since % SKETCH_BUCKET,))]
+        rows.extend((team, subgraph, sketch)
+                    for (_, team, subgraph), sketch in self.build_sketches(current, current + SKETCH_BUCKET).items())
+        if group is None:
+            merged = LatencySketch()
+            for _, _, sketch in rows:
+                merged.merge(sketch)
+            return merged
+        position = SKETCH_DIMENSIONS.index(group)
+        merged = {}
+        for row in rows:
+            if row[position] in merged:
+                merged[row[position]].merge(row[2])
+            else:
+                merged[row[position]] = row[2]
+        return merged
+
+    def count_keys(self, panel, start, end):
+        # Exact {(hour, group): Counter of keys} for requests in [start, end).
+        group, keys, where = HEAVY_HITTERS[panel]
+        where = f" AND {where}" if where else ""
+        groups = ", ".join(str(i) for i in range(1, len(keys) + 3))
+        counts = {}
+        for bucket, group_value, *key, count in self.query(
+                f"SELECT ts - ts % ?, {group or 'NULL'}, {', '.join(keys)}, COUNT(*) FROM requests"
+                f" WHERE ts >= ? AND ts < ?{where} GROUP BY {groups}",
+                (HOUR, start, end)):
+            counter = counts.get((bucket, group_value))
+            if counter is None:
+                counter = counts[bucket, group_value] = {}
+            counter[key[0] if len(key) == 1 else tuple(key)] = count
+        return counts
+
+    def last_summary(self, panel, resolution):
+        return self.query("SELECT MAX(bucket) FROM heavy_hitters WHERE panel = ? AND resolution = ?",
+                          (panel, resolution))[0][0]
+
+    def refresh_heavy_hitters(self):
+        # Hour summaries come from exact per-hour key counts computed by the
+        # store (one day of hours per query), day summaries from merging the
+        # hours. Like the rollups, only periods after the last stored one
+        # are built.
+        self.check_partitions()
+        with self.refresh_lock:
+            now = int(time.time())
+            hour, day = now - now % HOUR, now - now % DAY
+            first = self.query("SELECT MIN(ts) FROM requests")[0][0]
+            if first is None:
+                return now
+            for panel in HEAVY_HITTERS:
+                last = self.last_summary(panel, HOUR)
+                start = first - first % HOUR if last is None else last + HOUR
+                for chunk in range(start, hour, DAY):
+                    rows = []
+                    for (bucket, group), counts in self.count_keys(panel, chunk, min(chunk + DAY, hour)).items():
+                        summary = SpaceSaving()
+                        summary.update(counts)
+                        rows.append((HOUR, bucket, panel, group, summary.to_json()))
+                    self.insert("INSERT INTO heavy_hitters VALUES (?, ?, ?, ?, ?)", rows)
+
+                last = self.last_summary(panel, DAY)
+                start = first - first % DAY if last is None else last + DAY
+                for bucket in range(start, day, DAY):
+                    merged = {}
+                    for group, summary in self.query(
+                            "SELECT grp, summary FROM heavy_hitters WHERE panel = ? AND resolution = ?"
+                            " AND bucket >= ? AND bucket < ?", (panel, HOUR, bucket, bucket + DAY)):
+                        merged.setdefault(group, SpaceSaving()).merge(SpaceSaving.from_json(summary))
+                    self.insert("INSERT INTO heavy_hitters VALUES (?, ?, ?, ?, ?)",
+                                [(DAY, bucket, panel, group, summary.to_json()) for group, summary in merged.items()])
+            return now
+
+    def heavy_hitters(self, panel, days, limit):
+        # Top `limit` keys of `panel` over the window as (group, *key,
+        # count, max overcount) rows, or (*key, count, max overcount) for
+        # ungrouped panels. Counts are upper bounds; the true count is at
+        # least count - max overcount. Stored day and hour summaries are
+        # merged with exact counts for the current hour.
+        now = self.refresh_heavy_hitters()
+        hour = now - now % HOUR
+        ranges, _ = window_ranges(self.since(days), now)
+        merged = {}
+        for resolution, start, end in ranges:
+            if resolution == MINUTE:
+                continue
+            for group, summary in self.query(
+                    "SELECT grp, summary FROM heavy_hitters WHERE panel = ? AND resolution = ?"
+                    " AND bucket >= ? AND bucket < ?", (panel, resolution, start, end)):
+                merged.setdefault(group, SpaceSaving()).merge(SpaceSaving.from_json(summary))
+        for (_, group), counts in self.count_keys(panel, hour, now + 1).items():
+            merged.setdefault(group, SpaceSaving()).update(counts)
+
+        rows = []
+        for group in sorted(merged, key=lambda value: (value is None, value)):
+            for key, count, error in merged[group].top(limit):
+                key = key if isinstance(key, tuple) else (key,)
+                rows.append((group, *key, count, error) if HEAVY_HITTERS[panel][0] else (*key, count, error))
+        return rows
+
+    def success_rate_by(self, column, days):
+        if column in REQUEST_ROLLUP.dimensions:
+            return self.rollup_query(REQUEST_ROLLUP, "100.0 * SUM(requests - errors) / SUM(requests)", days,
+                                     column, order=f" ORDER BY {column}")
+        column = check_dimension(column, REQUEST_DIMENSIONS)
+        return self.query(
+            f"SELECT {column}, 100.0 * AVG(CASE WHEN error IS NULL THEN 1.0 ELSE 0.0 END) FROM requests"
+            f" WHERE ts >= ? GROUP BY {column} ORDER BY {column}",
+            (self.since(days),))
+
+    def success_rate_series(self, column, days, resolution=HOUR):
+        # (bucket start, value of `column`, success rate %) per `resolution`
+        # seconds, in time order. Whole-hour resolutions over rollup
+        # dimensions are summed from the hour rollups plus the raw rows of
+        # the current hour; anything else is grouped from the raw rows.
+        if column in REQUEST_ROLLUP.dimensions and resolution % HOUR == 0:
+            now = self.refresh_rollups()
+            since, hour = self.since(days), now - now % HOUR
+            return self.query(
+                f"SELECT bucket - bucket % ?, {column}, 100.0 * SUM(requests - errors) / SUM(requests) FROM ("
+                f" SELECT bucket, {column}, requests, errors FROM {REQUEST_ROLLUP.table}"
+                f" WHERE resolution = ? AND bucket >= ? AND bucket < ?"
+                f" UNION ALL SELECT ts - ts % ?, {column}, COUNT(*), SUM(CASE WHEN error IS NULL THEN 0 ELSE 1 END)"
+                f" FROM requests WHERE ts >= ? GROUP BY 1, 2) AS buckets GROUP BY 1, 2 ORDER BY 1, 2",
+                (resolution, HOUR, since - since % HOUR, hour, HOUR, hour))
+        column = check_dimension(column, REQUEST_DIMENSIONS)
+        return self.query(
+            f"SELECT ts - ts % ?, {column}, 100.0 * AVG(CASE WHEN error IS NULL THEN 1.0 ELSE 0.0 END)"
+            f" FROM requests WHERE ts >= ? GROUP BY 1, 2 ORDER BY 1, 2",
+            (resolution, self.since(days)))
+
+    def error_ratio_by(self, column, days):
+        # Errors per successful request.
+        if column in REQUEST_ROLLUP.dimensions:
+            rows = self.rollup_query(REQUEST_ROLLUP, "SUM(errors), SUM(requests - errors)", days, column,
+                                     order=f" ORDER BY {column}")
+        else:
+            column = check_dimension(column, REQUEST_DIMENSIONS)
+            rows = self.query(
+                f"SELECT {column}, SUM(CASE WHEN error IS NULL THEN 0 ELSE 1 END),"
+                f" SUM(CASE WHEN error IS NULL THEN 1 ELSE 0 END) FROM requests"
+                f" WHERE ts >= ? GROUP BY {column} ORDER BY {column}",
+                (self.since(days),))
+        return [(value, errors / successes if successes else 0.0) for value, errors, successes in rows]
+
+    def average_latency_by(self, column, days):
+        if column in REQUEST_ROLLUP.dimensions:
+            return self.rollup_query(REQUEST_ROLLUP, "SUM(latency_ms) / SUM(latencies)", days, column,
+                                     order=f" ORDER BY {column}")
+        column = check_dimension(column, REQUEST_DIMENSIONS)
+        return self.query(
+            f"SELECT {column}, AVG(latency_ms) FROM requests WHERE ts >= ? GROUP BY {column} ORDER BY {column}",
+            (self.since(days),))
+
+    def top_by(self, column, days, limit=5):
+        if column in REQUEST_ROLLUP.dimensions:
+            return self.rollup_query(REQUEST_ROLLUP, "SUM(requests) AS n", days, column,
+                                     order=f" ORDER BY n DESC, {column} LIMIT {int(limit)}")
+        column = check_dimension(column, REQUEST_DIMENSIONS)
+        return self.query(
+            f"SELECT {column}, COUNT(*) AS n FROM requests WHERE ts >= ?"
+            f" GROUP BY {column} ORDER BY n DESC, {column} LIMIT ?",
+            (self.since(days), limit))
+
+    def deprecated_endpoints(self, days):
+        return self.query(
+            "SELECT COUNT(DISTINCT endpoint) FROM requests WHERE ts >= ? AND deprecated = 1",
+            (self.since(days),))[0][0]
+
+    def unused_model_percentage(self, days):
+        # Per subgraph, the share of catalog models with no requests.
+        window, params = self.rollup_window(REQUEST_ROLLUP, days)
+        return self.query(
+            "SELECT m.subgraph, 100.0 * AVG(CASE WHEN r.model IS NULL THEN 1.0 ELSE 0.0 END) FROM models m"
+            f" LEFT JOIN (SELECT DISTINCT subgraph, model FROM ({window}) AS buckets) r"
+            " ON r.subgraph = m.subgraph AND r.model = m.model"
+            " WHERE m.kind = 'Model' GROUP BY m.subgraph ORDER BY m.subgraph",
+            params)
+
+    # Activity
+
+    def activity_counts(self, days):
+        counts = dict(self.rollup_query(ACTIVITY_ROLLUP, "SUM(events)", days, "kind"))
+        return {kind: counts.get(kind, 0) for kind in ACTIVITY_KINDS}
+
+    def activity_top(self, kind, column, days, limit=5):
+        if column in ACTIVITY_ROLLUP.dimensions:
+            return self.rollup_query(ACTIVITY_ROLLUP, "SUM(events) AS n", days, column, "kind = ?", (kind,),
+                                     f" ORDER BY n DESC, {column} LIMIT {int(limit)}")
+        column = check_dimension(column, ACTIVITY_DIMENSIONS)
+        return self.query(
+            f"SELECT {column}, COUNT(*) AS n FROM activity WHERE kind = ? AND ts >= ?"
+            f" GROUP BY {column} ORDER BY n DESC, {column} LIMIT ?",
+            (kind, self.since(days), limit))
+
+    def activity_top_per_group(self, kind, group, column, days, limit=3):
+        group = check_dimension(group, ACTIVITY_DIMENSIONS)
+        column = check_dimension(column, ACTIVITY_DIMENSIONS)
+        return self.query(
+            f"SELECT {group}, {column}, n FROM ("
+            f" SELECT {group}, {column}, COUNT(*) AS n,"
+            f" ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY COUNT(*) DESC, {column}) AS rank"
+            f" FROM activity WHERE kind = ? AND ts >= ? GROUP BY {group}, {column})"
+            f" WHERE rank <= ? ORDER BY {group}, n DESC",
+            (kind, self.since(days), limit))
+
+    def developers(self, days):
+        # (all developers, developers active in the window)
+        return self.query(
+            "SELECT COUNT(DISTINCT developer), COUNT(DISTINCT CASE WHEN ts >= ? THEN developer END) FROM activity",
+            (self.since(days),))[0]
+
+    def developers_by(self, column):
+        column = check_dimension(column, ACTIVITY_DIMENSIONS)
+        return self.query(
+            f"SELECT {column}, COUNT(DISTINCT developer) FROM activity GROUP BY {column} ORDER BY {column}")
+
+    def distinct_objects(self, kind, days):
+        return self.query(
+            "SELECT COUNT(DISTINCT object) FROM activity WHERE kind = ? AND ts >= ?",
+            (kind, self.since(days)))[0][0]
+
+    # Metadata catalog
+
+    def model_summary(self):
+        # Counts over Model entries; commands are only counted.
+        names = ("protected", "documented", "public", "introspected", "with_relationships")
+        rows = {kind: row for kind, *row in self.query(
+            "SELECT kind, COUNT(*), SUM(protected), SUM(documented), SUM(public), SUM(introspected),"
+            " SUM(has_relationships) FROM models GROUP BY kind")}
+        models = rows.get("Model", [0] * (len(names) + 1))
+        summary = {"models": models[0], "commands": rows.get("Command", [0])[0]}
+        summary.update((name, value or 0) for name, value in zip(names, models[1:]))
+        return summary
+
+    def deprecated_models(self):
+        return self.query(
+            "SELECT subgraph, SUM(deprecated) FROM models GROUP BY subgraph ORDER BY subgraph")
+
+    def replace_catalog(self, models, roles):
+        # Swaps the models and roles tables for the given rows. The rows go
+        # into temporary tables of the same names, which shadow the stored
+        # ones for this connection only, so the store itself is never
+        # written to. All of it happens under one lock, so no query sees a
+        # half-loaded catalog.
+        with self.lock:
+            for table, columns, rows in (("models", MODEL_COLUMNS, models), ("roles", ROLE_COLUMNS, roles)):
+                self.connection.execute(f"DROP TABLE IF EXISTS temp.{table}")
+                self.connection.execute(f"CREATE TEMP TABLE {table} AS SELECT * FROM main.{table} LIMIT 0")
+                self.connection.executemany(f"INSERT INTO temp.{table} VALUES ({', '.join('?' * len(columns))})",
+                                            rows)
+            if isinstance(self.connection, sqlite3.Connection):
+                self.connection.commit()
+
+    def roles(self):
+        # (number of roles, role granted on the most models)
+        count = self.query("SELECT COUNT(DISTINCT role) FROM roles")[0][0]
+        top = self.query("SELECT role, COUNT(*) AS n FROM roles GROUP BY role ORDER BY n DESC, role LIMIT 1")
+        return count, top[0][0] if top else None
+
+def drop_stale_rollups(connection):
+    # Rollups are rebuilt from the raw rows, so a rollup table written with
+    # other columns by an older version is dropped rather than migrated.
+    tables = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    for rollup in ROLLUPS:
+        if rollup.table in tables:
+            columns = [column[0] for column in connection.execute(f"SELECT * FROM {rollup.table} LIMIT 0").description]
+            if columns != rollup.columns():
+                connection.execute(f"DROP TABLE {rollup.table}")
+
+def connect_sqlite(path):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    try:
+        connection.execute("SELECT LN(1), CEIL(1)")
+    except sqlite3.OperationalError:
+        # SQLite built without its math functions.
+        connection.create_function("LN", 1, math.log, deterministic=True)
+        connection.create_function("CEIL", 1, math.ceil, deterministic=True)
+    drop_stale_rollups(connection)
+    connection.executescript(SCHEMA)
+    return connection
+
+def sqlite_provider(path):
+    return SQLProvider(connect_sqlite(path), f"sqlite:{path}")
+
+def partition_day(value):
+    try:
+        return int(datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        return 0
+
+def partition_watermarks(directory):
+    # {day: (Parquet files, latest directory mtime)} for the requests of a
+    # Parquet dataset, taking the day from day=YYYY-MM-DD directories.
+    # Files outside them count for day 0, so a change there invalidates
+    # everything. Only directories are stat'ed: adding, replacing or
+    # removing a file changes its directory's mtime.
+    watermarks = {}
+    stack = [(os.path.join(directory, "requests"), None)]
+    while stack:
+        path, day = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                entries = list(entries)
+            mtime = os.stat(path).st_mtime_ns if day is not None else 0
+        except FileNotFoundError:
+            continue
+        files = 0
+        for entry in entries:
+            if entry.is_dir():
+                stack.append((entry.path, partition_day(entry.name[4:]) if entry.name.startswith("day=") else day or 0))
+            elif entry.name.endswith(".parquet"):
+                files += 1
+        count, latest = watermarks.get(day or 0, (0, 0))
+        watermarks[day or 0] = (count + files, max(latest, mtime))
+    return watermarks
+
+def read_parquet(path, options=""):
+    quoted = path.replace("'", "''")
+    return f"read_parquet('{quoted}'{options})"
+
+def duckdb_provider(path):
+    # `path` is a DuckDB database file, or a directory of Parquet files:
+    # requests/**/*.parquet (optionally hive-partitioned) plus activity,
+    # models and roles .parquet files next to it.
+    if duckdb is None:
+        raise ValueError("duckdb is not installed; use a SQLite store instead")
+    directory = os.path.isdir(path)
+    connection = duckdb.connect(":memory:" if directory else path)
+    drop_stale_rollups(connection)
+    for statement in SCHEMA.split(";"):
+        if "CREATE TABLE" in statement and not (directory and "EXISTS requests" in statement):
+            connection.execute(statement)
+    if directory:
+        requests = read_parquet(os.path.join(path, "requests", "**", "*.parquet"), ", hive_partitioning = true")
+        connection.execute(f"CREATE VIEW requests AS SELECT * FROM {requests}")
+        for table in ("activity", "models", "roles"):
+            table_path = os.path.join(path, f"{table}.parquet")
+            if os.path.exists(table_path):
+                connection.execute(f"INSERT INTO {table} SELECT * FROM {read_parquet(table_path)}")
+    return SQLProvider(connection, f"duckdb:{path}", path if directory else None)
+
+def synthetic_provider(requests=50_000, days=30, seed=0):
+    connection = connect_sqlite(":memory:")
+    write_synthetic(connection, requests, days, seed)
+    return SQLProvider(connection, "synthetic")
+
+def write_synthetic(connection, requests=50_000, days=30, seed=0, now=None):
+    # Seeded telemetry for tests and demos: skewed traffic over a few teams,
+    # subgraphs and models, log-normal latencies and occasional errors.
+    rng = random.Random(seed)
+    now = int(now or time.time())
+    teams = ["Team A", "Team B", "Team C"]
+    subgraphs = ["Subgraph A", "Subgraph B", "Subgraph C"]
+    models = [(subgraph, f"Model_{i}") for subgraph in subgraphs for i in range(1, 41)]
+    rng.shuffle(models)
+    # Zipf-like popularity, with the tail of the catalog never requested.
+    model_weights = [1 / rank if rank <= len(models) * 0.85 else 0 for rank in range(1, len(models) + 1)]
+    regions = ["us-east", "us-west", "eu-west", "ap-south", "sa-east"]
+    sources = ["postgres", "mongodb", "clickhouse", "http", "snowflake"]
+    errors = ["timeout", "permission_denied", "validation_failed", "upstream_error", "rate_limited"]
+    deprecated_models = {model for model in models if rng.random() < 0.1}
+
+    def request_rows():
+        for model_ref in rng.choices(models, model_weights, k=requests):
+            subgraph, model = model_ref
+            team = teams[subgraphs.index(subgraph)]
+            source = sources[int(model.split("_")[1]) % len(sources)]
+            error = rng.choice(errors) if rng.random() < 0.03 else None
+            yield (
+                now - rng.randrange(days * DAY), team, subgraph, model, f"field_{rng.randrange(1, 13)}",
+                f"/{subgraph.split()[-1].lower()}/{model.lower()}", rng.choice(regions), source, error,
+                round(rng.lognormvariate(4.2, 0.5), 1), rng.randrange(200, 50_000), rng.randrange(0, 2_000),
+                int(model_ref in deprecated_models), int(rng.random() < 0.05),
+            )
+
+    def activity_rows():
+        developers = [f"Dev_{i}" for i in range(1, 61)]
+        for _ in range(requests // 20):
+            developer = rng.choice(developers)
+            team = teams[developers.index(developer) % len(teams)]
+            subgraph = subgraphs[teams.index(team)]
+            kind = rng.choices(ACTIVITY_KINDS, [20, 15, 10, 6, 25, 20, 4])[0]
+            model = rng.choice([model for sub, model in models if sub == subgraph])
+            yield now - rng.randrange(days * DAY), team, subgraph, developer, model, kind
+
+    # Written in time order like a real log, so time-range scans over the ts
+    # index read the table sequentially.
+    connection.executemany(f"INSERT INTO requests VALUES ({', '.join('?' * len(REQUEST_COLUMNS))})",
+                           sorted(request_rows(), key=lambda row: row[0]))
+    connection.executemany(f"INSERT INTO activity VALUES ({', '.join('?' * len(ACTIVITY_COLUMNS))})",
+                           sorted(activity_rows(), key=lambda row: row[0]))
+    connection.executemany(
+        f"INSERT INTO models VALUES ({', '.join('?' * len(MODEL_COLUMNS))})",
+        [(subgraph, model, "Command" if rng.random() < 0.2 else "Model", int(rng.random() < 0.9),
+          int(rng.random() < 0.6), int(rng.random() < 0.01), int(rng.random() < 0.7), int(rng.random() < 0.5),
+          int((subgraph, model) in deprecated_models))
+         for subgraph, model in models])
+    roles = ["admin", "user", "analyst", "service", "guest", "support"]
+    connection.executemany("INSERT INTO roles VALUES (?, ?)",
+                           [(role, model) for _, model in models for role in roles if rng.random() < 0.4])
+    connection.commit()
+
+def load_summary(provider, path):
+    # Replaces the provider's catalog with a metadata analyzer summary, so
+    # the catalog panels show the real models and role grants. The summary
+    # is small and read once; metadata documents are never parsed here.
+    with open(path, encoding="utf-8") as file:
+        summary = json.load(file)
+    if summary.get("version") != SUMMARY_VERSION:
+        raise ValueError(f"Unsupported metadata summary version: {summary.get('version')!r}")
+    provider.replace_catalog([tuple(model[column] for column in MODEL_COLUMNS) for model in summary["models"]],
+                             [tuple(grant) for grant in summary["roles"]])
+    return summary
+
+def get_provider(source=None, summary=None):
+    # `source` (or DASHBOARD_DATA) is "synthetic" (the default), a SQLite
+    # file, or a DuckDB file / Parquet directory (*.duckdb or a directory).
+    # `summary` (or DASHBOARD_METADATA) is a metadata analyzer summary to
+    # take the model catalog from.
+    source = source or os.environ.get("DASHBOARD_DATA") or "synthetic"
+    summary = summary or os.environ.get("DASHBOARD_METADATA")
+    if source == "synthetic":
+        provider = synthetic_provider()
+    elif os.path.isdir(source) or source.endswith(".duckdb"):
+        provider = duckdb_provider(source)
+    else:
+        provider = sqlite_provider(source)
+    if summary:
+        load_summary(provider, summary)
+    return provider
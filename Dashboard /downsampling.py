@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# Per-figure budget: at most MAX_POINTS plotted points (a few dozen bytes of
+# JSON each) and MAX_CATEGORIES bars or slices per axis, colour and facet.
+# Line and scatter plots with more than WEBGL_POINTS points are drawn with
+# WebGL instead of SVG.
+MAX_POINTS = 5000
+MAX_CATEGORIES = 25
+WEBGL_POINTS = 1000
+OTHER = "Other"
+# Plotly Express arguments that split a figure into separate series.
+SERIES_OPTIONS = ("color", "symbol", "line_dash", "line_group", "facet_row", "facet_col", "animation_frame")
+
+def lttb(x, y, threshold):
+    # Indices of the `threshold` points Largest-Triangle-Three-Buckets keeps
+    # from a series sorted by x: the first and last points, and from each
+    # of the buckets in between the point forming the largest triangle with
+    # the previously kept point and the average of the next bucket.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx = x[next_start:next_end].mean()
+        cy = y[next_start:next_end].mean()
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        a = start + int(np.nanargmax(areas)) if not np.isnan(areas).all() else start
+        kept[i + 1] = a
+    return kept
+
+def top_categories(frame, category, values, limit, within=()):
+    # Keeps the `limit` values of `category` with the largest total `values`
+    # (per group of the `within` columns) and sums the other rows into one
+    # OTHER row per group. Non-numeric columns of that row are left empty.
+    within = list(within)
+    totals = frame.groupby(within + [category], sort=False, dropna=False)[values].sum().sum(axis=1)
+    ranks = (totals.groupby(level=within, sort=False, dropna=False) if within else totals).rank(
+        method="first", ascending=False)
+    keep = ranks.index[ranks <= limit]
+    mask = frame.set_index(within + [category]).index.isin(keep)
+    if mask.all():
+        return frame
+    rest = frame[~mask]
+    numeric = [column for column in rest.select_dtypes("number").columns if column not in within]
+    if within:
+        other = rest.groupby(within, sort=False, dropna=False)[numeric].sum().reset_index()
+    else:
+        other = rest[numeric].sum().to_frame().T
+    other[category] = OTHER
+    return pd.concat([frame[mask], other], ignore_index=True)
+
+def top_groups(frame, column, values, limit):
+    # Relabels all but the `limit` largest values of a colour or facet
+    # column as OTHER, so the figure gets at most limit + 1 of them.
+    totals = frame.groupby(column, sort=False, dropna=False)[values].sum().sum(axis=1)
+    if len(totals) <= limit + 1:
+        return frame
+    kept = totals.nlargest(limit).index
+    frame = frame.copy()
+    frame.loc[~frame[column].isin(kept), column] = OTHER
+    return frame
+
+def reduce_categories(frame, category, values, options, max_categories):
+    values = [values] if isinstance(values, str) else list(values)
+    # A column may drive several options at once (colour and facet), and
+    # each column is one level of the grouping.
+    within = list(dict.fromkeys(options[name] for name in SERIES_OPTIONS
+                                if isinstance(options.get(name), str) and options[name] != category))
+    for column in within:
+        frame = top_groups(frame, column, values, max_categories - 1)
+    counts = frame.groupby(within, dropna=False)[category].nunique().max() if within else frame[category].nunique()
+    if counts > max_categories:
+        frame = top_categories(frame, category, values, max_categories - 1, within)
+    return frame
+
+def reduce_series(frame, x, y, options, max_points):
+    # LTTB per series, with the point budget shared between the series.
+    groups = list(dict.fromkeys(options[name] for name in SERIES_OPTIONS if isinstance(options.get(name), str)))
+    if groups:
+        series = list(frame.groupby(groups[0] if len(groups) == 1 else groups, sort=False, dropna=False))
+    else:
+        series = [(None, frame)]
+    budget = max(max_points // len(series), 3)
+    parts = []
+    for _, part in series:
+        part = part.sort_values(x)
+        xs = part[x]
+        if pd.api.types.is_datetime64_any_dtype(xs):
+            xs = xs.astype("int64")
+        parts.append(part.iloc[lttb(xs.to_numpy(), part[y].to_numpy(dtype=float), budget)])
+    return pd.concat(parts)
+
+def fit_budget(kind, frame, options, max_points=MAX_POINTS, max_categories=MAX_CATEGORIES):
+    # Reduces `frame` for a Plotly Express `kind` chart drawn with `options`
+    # to fit the figure budget: top categories plus OTHER for bars and pies,
+    # LTTB for line and scatter series. Other charts pass through.
+    if not isinstance(frame, pd.DataFrame):
+        return frame
+    if kind == "pie":
+        category, values = options.get("names"), options.get("values")
+    elif kind == "bar":
+        category, values = options.get("x"), options.get("y")
+        if options.get("orientation") == "h":
+            category, values = values, category
+    elif kind in ("line", "scatter"):
+        x, y = options.get("x"), options.get("y")
+        if isinstance(x, str) and isinstance(y, str) and len(frame) > max_points:
+            return reduce_series(frame, x, y, options, max_points)
+        return frame
+    else:
+        return frame
+    if not isinstance(category, str) or values is None:
+        return frame
+    return reduce_categories(frame, category, values, options, max_categories)
@@ -0,0 +1,107 @@
+import heapq
+import json
+from collections import Counter
+
+CAPACITY = 200
+
+class SpaceSaving:
+    # Space-Saving top-k summary holding at most `capacity` keys. Each held
+    # count overestimates the true count by at most its error, and no key
+    # that is not held has a true count above `floor`, which never exceeds
+    # total / capacity. Single adds are buffered and applied in batches;
+    # batches and whole summaries merge with the mergeable Space-Saving rule
+    # (a key missing from one side is charged that side's floor).
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+        self.total = 0
+        self.pending = Counter()
+
+    def add(self, key, count=1):
+        self.pending[key] += count
+        if len(self.pending) >= self.capacity:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            pending, self.pending = self.pending, Counter()
+            self.update(pending)
+
+    def update(self, counts):
+        # Adds exact `counts` ({key: count}) for a batch of events.
+        floor = self.floor
+        held, errors = self.counts, self.errors
+        total = 0
+        for key, count in counts.items():
+            total += count
+            if key in held:
+                held[key] += count
+            else:
+                held[key] = floor + count
+                errors[key] = floor
+        self.total += total
+        self.truncate()
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        held, errors = self.counts, self.errors
+        if other.floor:
+            for key in held.keys() - other.counts.keys():
+                held[key] += other.floor
+                errors[key] += other.floor
+        for key, count in other.counts.items():
+            if key in held:
+                held[key] += count
+                errors[key] += other.errors[key]
+            else:
+                held[key] = self.floor + count
+                errors[key] = self.floor + other.errors[key]
+        self.floor += other.floor
+        self.total += other.total
+        self.truncate()
+        return self
+
+    def truncate(self):
+        if len(self.counts) <= self.capacity:
+            return
+        kept = heapq.nlargest(self.capacity, self.counts.items(), key=lambda item: item[1])
+        self.counts = dict(kept)
+        self.errors = {key: self.errors[key] for key in self.counts}
+        self.floor = max(self.floor, kept[-1][1])
+
+    def top(self, limit):
+        # [(key, estimated count, maximum overcount)], largest first.
+        self.flush()
+        items = heapq.nlargest(limit, self.counts.items(), key=lambda item: (item[1], item[0]))
+        return [(key, count, self.errors[key]) for key, count in items]
+
+    def guaranteed(self, limit):
+        # How many of top(limit) are certainly in the true top `limit`: their
+        # lower bound beats the upper bound of everything ranked below.
+        ranked = self.top(limit + 1)
+        runner_up = ranked[limit][1] if len(ranked) > limit else self.floor
+        return sum(1 for _, count, error in ranked[:limit] if count - error >= runner_up)
+
+    def to_json(self):
+        self.flush()
+        return json.dumps({
+            "capacity": self.capacity,
+            "floor": self.floor,
+            "total": self.total,
+            "items": [[key, count, self.errors[key]] for key, count in self.counts.items()],
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        summary = cls(data["capacity"])
+        summary.floor = data["floor"]
+        summary.total = data["total"]
+        for key, count, error in data["items"]:
+            key = tuple(key) if isinstance(key, list) else key
+            summary.counts[key] = count
+            summary.errors[key] = error
+        return summary
@@ -0,0 +1,321 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from data_provider import DAY, REQUEST_COLUMNS, sqlite_provider
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Gateway request logs are JSON lines (optionally gzip-compressed) with one
+# object per request, keyed like REQUEST_COLUMNS; "timestamp" is accepted
+# for "ts" as epoch seconds, epoch milliseconds or an ISO 8601 string.
+LOG_SUFFIXES = (".jsonl", ".ndjson", ".log")
+CHUNK_SIZE = 32 << 20
+CHECKPOINT = "_checkpoint.json"
+# Longest first line a log can be identified by.
+IDENTITY_BYTES = 64 << 10
+# Subgraph of requests that name none.
+UNKNOWN_SUBGRAPH = "unknown"
+STRING_COLUMNS = ("team", "subgraph", "model", "field", "endpoint", "region", "data_source")
+if pa is not None:
+    ARROW_TYPES = {column: pa.string() for column in STRING_COLUMNS + ("error",)}
+    ARROW_TYPES.update(ts=pa.int64(), latency_ms=pa.float64(), bytes_served=pa.int64(), bytes_ingested=pa.int64(),
+                       deprecated=pa.int64(), cross_subgraph=pa.int64())
+
+def timestamp(value):
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp())
+    value = int(value)
+    return value // 1000 if value > 100_000_000_000 else value
+
+def text(value):
+    return None if value is None else str(value)
+
+def parse_record(line):
+    # A request without a latency keeps it NULL rather than 0 ms, and one
+    # without a subgraph is stored under UNKNOWN_SUBGRAPH in either store.
+    record = loads(line)
+    error = record.get("error")
+    latency = record.get("latency_ms")
+    strings = [text(record.get(column)) for column in STRING_COLUMNS]
+    strings[1] = strings[1] or UNKNOWN_SUBGRAPH
+    return (
+        timestamp(record["ts"] if "ts" in record else record["timestamp"]),
+        *strings,
+        text(error) if error else None,
+        None if latency is None else float(latency),
+        int(record.get("bytes_served") or 0),
+        int(record.get("bytes_ingested") or 0),
+        int(bool(record.get("deprecated"))),
+        int(bool(record.get("cross_subgraph"))),
+    )
+
+def parse_chunk(data):
+    # (rows, malformed line count) for a block of complete lines.
+    rows = []
+    bad = 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(parse_record(line))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            bad += 1
+    return rows, bad
+
+def partition_path(output, day, subgraph, name):
+    date = datetime.fromtimestamp(day, timezone.utc).strftime("%Y-%m-%d")
+    return os.path.join(output, "requests", f"day={date}", f"subgraph={quote(subgraph, safe=' ')}", name)
+
+def write_partitions(rows, output, name):
+    # One Parquet file per (day, subgraph) partition, hive-style. The
+    # subgraph lives in the directory name only, as pyarrow datasets do.
+    partitions = {}
+    for row in rows:
+        partitions.setdefault((row[0] - row[0] % DAY, row[2]), []).append(row)
+    for (day, subgraph), part in partitions.items():
+        path = partition_path(output, day, subgraph, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns = dict(zip(REQUEST_COLUMNS, zip(*part)))
+        del columns["subgraph"]
+        table = pa.table({column: pa.array(values, ARROW_TYPES[column]) for column, values in columns.items()})
+        # Readers glob *.parquet, so they never see a half-written file
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+def ingest_chunk(job):
+    # Parses one block of log lines. Parquet output is written by the worker
+    # itself; for SQLite the rows go back to the parent, the only writer.
+    data, output, name = job
+    rows, bad = parse_chunk(data)
+    earliest = min(row[0] for row in rows) if rows else None
+    if name is not None:
+        write_partitions(rows, output, name)
+        return len(rows), bad, earliest, None
+    return len(rows), bad, earliest, rows
+
+class ParquetStore:
+    # Hive-partitioned requests/day=.../subgraph=.../part-<file>-<offset>.parquet
+    # files, with the ingested byte ranges of each log in CHECKPOINT. Part
+    # files of ranges missing from the checkpoint are left over from an
+    # interrupted run and are removed, so those ranges can be redone
+    # without duplicating rows.
+    def __init__(self, output):
+        if pa is None:
+            raise ValueError("pyarrow is not installed; ingest into a SQLite store (.db) instead")
+        self.output = output
+        self.checkpoint_path = os.path.join(output, CHECKPOINT)
+        self.files = {}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as file:
+                self.files = json.load(file)
+        done = {self.part_name(file_id, start) for file_id, entry in self.files.items() for start, _ in entry["ranges"]}
+        for directory, _, names in os.walk(os.path.join(output, "requests")):
+            for name in names:
+                if name.endswith(".tmp") or (name.startswith("part-") and name not in done):
+                    os.remove(os.path.join(directory, name))
+
+    def part_name(self, file_id, start):
+        return f"part-{file_id}-{start:012d}.parquet"
+
+    def completed(self, file_id):
+        return [tuple(bounds) for bounds in self.files.get(file_id, {}).get("ranges", [])]
+
+    def job(self, data, file_id, start):
+        return data, self.output, self.part_name(file_id, start)
+
+    def add(self, file_id, path, start, end, rows):
+        entry = self.files.setdefault(file_id, {"path": path, "ranges": []})
+        entry["ranges"].append([start, end])
+        os.makedirs(self.output, exist_ok=True)
+        with open(self.checkpoint_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self.files, file)
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def close(self, earliest):
+        # Nothing to invalidate here: dashboards reading the dataset notice
+        # the new files of each day and rebuild that day's summaries
+        # (SQLProvider.check_partitions).
+        pass
+
+class SQLiteStore:
+    # Rows go into the dashboard's requests table in the same transaction
+    # as the byte range they came from, so a range is loaded exactly once.
+    def __init__(self, output):
+        self.provider = sqlite_provider(output)
+        self.connection = self.provider.connection
+        self.connection.execute("CREATE TABLE IF NOT EXISTS ingested_ranges"
+                                " (file TEXT, path TEXT, start_offset INTEGER, end_offset INTEGER)")
+        self.insert = f"INSERT INTO requests VALUES ({', '.join('?' * len(REQUEST_COLUMNS))})"
+
+    def completed(self, file_id):
+        return self.connection.execute("SELECT start_offset, end_offset FROM ingested_ranges WHERE file = ?",
+                                       (file_id,)).fetchall()
+
+    def job(self, data, file_id, start):
+        return data, None, None
+
+    def add(self, file_id, path, start, end, rows):
+        with self.connection:
+            self.connection.executemany(self.insert, rows)
+            self.connection.execute("INSERT INTO ingested_ranges VALUES (?, ?, ?, ?)", (file_id, path, start, end))
+
+    def close(self, earliest):
+        # Summaries already built over the period the new rows fall in are
+        # rebuilt on the next dashboard refresh
+        if earliest is not None:
+            self.provider.discard_summaries(earliest)
+        self.connection.close()
+
+def open_store(output):
+    if output.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteStore(output)
+    return ParquetStore(output)
+
+def log_files(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for directory, _, names in os.walk(source):
+                paths.extend(os.path.join(directory, name) for name in names
+                             if name.removesuffix(".gz").endswith(LOG_SUFFIXES))
+        else:
+            paths.append(source)
+    return sorted(paths)
+
+def open_log(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def file_identity(path):
+    # Logs are told apart by content alone: the first line of the
+    # decompressed stream, which carries the first request's id and time.
+    # A log keeps its identity when rotated, compressed or copied, and
+    # growing it never changes it; a truncated or replaced file starts with
+    # another request and counts as new. None for a file without a complete
+    # line yet.
+    with open_log(path) as file:
+        first = file.readline(IDENTITY_BYTES)
+    if not first.endswith(b"\n"):
+        return None
+    return hashlib.blake2b(first, digest_size=8).hexdigest()
+
+def gaps(ranges):
+    # Byte ranges not yet ingested, given the ingested ones; the last gap
+    # runs to the end of the file (end None).
+    position = 0
+    for start, end in sorted(ranges):
+        if start > position:
+            yield position, start
+        position = max(position, end)
+    yield position, None
+
+def log_chunks(file, ranges, chunk_size=CHUNK_SIZE):
+    # (offset, data) blocks of about `chunk_size` bytes of complete lines
+    # covering the gaps in `ranges`. Offsets are in the uncompressed
+    # stream. A final line without a newline is only taken if it parses,
+    # since the log may still be being written.
+    position = 0
+    for start, end in gaps(ranges):
+        if start != position:
+            file.seek(start)
+            position = start
+        pending = b""
+        while end is None or position < end:
+            block = file.read(chunk_size if end is None else min(chunk_size, end - position))
+            if not block:
+                break
+            position += len(block)
+            data = pending + block
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                yield position - len(data), data[:cut]
+            pending = data[cut:]
+        if pending:
+            try:
+                loads(pending)
+            except ValueError:
+                continue
+            yield position - len(pending), pending
+
+def ingest(sources, output, processes=None, chunk_size=CHUNK_SIZE):
+    # Loads the request logs in `sources` (files or directories) into
+    # `output`: a SQLite store (*.db) or a Parquet dataset directory. Blocks
+    # of lines are parsed on all cores; ranges ingested by earlier runs are
+    # skipped, so the same logs can be ingested again as they grow.
+    store = open_store(output)
+    processes = processes or os.cpu_count() or 1
+    stats = {"files": 0, "bytes": 0, "records": 0, "malformed": 0}
+    earliest = None
+    start_time = time.perf_counter()
+
+    def finish(file_id, path, start, data, result):
+        nonlocal earliest
+        records, bad, first, rows = result
+        store.add(file_id, path, start, start + len(data), rows)
+        stats["bytes"] += len(data)
+        stats["records"] += records
+        stats["malformed"] += bad
+        if first is not None:
+            earliest = first if earliest is None else min(earliest, first)
+
+    executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    pending = {}
+    try:
+        for path in log_files(sources):
+            file_id = file_identity(path)
+            if file_id is None:
+                continue
+            stats["files"] += 1
+            with open_log(path) as file:
+                for start, data in log_chunks(file, store.completed(file_id), chunk_size):
+                    job = store.job(data, file_id, start)
+                    if executor is None:
+                        finish(file_id, path, start, data, ingest_chunk(job))
+                        continue
+                    # At most two blocks per worker in flight bounds memory
+                    while len(pending) >= 2 * processes:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(*pending.pop(future), future.result())
+                    pending[executor.submit(ingest_chunk, job)] = (file_id, path, start, data)
+        for future, chunk in pending.items():
+            finish(*chunk, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        store.close(earliest)
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--processes=")]
+    processes = [int(arg.split("=", 1)[1]) for arg in sys.argv[1:] if arg.startswith("--processes=")]
+    if len(args) < 2:
+        print("Usage: python ingest.py output.db|parquet_dir log_file_or_dir ... [--processes=N]")
+    else:
+        stats = ingest(args[1:], args[0], processes[0] if processes else None)
+        rate = stats["bytes"] / 2 ** 20 / stats["seconds"] * 60 if stats["seconds"] else 0
+        print(f"Ingested {stats['records']:,} requests ({stats['bytes'] / 2 ** 20:.1f} MB) from {stats['files']} "
+              f"file(s) in {stats['seconds']:.1f}s ({rate:,.0f} MB/min), {stats['malformed']:,} malformed lines skipped")
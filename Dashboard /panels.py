@@ -0,0 +1,103 @@
+import json
+import os
+import time
+import tracemalloc
+
+import plotly.express as px
+import streamlit as st
+from data_provider import get_provider
+from downsampling import WEBGL_POINTS, fit_budget
+from scheduler import RefreshScheduler
+
+# Panel data and figures are recomputed at most this often (seconds).
+DATA_TTL = 60
+# DASHBOARD_PROFILE=1 adds a sidebar table of per-panel timings and peak
+# memory. Memory is traced with tracemalloc for the whole process, which
+# slows every panel down while it is on.
+PROFILE = bool(os.environ.get("DASHBOARD_PROFILE"))
+if PROFILE and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Data source shared by all sessions; set DASHBOARD_DATA to a SQLite file,
+# DuckDB file or Parquet directory to show real telemetry
+@st.cache_resource
+def data_provider():
+    return get_provider()
+
+# Background refresher shared by all sessions, so backend queries scale with
+# the number of panels rather than the number of viewers
+@st.cache_resource
+def refresh_scheduler():
+    return RefreshScheduler()
+
+# Plotly figures are built once per dataset and reused across reruns. The
+# data is first reduced to the figure budget, and large line and scatter
+# plots switch to WebGL.
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def build_chart(kind, data, **options):
+    data = fit_budget(kind, data, options)
+    if kind in ("line", "scatter") and len(data) > WEBGL_POINTS:
+        options.setdefault("render_mode", "webgl")
+    return getattr(px, kind)(data, **options)
+
+def chart(kind, data, **options):
+    # Time spent building (or fetching) figures counts towards the panel
+    # being rendered.
+    start = time.perf_counter()
+    figure = build_chart(kind, data, **options)
+    st.session_state["figure_seconds"] = st.session_state.get("figure_seconds", 0) + time.perf_counter() - start
+    return figure
+
+# One dashboard panel: `load` queries its data, which the shared scheduler
+# refreshes every `interval` seconds, and `render` draws the latest snapshot.
+# Panels are fragments, so their refresh button reruns only the panel itself.
+@st.fragment
+def panel(name, load, render, interval=DATA_TTL):
+    scheduler = refresh_scheduler()
+    key = (load.__code__.co_filename, load.__qualname__)
+    snapshot = scheduler.get(key, load, interval)
+    st.session_state["figure_seconds"] = 0
+    if PROFILE:
+        # Peak above the allocation at the start of the figure build and
+        # render. The query runs in the scheduler's threads and is shared
+        # by all sessions, so it is not counted. tracemalloc keeps one peak
+        # per process, so panels drawn by other sessions at the same time
+        # overlap.
+        start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    render(snapshot.value)
+    figure_time = st.session_state.pop("figure_seconds")
+    render_time = time.perf_counter() - start - figure_time
+    timings = {
+        "panel": name,
+        "query ms": snapshot.duration * 1000,
+        "data age s": time.time() - snapshot.updated,
+        "figure ms": figure_time * 1000,
+        "render ms": render_time * 1000,
+    }
+    if PROFILE:
+        timings["peak MB"] = max(tracemalloc.get_traced_memory()[1] - start_memory, 0) / 1e6
+    st.session_state.setdefault("panel_timings", {})[name] = timings
+    col1, col2 = st.columns([8, 1])
+    with col1:
+        st.caption(f"Data as of {time.strftime('%H:%M:%S', time.localtime(snapshot.updated))} "
+                   f"(query {snapshot.duration * 1000:.0f} ms), figure {figure_time * 1000:.0f} ms, "
+                   f"render {render_time * 1000:.0f} ms")
+    with col2:
+        # The callback runs before the fragment reruns, so the rerun shows
+        # the fresh snapshot
+        st.button("Refresh", key=f"refresh_{name}", on_click=scheduler.refresh, args=(key,))
+
+# Debug sidebar with the latest timings and peak memory of every panel this
+# session drew. Query times come from the background refresh that produced
+# the data.
+def debug_sidebar():
+    timings = st.session_state.get("panel_timings")
+    if not PROFILE or not timings:
+        return
+    with st.sidebar.expander("Panel timings", expanded=True):
+        rows = sorted(timings.values(), key=lambda row: -(row["figure ms"] + row["render ms"]))
+        st.dataframe(rows, hide_index=True)
+        st.download_button("Download timings", json.dumps(rows, indent=2), file_name="panel_timings.json",
+                           mime="application/json")
@@ -0,0 +1,54 @@
+import itertools
+import os
+import sys
+
+import pandas as pd
+
+from benchmark import write_logs
+from data_provider import sqlite_provider, write_synthetic
+from downsampling import fit_budget
+from ingest import ingest
+
+# The harness (regression_suite.py) is shared with the metadata analyzer and
+# lives at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import regression_suite
+
+# Benchmark regression cases of the dashboards' data path, timed by
+# regression_suite.py against regression_baseline.json.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression_baseline.json")
+
+def refresh(provider):
+    provider.discard_summaries(0)
+    provider.refresh_rollups()
+    provider.refresh_sketches()
+    provider.refresh_heavy_hitters()
+
+def cases(tmp, scale):
+    # 8 MB of gateway logs and a 100,000 request store per scale step.
+    logs = os.path.join(tmp, "logs")
+    os.mkdir(logs)
+    write_logs(logs, 8 * scale, seed=0)
+    outputs = (os.path.join(tmp, f"ingest-{run}.db") for run in itertools.count())
+
+    provider = sqlite_provider(os.path.join(tmp, "telemetry.db"))
+    write_synthetic(provider.connection, 100_000 * scale, seed=0)
+    refresh(provider)
+    series = pd.DataFrame(provider.success_rate_series("model", 7), columns=["Time", "Model", "Success Rate"])
+    series["Time"] = pd.to_datetime(series["Time"], unit="s")
+    return {
+        "ingest logs": lambda: ingest([logs], next(outputs), processes=1),
+        "refresh summaries": lambda: refresh(provider),
+        "request_totals": lambda: provider.request_totals(30),
+        "latency_percentiles": lambda: provider.latency_percentiles(30),
+        "latency_summary_by team": lambda: provider.latency_summary_by("team", 30),
+        "heavy_hitters fields": lambda: provider.heavy_hitters("fields", 30, 10),
+        "success_rate_by subgraph": lambda: provider.success_rate_by("subgraph", 30),
+        "success_rate_series": lambda: provider.success_rate_series("subgraph", 1),
+        "top_by region": lambda: provider.top_by("region", 30),
+        "model_summary": provider.model_summary,
+        "fit_budget line": lambda: fit_budget("line", series, {"x": "Time", "y": "Success Rate", "color": "Model"}),
+    }
+
+if __name__ == "__main__":
+    regression_suite.main("Dashboard data benchmarks", cases, BASELINE, sys.argv[1:])
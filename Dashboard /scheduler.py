@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = 4
+# Panels nobody has looked at for this long stop being refreshed until the
+# next read.
+IDLE_AFTER = 600
+
+# One published result of a panel's load function. Snapshots are replaced,
+# never modified, so sessions may render them without copying.
+Snapshot = namedtuple("Snapshot", "value updated duration")
+
+class Job:
+    __slots__ = ("load", "interval", "snapshot", "error", "due", "future", "last_read")
+
+    def __init__(self, load, interval):
+        self.load = load
+        self.interval = interval
+        self.snapshot = None
+        self.error = None
+        self.due = 0
+        self.future = None
+        self.last_read = time.monotonic()
+
+class RefreshScheduler:
+    # Process-wide stale-while-revalidate cache for panel data. Each panel's
+    # load function runs on its own interval in a thread pool, whatever the
+    # number of sessions, and readers get the latest snapshot immediately;
+    # only the very first read of a panel waits for a query.
+    def __init__(self, workers=WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="panel-refresh")
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="panel-scheduler", daemon=True)
+        self.thread.start()
+
+    def get(self, key, load, interval):
+        now = time.monotonic()
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                job = self.jobs[key] = Job(load, interval)
+            # Script reruns define fresh function objects; keep the newest
+            job.load = load
+            job.interval = min(job.interval, interval)
+            job.last_read = now
+            if job.due <= now:
+                self.submit(job)
+            future, snapshot = job.future, job.snapshot
+        if snapshot is None:
+            future.result()
+            snapshot = job.snapshot
+            if snapshot is None:
+                raise job.error
+        return snapshot
+
+    def refresh(self, key):
+        # Forces a refresh and waits for it, e.g. for a panel's Refresh button.
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            job.due = 0
+            self.submit(job)
+            future = job.future
+        future.result()
+
+    def submit(self, job):
+        # Called with the lock held; at most one refresh per job is in flight.
+        if job.future is None or job.future.done():
+            job.future = self.pool.submit(self.load, job)
+
+    def load(self, job):
+        start = time.monotonic()
+        try:
+            value = job.load()
+        except Exception as error:
+            # Keep serving the last good snapshot and retry on the next tick
+            job.error = error
+        else:
+            job.snapshot = Snapshot(value, time.time(), time.monotonic() - start)
+            job.error = None
+        with self.lock:
+            job.due = time.monotonic() + job.interval
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.clear()
+            now = time.monotonic()
+            wait = IDLE_AFTER
+            with self.lock:
+                for job in self.jobs.values():
+                    if now - job.last_read > IDLE_AFTER:
+                        continue
+                    if job.due <= now:
+                        self.submit(job)
+                    else:
+                        wait = min(wait, job.due - now)
+            self.wakeup.wait(wait)
@@ -0,0 +1,111 @@
+import math
+import struct
+from array import array
+from operator import add
+
+RELATIVE_ACCURACY = 0.01
+# Latencies at or below this many milliseconds share one bucket.
+MIN_LATENCY = 0.001
+HEADER = struct.Struct("<dqqddq")
+
+class LatencySketch:
+    # DDSketch-style quantile sketch: values fall into logarithmic buckets
+    # ceil(log_gamma(x)), so every quantile is within RELATIVE_ACCURACY of
+    # the true value. Counts are kept in a dense array starting at `offset`,
+    # which makes merging two sketches an element-wise add. Min and max are
+    # exact.
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = 0
+        self.bins = array("q")
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value, count=1):
+        if value > MIN_LATENCY:
+            self.add_key(self.key(value), count, value, value)
+        else:
+            self.add_key(None, count, value, value)
+
+    def add_key(self, key, count, low, high):
+        # Adds `count` values already mapped to bucket `key` (None for the
+        # zero bucket) whose smallest and largest are `low` and `high`.
+        if key is None:
+            self.zero_count += count
+        else:
+            self.extend(key, key + 1)
+            self.bins[key - self.offset] += count
+        self.count += count
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def extend(self, start, end):
+        if not self.bins:
+            self.offset = start
+            self.bins = array("q", bytes(8 * (end - start)))
+            return
+        if start < self.offset:
+            self.bins = array("q", bytes(8 * (self.offset - start))) + self.bins
+            self.offset = start
+        if end > self.offset + len(self.bins):
+            self.bins.extend(array("q", bytes(8 * (end - self.offset - len(self.bins)))))
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if other.bins:
+            self.extend(other.offset, other.offset + len(other.bins))
+            start = other.offset - self.offset
+            end = start + len(other.bins)
+            self.bins[start:end] = array("q", map(add, self.bins[start:end], other.bins))
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return self.min
+        for i, count in enumerate(self.bins):
+            seen += count
+            if seen > rank:
+                value = 2 * self.gamma ** (self.offset + i) / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+    def to_bytes(self):
+        return HEADER.pack(self.relative_accuracy, self.count, self.zero_count, self.min, self.max,
+                           self.offset) + self.bins.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        relative_accuracy, count, zero_count, low, high, offset = HEADER.unpack_from(data)
+        sketch = cls(relative_accuracy)
+        sketch.count, sketch.zero_count, sketch.min, sketch.max, sketch.offset = count, zero_count, low, high, offset
+        sketch.bins.frombytes(data[HEADER.size:])
+        return sketch
+
+def merge_sketches(sketches, relative_accuracy=RELATIVE_ACCURACY):
+    merged = LatencySketch(relative_accuracy)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
@@ -0,0 +1,295 @@
+import mmap
+import os
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+
+from json_backend import get_backend
+from profiling import stage
+
+CONTAINERS = (dict, list)
+RESERVOIR_SIZE = 5
+
+def analyze_metadata(source, streaming=False, exact_paths=False):
+    # `source` is a file path, bytes/bytearray/memoryview/mmap, or a binary
+    # file object such as Streamlit's UploadedFile.
+    return collect_source(source, streaming, exact_paths).results()
+
+def analyze_data(data, recursive=False, exact_paths=False):
+    return collect(data, recursive, exact_paths).results()
+
+def collect_source(source, streaming=False, exact_paths=False, index=None):
+    # With `index` (a MetadataIndex), the document is also indexed into it
+    # from the same parse.
+    with open_buffer(source) as buffer:
+        if streaming:
+            from streaming import collect_buffer
+            with stage("parse + traverse (streaming)"):
+                return collect_buffer(buffer, exact_paths=exact_paths, index=index)
+        with stage("parse"):
+            data = load_buffer(buffer)
+    if index is not None:
+        from metadata_index import build_index
+        with stage("index"):
+            build_index(data, index)
+    return collect(data, exact_paths=exact_paths)
+
+@contextmanager
+def open_buffer(source):
+    # Yields the raw bytes of `source` without an extra copy: local files are
+    # memory-mapped and in-memory uploads are used through their own buffer.
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+    elif hasattr(source, "getbuffer"):
+        with source.getbuffer() as view:
+            yield view
+    elif hasattr(source, "read"):
+        content = source.read()
+        yield content.encode() if isinstance(content, str) else content
+    else:
+        yield source
+
+def load_buffer(buffer):
+    return get_backend().loads(buffer)
+
+def collect(data, recursive=False, exact_paths=False):
+    partial = PartialResult(exact_paths)
+    walk = traverse_recursive if recursive else traverse
+    with stage("traverse"):
+        walk(data, partial.descriptions, partial.relaxed_permissions, partial.relationships)
+    return partial
+
+def field_counts():
+    return {"null": 0, "non_null": 0}
+
+def relationship_counts():
+    return {"source": 0, "target": 0}
+
+class PartialResult:
+    # Everything analyze_metadata aggregates, kept in a form that can be merged
+    # with the result of another document (and pickled between processes)
+    # before the final numbers are computed.
+    def __init__(self, exact_paths=False):
+        self.descriptions = ExactDescriptions() if exact_paths else NormalizedDescriptions()
+        self.relaxed_permissions = []
+        self.relationships = defaultdict(relationship_counts)
+
+    def merge(self, other, label=None):
+        self.descriptions.merge(other.descriptions, label)
+        self.relaxed_permissions.extend(other.relaxed_permissions)
+        for model, counts in other.relationships.items():
+            self.relationships[model]["source"] += counts["source"]
+            self.relationships[model]["target"] += counts["target"]
+        return self
+
+    def results(self):
+        with stage("aggregate"):
+            return build_results(self.descriptions, self.relaxed_permissions, self.relationships)
+
+class ExactDescriptions:
+    # One entry per concrete path, e.g. "subgraphs[0].objects[12].definition.description",
+    # and one row per non-null value.
+    normalized = False
+
+    def __init__(self):
+        self.fields = defaultdict(field_counts)
+        self.non_null = []
+
+    def add(self, path, value, indices=None):
+        if value:
+            self.fields[path]["non_null"] += 1
+            self.non_null.append({"path": path, "value": value})
+        else:
+            self.fields[path]["null"] += 1
+
+    def merge(self, other, label=None):
+        # Concrete paths are only unique within a document, so merged ones
+        # are qualified with the document label.
+        prefix = f"{label}:" if label is not None else ""
+        for path, counts in other.fields.items():
+            field = self.fields[prefix + path]
+            field["null"] += counts["null"]
+            field["non_null"] += counts["non_null"]
+        self.non_null.extend({"path": prefix + row["path"], "value": row["value"]} for row in other.non_null)
+
+    def rows(self):
+        return self.non_null
+
+class NormalizedDescriptions:
+    # One entry per schema path with list indices collapsed, e.g.
+    # "subgraphs[*].objects[*].definition.description". Non-null values are
+    # sampled into a fixed-size reservoir per path so memory follows the
+    # shape of the schema rather than the number of objects.
+    normalized = True
+
+    def __init__(self, reservoir_size=RESERVOIR_SIZE, seed=0):
+        self.fields = defaultdict(field_counts)
+        self.examples = {}
+        self.reservoir_size = reservoir_size
+        self.rng = random.Random(seed)
+
+    def add(self, path, value, indices=None):
+        field = self.fields[path]
+        if not value:
+            field["null"] += 1
+            return
+        field["non_null"] += 1
+        examples = self.examples.setdefault(path, [])
+        if len(examples) < self.reservoir_size:
+            examples.append((indices, value))
+        else:
+            slot = self.rng.randrange(field["non_null"])
+            if slot < self.reservoir_size:
+                examples[slot] = (indices, value)
+
+    def merge(self, other, label=None):
+        for path, counts in other.fields.items():
+            field = self.fields[path]
+            seen, other_seen = field["non_null"], counts["non_null"]
+            field["null"] += counts["null"]
+            field["non_null"] += other_seen
+            if path not in other.examples:
+                continue
+            theirs = [([label, *indices] if label is not None and indices is not None else indices, value)
+                      for indices, value in other.examples[path]]
+            ours = self.examples.get(path, [])
+            # Draw without replacement from the union of both populations:
+            # each draw comes from a side with probability proportional to how
+            # many values that side has left, which keeps the merged reservoir
+            # a uniform sample of all values seen.
+            merged = []
+            while len(merged) < self.reservoir_size and (ours or theirs):
+                if self.rng.randrange(seen + other_seen) < seen:
+                    merged.append(ours.pop(self.rng.randrange(len(ours))))
+                    seen -= 1
+                else:
+                    merged.append(theirs.pop(self.rng.randrange(len(theirs))))
+                    other_seen -= 1
+            self.examples[path] = merged
+
+    def rows(self):
+        return [
+            {
+                "path": path,
+                "count": self.fields[path]["non_null"],
+                "example_indices": [list(indices) for indices, _ in examples],
+                "example_values": [value for _, value in examples],
+            }
+            for path, examples in self.examples.items()
+        ]
+
+def traverse(data, descriptions, relaxed_permissions, relationships):
+    # Explicit-stack depth-first walk visiting nodes in the same order as
+    # traverse_recursive. The stack doubles as the path table: each entry holds
+    # its key/index segment and the path string is only joined (and cached on
+    # the entry) when a description needs it.
+    # Entries are [items iterator, is_map, segment, path or None, container].
+    normalized = descriptions.normalized
+    if isinstance(data, dict):
+        stack = [[iter(data.items()), True, None, '', data]]
+    elif isinstance(data, list):
+        stack = [[iter(enumerate(data)), False, None, '', data]]
+    else:
+        return
+
+    def resolve(depth):
+        start = depth
+        while stack[start][3] is None:
+            start -= 1
+        path = stack[start][3]
+        for i in range(start + 1, depth + 1):
+            segment = stack[i][2]
+            if stack[i - 1][1]:
+                path = f"{path}.{segment}" if path else segment
+            elif normalized:
+                path = f"{path}[*]"
+            else:
+                path = f"{path}[{segment}]"
+            stack[i][3] = path
+        return path
+
+    def list_indices():
+        return [stack[i][2] for i in range(1, len(stack)) if not stack[i - 1][1]]
+
+    push = stack.append
+    while stack:
+        entry = stack[-1]
+        is_map = entry[1]
+        for key, value in entry[0]:
+            if is_map:
+                if key == "description":
+                    path = entry[3]
+                    if path is None:
+                        path = resolve(len(stack) - 1)
+                    current_path = f"{path}.{key}" if path else key
+                    descriptions.add(current_path, value, list_indices() if normalized else None)
+
+                if key == "kind" and value == "ModelPermissions":
+                    analyze_permissions(entry[4], relaxed_permissions)
+
+                if key == "kind" and value == "Relationship":
+                    analyze_relationship(entry[4], relationships)
+
+            if isinstance(value, CONTAINERS):
+                if isinstance(value, dict):
+                    push([iter(value.items()), True, key, None, value])
+                else:
+                    push([iter(enumerate(value)), False, key, None, value])
+                break
+        else:
+            stack.pop()
+
+def traverse_recursive(data, descriptions, relaxed_permissions, relationships):
+    normalized = descriptions.normalized
+
+    def visit(obj, path='', indices=()):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                current_path = f"{path}.{key}" if path else key
+                if key == "description":
+                    descriptions.add(current_path, value, list(indices) if normalized else None)
+
+                if key == "kind" and value == "ModelPermissions":
+                    analyze_permissions(obj, relaxed_permissions)
+
+                if key == "kind" and value == "Relationship":
+                    analyze_relationship(obj, relationships)
+
+                visit(value, current_path, indices)
+        elif isinstance(obj, list):
+            for i, item in enumerate(obj):
+                current_path = f"{path}[*]" if normalized else f"{path}[{i}]"
+                visit(item, current_path, indices + (i,) if normalized else indices)
+
+    visit(data)
+
+def analyze_permissions(obj, relaxed_permissions):
+    if "definition" in obj and "permissions" in obj["definition"]:
+        for perm in obj["definition"]["permissions"]:
+            if "select" in perm and perm["select"].get("filter") is None:
+                relaxed_permissions.append(obj["definition"]["modelName"])
+
+def analyze_relationship(obj, relationships):
+    if "definition" in obj:
+        source = obj["definition"].get("sourceType", "")
+        target = obj["definition"].get("target", {}).get("model", {}).get("name", "")
+        relationships[source]["source"] += 1
+        relationships[target]["target"] += 1
+
+def build_results(descriptions, relaxed_permissions, relationships):
+    description_fields = descriptions.fields
+    total_description_fields = sum(field["null"] + field["non_null"] for field in description_fields.values())
+    null_description_percentage = sum(field["null"] for field in description_fields.values()) / total_description_fields * 100 if total_description_fields > 0 else 0
+
+    return {
+        "description_fields": len(description_fields),
+        "null_description_percentage": null_description_percentage,
+        "relaxed_permissions": relaxed_permissions,
+        "non_null_descriptions": descriptions.rows(),
+        "relationships": relationships
+    }
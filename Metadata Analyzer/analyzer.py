@@ -1,69 +1,18 @@
-import json
-from collections import defaultdict
+import os
 import streamlit as st
-import matplotlib.pyplot as plt
 import pandas as pd
-import seaborn as sns
-
-def analyze_metadata(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-
-    description_fields = defaultdict(lambda: {"null": 0, "non_null": 0})
-    relaxed_permissions = []
-    non_null_descriptions = []
-    relationships = defaultdict(lambda: {"source": 0, "target": 0})
-
-    def traverse(obj, path=''):
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                current_path = f"{path}.{key}" if path else key
-                if key == "description":
-                    if value:
-                        description_fields[current_path]["non_null"] += 1
-                        non_null_descriptions.append({"path": current_path, "value": value})
-                    else:
-                        description_fields[current_path]["null"] += 1
-                
-                if key == "kind" and value == "ModelPermissions":
-                    analyze_permissions(obj)
-                
-                if key == "kind" and value == "Relationship":
-                    analyze_relationship(obj)
-                
-                traverse(value, current_path)
-        elif isinstance(obj, list):
-            for i, item in enumerate(obj):
-                current_path = f"{path}[{i}]"
-                traverse(item, current_path)
-
-    def analyze_permissions(obj):
-        if "definition" in obj and "permissions" in obj["definition"]:
-            for perm in obj["definition"]["permissions"]:
-                if "select" in perm and perm["select"].get("filter") is None:
-                    relaxed_permissions.append(obj["definition"]["modelName"])
-
-    def analyze_relationship(obj):
-        if "definition" in obj:
-            source = obj["definition"].get("sourceType", "")
-            target = obj["definition"].get("target", {}).get("model", {}).get("name", "")
-            relationships[source]["source"] += 1
-            relationships[target]["target"] += 1
-
-    traverse(data)
-
-    total_description_fields = sum(field["null"] + field["non_null"] for field in description_fields.values())
-    null_description_percentage = sum(field["null"] for field in description_fields.values()) / total_description_fields * 100 if total_description_fields > 0 else 0
-
-    return {
-        "description_fields": len(description_fields),
-        "null_description_percentage": null_description_percentage,
-        "relaxed_permissions": relaxed_permissions,
-        "non_null_descriptions": non_null_descriptions,
-        "relationships": relationships
-    }
-
-def create_charts(results):
+from analysis import collect_source, load_buffer, open_buffer
+from batch import collect_batch
+from cache import ResultCache, content_key
+from chart_frames import graph_frame, relationships_frame
+from incremental import analyze_incremental
+from json_backend import get_backend
+from metadata_index import INDEX_VERSION, MetadataIndex, build_index
+from profiling import Profiler, stage
+from relationship_graph import GRAPH_VERSION, build_graph
+from summary import build_summary
+
+def create_charts(results, graph=None):
     st.title("Metadata Analysis")
 
     st.header("1. Description Fields Analysis")
@@ -81,39 +30,199 @@ def create_charts(results):
         st.write("No models found with relaxed permission rules.")
 
     st.header("3. Models with Most Relationships")
-    relationships_df = pd.DataFrame(results["relationships"]).T.reset_index()
-    relationships_df.columns = ['Model', 'Source', 'Target']
-    relationships_df['Total'] = relationships_df['Source'] + relationships_df['Target']
-    relationships_df = relationships_df.sort_values('Total', ascending=False).head(10)
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    relationships_df.plot(x='Model', y=['Source', 'Target'], kind='bar', stacked=True, ax=ax)
-    ax.set_title("Top 10 Models with Most Relationships")
-    ax.set_xlabel("Model")
-    ax.set_ylabel("Number of Relationships")
-    plt.legend(title="Relationship Type")
-    st.pyplot(fig)
+    with stage("DataFrame build"):
+        relationships_df = relationships_frame(results) if graph is None else graph_frame(graph)
+
+    with stage("figure build"):
+        # Imported on first use: matplotlib's import is the bulk of a cold
+        # start, and headless users of this module never plot
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(12, 6))
+        relationships_df.plot(x='Model', y=['Source', 'Target'], kind='bar', stacked=True, ax=ax)
+        ax.set_title("Top 10 Models with Most Relationships")
+        ax.set_xlabel("Model")
+        ax.set_ylabel("Number of Relationships")
+        plt.legend(title="Relationship Type")
+    with stage("render"):
+        st.pyplot(fig)
 
     st.header("4. Non-null Description Fields")
     if results["non_null_descriptions"]:
-        df = pd.DataFrame(results["non_null_descriptions"])
-        st.dataframe(df)
+        with stage("DataFrame build"):
+            df = pd.DataFrame(results["non_null_descriptions"])
+            if "example_indices" in df:
+                # Batches prefix the document label to the list indices, and
+                # Arrow needs one type per column, so they are shown as text
+                df["example_indices"] = df["example_indices"].astype(str)
+        with stage("render"):
+            st.dataframe(df)
     else:
         st.write("No non-null description fields found.")
 
+def create_index_charts(index, graph=None):
+    st.header("5. Model Permissions and Relationships")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Models", len(index.models))
+    with col2:
+        st.metric("Models without permissions", len(index.models_without_permissions()))
+    with col3:
+        st.metric("Relationships", len(index.relationships))
+
+    roles = index.roles_per_model()
+    if roles:
+        st.write("Roles per model:")
+        st.dataframe(pd.DataFrame({"Model": list(roles), "Roles": [", ".join(r) for r in roles.values()]}))
+    if index.models_without_permissions():
+        st.write("Models without permissions:")
+        st.write(", ".join(index.models_without_permissions()))
+
+    fan_out = index.relationship_fan_out()
+    if fan_out:
+        fan_out_df = pd.DataFrame({"Model": list(fan_out), "Relationships": list(fan_out.values())})
+        st.write("Relationship fan-out (top 10):")
+        st.dataframe(fan_out_df.sort_values("Relationships", ascending=False).head(10))
+
+    if graph is not None and len(graph):
+        joins = graph.cross_subgraph_joins()
+        st.subheader("Queries Across Subgraphs")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Cross-subgraph relationships", sum(joins.values()))
+        with col2:
+            st.metric("Subgraph pairs joined", len(joins))
+        if joins:
+            st.dataframe(pd.DataFrame([(source, target, count) for (source, target), count in joins.items()],
+                                      columns=["Source subgraph", "Target subgraph", "Relationships"])
+                         .sort_values("Relationships", ascending=False).head(10), hide_index=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            model = st.selectbox("Reachable from model", [name for name, _, _ in graph.top(len(graph))])
+        with col2:
+            hops = st.slider("Within hops", 1, 5, 2)
+        reachable = graph.reachable(model, hops)
+        st.write(f"{len(reachable)} model(s) reachable from {model} within {hops} hop(s)"
+                 f" ({graph.fan_out(model)} directly)")
+        if reachable:
+            st.write(", ".join(reachable[:100]) + (", ..." if len(reachable) > 100 else ""))
+
+def create_change_charts(changes):
+    st.header("6. Changes Since Previous Upload")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Added objects", len(changes["added"]))
+    with col2:
+        st.metric("Removed objects", len(changes["removed"]))
+    with col3:
+        st.metric("Modified objects", len(changes["modified"]))
+    with col4:
+        st.metric("Unchanged objects", changes["unchanged"])
+
+    rows = [(change, name) for change in ("added", "removed", "modified") for name in changes[change]]
+    if rows:
+        st.dataframe(pd.DataFrame(rows, columns=["Change", "Object"]))
+
+@st.cache_resource
+def result_cache():
+    # Shared by every session of this server process. Set ANALYZER_CACHE_DIR
+    # to keep results on disk across restarts as well.
+    return ResultCache(cache_dir=os.environ.get("ANALYZER_CACHE_DIR"))
+
+def analyze_uploads(uploaded_files, streaming, exact_paths):
+    # (results, index) of the uploads, each parsed once for both. Uploads
+    # are parsed straight from their in-memory buffers, so concurrent
+    # sessions never share a file on disk.
+    index = MetadataIndex()
+    if len(uploaded_files) == 1:
+        return collect_source(uploaded_files[0], streaming, exact_paths, index).results(), index
+
+    # Every subgraph's export may be called metadata.json; repeated names
+    # are told apart by upload position so no document is dropped.
+    names = [f.name for f in uploaded_files]
+    documents = {(name if names.count(name) == 1 else f"{i}:{name}"): f.getvalue()
+                 for i, (name, f) in enumerate(zip(names, uploaded_files))}
+    return collect_batch(documents, streaming=streaming, exact_paths=exact_paths, index=index).results(), index
+
+def analyze_upload_incremental(uploaded_file, key):
+    # Each session keeps the state of its last upload, so uploading the next
+    # build only re-analyzes the objects whose content changed. Reruns with
+    # the same upload (`key`) reuse its results and keep showing the changes
+    # against the upload before it. The results depend on the session's
+    # previous upload, so they never go through the shared result cache.
+    if st.session_state.get("incremental_key") == key:
+        return st.session_state["incremental_results"]
+    with open_buffer(uploaded_file) as buffer:
+        data = load_buffer(buffer)
+    results, state, changes = analyze_incremental(data, st.session_state.get("incremental_state"))
+    with stage("index"):
+        index = build_index(data)
+    st.session_state["incremental_state"] = state
+    st.session_state["incremental_changes"] = changes
+    st.session_state["incremental_key"] = key
+    st.session_state["incremental_results"] = results, index
+    return results, index
+
+def show_profile(profiler):
+    report = profiler.report()
+    with st.sidebar.expander("Profile", expanded=True):
+        st.caption(f"Total {report['total_seconds'] * 1000:.0f} ms")
+        stages = pd.DataFrame(report["stages"])
+        if not stages.empty:
+            stages["ms"] = stages.pop("seconds") * 1000
+            stages["peak MB"] = stages.pop("peak_bytes") / 1e6
+            st.dataframe(stages, hide_index=True)
+        st.download_button("Download profile", get_backend().dumps_pretty(report), file_name="profile.json",
+                           mime="application/json")
+
 def main():
     st.set_page_config(page_title="Metadata Analyzer", layout="wide")
     st.sidebar.title("Metadata Analyzer")
-    uploaded_file = st.sidebar.file_uploader("Choose a JSON file", type="json")
+    uploaded_files = st.sidebar.file_uploader("Choose JSON files (one per subgraph)", type="json",
+                                              accept_multiple_files=True)
+    streaming = st.sidebar.checkbox("Streaming analysis (large files)", value=False)
+    exact_paths = st.sidebar.checkbox("Exact per-index description paths", value=False)
+    incremental = st.sidebar.checkbox("Incremental re-analysis against the previous upload", value=False,
+                                      disabled=exact_paths)
+    profile = st.sidebar.checkbox("Profile this run (stage timings and peak memory)", value=False)
     
-    if uploaded_file is not None:
-        with open("temp.json", "wb") as f:
-            f.write(uploaded_file.getvalue())
-        
-        results = analyze_metadata("temp.json")
-        create_charts(results)
-    else:
-        st.write("Please upload a JSON file to analyze.")
+    cache = result_cache()
+    # A profiled run skips the result cache so every stage actually runs.
+    # The profiler is active in this session's script thread only.
+    profiler = Profiler(memory=True).start() if profile else None
+    compute = cache.get_or_compute if profiler is None else lambda key, func: func()
+    try:
+        if uploaded_files:
+            # Streaming and tree walks give the same results, so only the
+            # path mode is part of the key. The index is built in the same
+            # pass and cached with the results.
+            contents = [part for f in uploaded_files for part in (f.name, f.getvalue())]
+            key = content_key(*contents, exact_paths=exact_paths, index=INDEX_VERSION)
+            if incremental and not exact_paths and len(uploaded_files) == 1:
+                results, index = analyze_upload_incremental(uploaded_files[0], key)
+            else:
+                results, index = compute(key, lambda: analyze_uploads(uploaded_files, streaming, exact_paths))
+            # Built once per metadata version and cached with the analysis
+            graph_key = content_key(*contents, index=INDEX_VERSION, graph=GRAPH_VERSION)
+            with stage("graph"):
+                graph = compute(graph_key, lambda: build_graph(index))
+            create_charts(results, graph)
+            create_index_charts(index, graph)
+            # Catalog for the dashboards (DASHBOARD_METADATA=summary.json)
+            with stage("summary"):
+                summary = get_backend().dumps_pretty(build_summary(index, results))
+            st.sidebar.download_button("Download dashboard summary", summary, file_name="summary.json",
+                                       mime="application/json")
+            if incremental and "incremental_changes" in st.session_state:
+                create_change_charts(st.session_state["incremental_changes"])
+        else:
+            st.write("Please upload one or more JSON files to analyze.")
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            show_profile(profiler)
+
+    st.sidebar.caption("Result cache: {memory_hits} memory hits, {disk_hits} disk hits, "
+                       "{misses} misses".format(**cache.stats))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+
+from analysis import PartialResult, collect, collect_source
+from metadata_index import MetadataIndex, build_index
+
+def analyze_batch(sources, processes=None, streaming=False, exact_paths=False):
+    return collect_batch(sources, processes, streaming, exact_paths).results()
+
+def collect_batch(sources, processes=None, streaming=False, exact_paths=False, index=None):
+    # `sources` is a directory of *.json files, a list of file paths, or a
+    # mapping of label -> file path / raw bytes / parsed document (one per
+    # subgraph). Each document is analyzed in a worker process and the
+    # partial results are merged in input order, so the outcome does not
+    # depend on which worker finishes first. With `index` (a
+    # MetadataIndex), the workers also index their documents from the same
+    # parse and the indexes are merged into it in input order.
+    jobs = [(label, source, streaming, exact_paths) for label, source in batch_sources(sources)]
+    processes = processes or os.cpu_count() or 1
+    merged = PartialResult(exact_paths)
+    work = analyze_document if index is None else index_document
+
+    def add(job, result):
+        if index is not None:
+            result, document_index = result
+            index.merge(document_index)
+        merged.merge(result, job[0])
+
+    if processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            add(job, work(job))
+        return merged
+
+    # Imported here so serial runs (and cli.py) skip the multiprocessing imports
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(processes, len(jobs))) as executor:
+        for job, result in zip(jobs, executor.map(work, jobs)):
+            add(job, result)
+    return merged
+
+def batch_sources(sources):
+    if isinstance(sources, (str, os.PathLike)):
+        names = sorted(name for name in os.listdir(sources) if name.endswith(".json"))
+        return [(name, os.path.join(sources, name)) for name in names]
+    if isinstance(sources, dict):
+        return list(sources.items())
+    return [(os.path.basename(source), source) for source in sources]
+
+def analyze_document(job):
+    label, source, streaming, exact_paths = job
+    if isinstance(source, (dict, list)):
+        return collect(source, exact_paths=exact_paths)
+    return collect_source(source, streaming, exact_paths)
+
+def index_document(job):
+    # analyze_document plus the document's MetadataIndex, from one parse.
+    label, source, streaming, exact_paths = job
+    index = MetadataIndex()
+    if isinstance(source, (dict, list)):
+        return collect(source, exact_paths=exact_paths), build_index(source, index)
+    return collect_source(source, streaming, exact_paths, index), index
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python batch.py metadata_dir | file1.json file2.json ...")
+    else:
+        sources = sys.argv[1] if os.path.isdir(sys.argv[1]) else sys.argv[1:]
+        print(json.dumps(analyze_batch(sources), indent=2))
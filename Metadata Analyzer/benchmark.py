@@ -0,0 +1,306 @@
+import contextlib
+import gc
+import io
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from analysis import analyze_data, analyze_metadata
+from batch import analyze_batch
+from json_backend import BACKENDS
+from metadata_index import MetadataIndex, index_metadata
+from relationship_graph import RelationshipGraph
+from summary import build_summary, save_summary
+from cache import ResultCache, content_key
+from incremental import analyze_incremental
+from synthetic import generate_metadata, generate_nested, kind_first, write_escaped, write_metadata, write_subgraphs
+from tool import format_json, format_json_chunked
+
+# Budget for a headless cli.py run on a small document, interpreter start
+# included.
+COLD_START_BUDGET = 0.2
+# Modules cli.py must not pull in.
+HEAVY_MODULES = ("streamlit", "pandas", "numpy", "matplotlib", "seaborn")
+
+def measure(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def bench_streaming(path):
+    size = os.path.getsize(path)
+    print(f"Metadata file: {size / 1e6:.1f} MB")
+    for exact_paths in (True, False):
+        tree, tree_time, tree_peak = measure(analyze_metadata, path, exact_paths=exact_paths)
+        stream, stream_time, stream_peak = measure(analyze_metadata, path, streaming=True, exact_paths=exact_paths)
+        # Compared as JSON so that the order of rows and models counts too
+        assert json.dumps(stream) == json.dumps(tree), "streaming results differ from the tree walk"
+        print(f"  {'exact' if exact_paths else 'normalized'} paths: "
+              f"{tree['description_fields']} description fields, "
+              f"{len(tree['non_null_descriptions'])} non-null rows")
+        print(f"    tree walk: {tree_time:.2f}s, peak {tree_peak / 1e6:.1f} MB")
+        print(f"    streaming: {stream_time:.2f}s, peak {stream_peak / 1e6:.1f} MB")
+
+def check_streaming():
+    # Streaming must record results in document order, like the tree walk,
+    # also for nested descriptions and for objects that list "kind" before
+    # "definition".
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(10000)
+    try:
+        documents = [generate_metadata(subgraphs=3, models=20, depth=3)]
+        documents += [generate_nested(depth=depth, width=width, seed=seed)
+                      for depth, width in [(30, 5), (3, 200), (200, 3)] for seed in range(5)]
+        documents += [kind_first(data) for data in documents]
+        for data in documents:
+            content = json.dumps(data).encode()
+            for exact_paths in (True, False):
+                expected = json.dumps(analyze_data(data, exact_paths=exact_paths))
+                actual = json.dumps(analyze_metadata(content, streaming=True, exact_paths=exact_paths))
+                assert actual == expected, "streaming results differ from the tree walk"
+    finally:
+        sys.setrecursionlimit(limit)
+
+def check_traversal():
+    # Differential check: the iterative walk must produce byte-identical
+    # results to the recursive reference on wide, deep and irregular input.
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(10000)
+    try:
+        documents = [generate_metadata(subgraphs=5, models=50)]
+        documents += [generate_nested(depth=depth, width=width, seed=seed)
+                      for depth, width in [(0, 50), (3, 200), (500, 3)] for seed in range(5)]
+        for data in documents:
+            for exact_paths in (True, False):
+                expected = json.dumps(analyze_data(data, recursive=True, exact_paths=exact_paths))
+                actual = json.dumps(analyze_data(data, exact_paths=exact_paths))
+                assert actual == expected, "iterative traversal differs from recursive"
+    finally:
+        sys.setrecursionlimit(limit)
+
+def bench_traversal(subgraphs):
+    data = generate_metadata(subgraphs=subgraphs, models=100)
+    _, recursive_time, recursive_peak = measure(analyze_data, data, recursive=True, exact_paths=True)
+    _, iterative_time, iterative_peak = measure(analyze_data, data, exact_paths=True)
+    print("Traversal over the loaded document:")
+    print(f"  recursive: {recursive_time:.2f}s, peak {recursive_peak / 1e6:.1f} MB")
+    print(f"  iterative: {iterative_time:.2f}s, peak {iterative_peak / 1e6:.1f} MB")
+
+def bench_batch(directory):
+    start = time.perf_counter()
+    serial = analyze_batch(directory, processes=1)
+    serial_time = time.perf_counter() - start
+    processes = os.cpu_count() or 1
+    start = time.perf_counter()
+    parallel = analyze_batch(directory, processes=processes)
+    parallel_time = time.perf_counter() - start
+    assert parallel == serial, "parallel batch results differ from serial"
+    print(f"Batch of {len(os.listdir(directory))} subgraph documents:")
+    print(f"  serial: {serial_time:.2f}s")
+    print(f"  {processes} worker(s): {parallel_time:.2f}s ({serial_time / parallel_time:.1f}x)")
+
+def bench_cache(path, cache_dir):
+    with open(path, "rb") as file:
+        key = content_key(file.read(), exact_paths=False)
+    first = ResultCache(cache_dir=cache_dir)
+    # A fresh cache over the same directory only has the disk tier to go on.
+    runs = [("miss", first), ("disk hit", ResultCache(cache_dir=cache_dir)), ("memory hit", first)]
+    print("Result cache:")
+    expected = None
+    for label, cache in runs:
+        start = time.perf_counter()
+        result = cache.get_or_compute(key, lambda: analyze_metadata(path))
+        print(f"  {label}: {(time.perf_counter() - start) * 1000:.2f} ms")
+        assert expected is None or result == expected, "cached results differ"
+        expected = result
+
+def bench_upload(path, tmp):
+    # Upload-to-results latency: the old flow wrote the upload to temp.json
+    # and re-read it; now the upload buffer is parsed in place.
+    with open(path, "rb") as file:
+        upload = io.BytesIO(file.read())
+
+    def via_temp_file():
+        temp_path = os.path.join(tmp, "temp.json")
+        with open(temp_path, "wb") as f:
+            f.write(upload.getvalue())
+        return analyze_metadata(temp_path)
+
+    print("Upload to results:")
+    expected = None
+    for label, func in [("temp.json round-trip", via_temp_file), ("in-memory buffer", lambda: analyze_metadata(upload))]:
+        result, elapsed, peak = measure(func)
+        print(f"  {label}: {elapsed * 1000:.1f} ms, peak {peak / 1e6:.1f} MB")
+        assert expected is None or result == expected, "in-memory results differ"
+        expected = result
+
+def bench_format(tmp, subgraphs):
+    escaped = os.path.join(tmp, "escaped.txt")
+    write_escaped(escaped, subgraphs=subgraphs, models=100)
+    size = os.path.getsize(escaped)
+    print(f"Escaped export: {size / 1e6:.1f} MB")
+    outputs = []
+    for label, func in [("format_json", format_json), ("chunked", format_json_chunked)]:
+        output = os.path.join(tmp, f"{label}.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, elapsed, peak = measure(func, escaped, output)
+        print(f"  {label}: {elapsed:.2f}s ({size / 1e6 / elapsed:.1f} MB/s), peak {peak / 1e6:.1f} MB")
+        with open(output, "rb") as file:
+            outputs.append(file.read())
+    assert outputs[0] == outputs[1], "chunked output differs from format_json"
+
+def bench_backends(max_mb):
+    # ~160 KB of metadata per synthetic subgraph at 100 models.
+    print("JSON backends (parse / pretty dump):")
+    for mb in [size for size in (1, 10, 100, 1000) if size <= max_mb]:
+        data = json.dumps(generate_metadata(subgraphs=max(1, round(mb * 6)), models=100)).encode()
+        size = len(data) / 1e6
+        outputs = {}
+        for name, backend in BACKENDS.items():
+            # Collector pauses over the previous backend's objects would
+            # otherwise dominate the timings.
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                parsed = backend.loads(data)
+                parse_time = time.perf_counter() - start
+                start = time.perf_counter()
+                outputs[name] = backend.dumps_pretty(parsed)
+                dump_time = time.perf_counter() - start
+            finally:
+                del parsed
+                gc.enable()
+            print(f"  {size:.0f} MB {name}: {size / parse_time:.0f} MB/s / {size / dump_time:.0f} MB/s")
+        assert len(set(outputs.values())) == 1, "backends produced different output"
+
+def bench_index(path, tmp):
+    index, build_time, _ = measure(index_metadata, path)
+    index_path = os.path.join(tmp, "index.json")
+    index.save(index_path)
+    start = time.perf_counter()
+    loaded = MetadataIndex.load(index_path)
+    load_time = time.perf_counter() - start
+    assert loaded.to_dict() == index.to_dict(), "reloaded index differs"
+    start = time.perf_counter()
+    loaded.roles_per_model()
+    loaded.models_without_permissions()
+    loaded.relationship_fan_out()
+    query_time = time.perf_counter() - start
+    summary, summary_time, _ = measure(build_summary, loaded)
+    summary_path = os.path.join(tmp, "summary.json")
+    save_summary(summary, summary_path)
+    print("Metadata index:")
+    print(f"  build from metadata: {build_time:.2f}s")
+    print(f"  saved index: {os.path.getsize(index_path) / 1e6:.1f} MB, reloaded in {load_time:.2f}s")
+    print(f"  roles / missing permissions / fan-out queries: {query_time * 1000:.1f} ms")
+    print(f"  dashboard summary: built in {summary_time * 1000:.0f} ms, "
+          f"{os.path.getsize(summary_path) / 1e6:.2f} MB for {len(summary['models']):,} models")
+
+def bench_incremental(subgraphs):
+    # One object edited per build, as after a typical deploy.
+    data = generate_metadata(subgraphs=subgraphs, models=100)
+    _, state, _ = analyze_incremental(data)
+    definition = data["subgraphs"][0]["objects"][1]["definition"]
+    definition["description"] = "Edited in the next build"
+    full, full_time, _ = measure(analyze_data, data)
+    (results, _, changes), incremental_time, _ = measure(analyze_incremental, data, state)
+    assert results["description_fields"] == full["description_fields"], "incremental result differs"
+    assert results["relaxed_permissions"] == full["relaxed_permissions"], "incremental result differs"
+    print("Incremental re-analysis (one edited object):")
+    print(f"  full: {full_time:.2f}s")
+    print(f"  incremental: {incremental_time:.2f}s, {len(changes['modified'])} modified, {changes['unchanged']} unchanged")
+
+def bench_graph(relationships=100_000, models=20_000, subgraphs=50):
+    # Seeded random relationships, a few hub models attracting most of them.
+    rng = random.Random(0)
+    names = [f"Model_{i}" for i in range(models)]
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(models)]
+    edges = [(source, f"subgraph_{rng.randrange(subgraphs)}", target, f"subgraph_{rng.randrange(subgraphs)}")
+             for source, target in zip(rng.choices(names, weights, k=relationships),
+                                       rng.choices(names, weights, k=relationships))]
+    graph, build_time, _ = measure(RelationshipGraph.from_edges, edges)
+
+    # What create_charts did before: per-model counters, sorted in full
+    start = time.perf_counter()
+    counts = {}
+    for source, _, target, _ in edges:
+        counts.setdefault(source, [0, 0])[0] += 1
+        counts.setdefault(target, [0, 0])[1] += 1
+    expected = sorted(counts.items(), key=lambda item: -sum(item[1]))[:10]
+    counter_time = time.perf_counter() - start
+    top, top_time, _ = measure(graph.top, 10)
+    assert [sum(item[1]) for item in expected] == [outgoing + incoming for _, outgoing, incoming in top], \
+        "graph degrees differ from counting"
+
+    sample = rng.sample(graph.names, 100)
+    _, degree_time, _ = measure(lambda: [(graph.degree(name), graph.fan_out(name)) for name in sample])
+    reached, hops_time, _ = measure(lambda: [len(graph.reachable(name, 3)) for name in sample])
+    _, closure_time, _ = measure(graph.reachable, top[0][0])
+    joins, joins_time, _ = measure(graph.cross_subgraph_joins)
+    blob = pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL)
+    _, load_time, _ = measure(pickle.loads, blob)
+    print(f"Relationship graph ({graph.edges:,} relationships, {len(graph):,} models):")
+    print(f"  CSR build: {build_time:.2f}s; cached pickle {len(blob) / 1e6:.1f} MB, loaded in {load_time * 1000:.0f} ms")
+    print(f"  top 10 by degree: {top_time * 1000:.1f} ms (counting and sorting per model: {counter_time * 1000:.0f} ms)")
+    print(f"  degree + fan-out for 100 models: {degree_time * 1000:.2f} ms")
+    print(f"  3-hop reachability for 100 models: {hops_time * 1000:.0f} ms (average {sum(reached) / 100:,.0f} reached)")
+    print(f"  full reachability from the top hub: {closure_time * 1000:.0f} ms")
+    print(f"  cross-subgraph joins: {sum(joins.values()):,} over {len(joins):,} subgraph pairs "
+          f"in {joins_time * 1000:.2f} ms")
+
+def bench_cold_start(tmp, runs=10):
+    path = os.path.join(tmp, "small.json")
+    write_metadata(path, subgraphs=1, models=10)
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, cli, path], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter = time.perf_counter() - start
+    imported = subprocess.run([sys.executable, "-c", "import sys; sys.path.insert(0, sys.argv[1]); import cli; "
+                               "print(' '.join(sorted(m for m in sys.modules if '.' not in m)))",
+                               os.path.dirname(cli)], check=True, capture_output=True, text=True).stdout.split()
+    heavy = [module for module in HEAVY_MODULES if module in imported]
+    best = min(timings)
+    print(f"cli.py cold start: best {best * 1000:.0f} ms, median {sorted(timings)[runs // 2] * 1000:.0f} ms "
+          f"(bare interpreter {interpreter * 1000:.0f} ms, budget {COLD_START_BUDGET * 1000:.0f} ms)"
+          f"{' OVER BUDGET' if best > COLD_START_BUDGET else ''}")
+    assert not heavy, f"cli.py imports {', '.join(heavy)}"
+
+if __name__ == "__main__":
+    subgraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    max_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metadata.json")
+        write_metadata(path, subgraphs=subgraphs, models=100)
+        bench_streaming(path)
+        bench_upload(path, tmp)
+        bench_index(path, tmp)
+        bench_incremental(subgraphs)
+        bench_cache(path, os.path.join(tmp, "cache"))
+        subgraph_dir = os.path.join(tmp, "subgraphs")
+        os.mkdir(subgraph_dir)
+        write_subgraphs(subgraph_dir, subgraphs=40, models=100)
+        bench_batch(subgraph_dir)
+        bench_format(tmp, subgraphs)
+        bench_cold_start(tmp)
+    bench_backends(max_mb)
+    check_traversal()
+    check_streaming()
+    bench_traversal(subgraphs)
+    bench_graph()
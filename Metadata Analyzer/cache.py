@@ -0,0 +1,112 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+def content_key(*contents, **options):
+    # Hash of the uploaded bytes plus any analysis options that change the
+    # result. Each part is length-prefixed so ("ab", "c") != ("a", "bc").
+    digest = hashlib.sha256()
+    for content in contents:
+        if isinstance(content, str):
+            content = content.encode()
+        digest.update(len(content).to_bytes(8, "little"))
+        digest.update(content)
+    for name, value in sorted(options.items()):
+        digest.update(f"{name}={value!r};".encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    # Two-tier cache for analysis results: an in-process LRU of
+    # `max_entries` results, backed by an optional directory of pickles that
+    # is trimmed (least recently used first) to `max_disk_bytes`.
+    def __init__(self, max_entries=16, cache_dir=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get_or_compute(self, key, compute):
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self.memory[key]
+
+        result = self.load(key)
+        with self.lock:
+            if result is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["disk_hits"] += 1
+                self.remember(key, result)
+        return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.remember(key, result)
+        if self.cache_dir:
+            self.store(key, result)
+
+    def remember(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)
+        return result
+
+    def store(self, key, result):
+        # Written under a temporary name and renamed so a concurrent reader
+        # never sees a partial pickle.
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pickle"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,17 @@
+import pandas as pd
+
+# Tables behind the analyzer page's charts, kept free of Streamlit so
+# headless callers (the regression suite) can build them.
+
+def relationships_frame(results, top=10):
+    relationships_df = pd.DataFrame(results["relationships"]).T.reset_index()
+    relationships_df.columns = ['Model', 'Source', 'Target']
+    relationships_df['Total'] = relationships_df['Source'] + relationships_df['Target']
+    return relationships_df.sort_values('Total', ascending=False).head(top)
+
+def graph_frame(graph, top=10):
+    # Same table from the graph's precomputed degrees; only the top rows
+    # are built.
+    relationships_df = pd.DataFrame(graph.top(top), columns=['Model', 'Source', 'Target'])
+    relationships_df['Total'] = relationships_df['Source'] + relationships_df['Target']
+    return relationships_df
@@ -0,0 +1,134 @@
+import json
+import os
+import sys
+import time
+
+from batch import analyze_document, batch_sources
+
+# Headless analysis for CI: no Streamlit, pandas or plotting imports, so a
+# run costs little more than the analysis itself. Each metadata document is
+# checked on its own; a directory stands for its *.json files.
+USAGE = ("Usage: python cli.py metadata.json|metadata_dir ... [--format=json|ndjson] [--output=findings.json]\n"
+         "       [--fail-on-relaxed] [--max-undocumented=PERCENT] [--descriptions] [--streaming] [--exact-paths]\n"
+         "       [--processes=N]")
+# Exit codes
+OK = 0
+VIOLATIONS = 1
+ERROR = 2
+
+def expand_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(source for _, source in batch_sources(path))
+        else:
+            sources.append(path)
+    return sources
+
+def check_document(job):
+    # Findings for one document, or the reason it could not be analyzed.
+    source = job[1]
+    start = time.perf_counter()
+    try:
+        results = analyze_document(job).results()
+    except Exception as e:
+        # Any failure is reported against the document, malformed metadata
+        # (a missing key, a null where an object belongs) included, so it
+        # exits ERROR rather than looking like a policy violation.
+        return {"source": source, "error": f"{type(e).__name__}: {e}"}
+    findings = {"source": source, **results, "seconds": round(time.perf_counter() - start, 4)}
+    findings["relaxed_permissions"] = list(dict.fromkeys(results["relaxed_permissions"]))
+    return findings
+
+def check_sources(sources, processes=1, streaming=False, exact_paths=False):
+    # Yields findings in input order as documents finish.
+    jobs = [(source, source, streaming, exact_paths) for source in sources]
+    if processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            yield check_document(job)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(processes, len(jobs))) as executor:
+        yield from executor.map(check_document, jobs)
+
+def policy_violations(findings, fail_on_relaxed=False, max_undocumented=None):
+    violations = []
+    if fail_on_relaxed and findings["relaxed_permissions"]:
+        violations.append({"policy": "relaxed_permissions", "models": findings["relaxed_permissions"]})
+    if max_undocumented is not None and findings["null_description_percentage"] > max_undocumented:
+        violations.append({"policy": "max_undocumented", "value": findings["null_description_percentage"],
+                           "limit": max_undocumented})
+    return violations
+
+def run(paths, output=sys.stdout, ndjson=False, fail_on_relaxed=False, max_undocumented=None,
+        descriptions=False, processes=1, streaming=False, exact_paths=False):
+    # Writes the findings of every document to `output` and returns the exit
+    # code: ERROR if a document could not be analyzed, else VIOLATIONS if
+    # one broke a policy, else OK. NDJSON writes one line per document as
+    # soon as it is done; JSON writes a single object at the end.
+    status = OK
+    files = []
+    for findings in check_sources(expand_sources(paths), processes, streaming, exact_paths):
+        if "error" in findings:
+            status = ERROR
+        else:
+            if not descriptions:
+                del findings["non_null_descriptions"]
+            findings["violations"] = policy_violations(findings, fail_on_relaxed, max_undocumented)
+            if findings["violations"] and status == OK:
+                status = VIOLATIONS
+        if ndjson:
+            output.write(json.dumps(findings) + "\n")
+            output.flush()
+        else:
+            files.append(findings)
+    if not ndjson:
+        json.dump({"files": files, "exit_code": status}, output, indent=2)
+        output.write("\n")
+    return status
+
+def number(value, convert, minimum=None):
+    # `value` converted, or None if it is not a number (NaN included, which
+    # no limit could be compared against) or is below `minimum`.
+    try:
+        value = convert(value)
+    except ValueError:
+        return None
+    if value != value or (minimum is not None and value < minimum):
+        return None
+    return value
+
+def main(args):
+    options = dict(arg[2:].partition("=")[::2] for arg in args if arg.startswith("--"))
+    paths = [arg for arg in args if not arg.startswith("--")]
+    known = {"format", "output", "fail-on-relaxed", "max-undocumented", "descriptions", "streaming", "exact-paths",
+             "processes"}
+    max_undocumented = number(options["max-undocumented"], float) if options.get("max-undocumented") else None
+    processes = number(options.get("processes") or "1", int, minimum=1)
+    if (not paths or set(options) - known or options.get("format", "json") not in ("json", "ndjson")
+            or (options.get("max-undocumented") and max_undocumented is None) or processes is None):
+        print(USAGE, file=sys.stderr)
+        return ERROR
+    # Nothing to check is a usage error, so a CI job pointed at the wrong
+    # directory fails instead of passing without checking anything
+    sources = expand_sources(paths)
+    if not sources:
+        print(f"No metadata documents (*.json) in {', '.join(paths)}", file=sys.stderr)
+        print(USAGE, file=sys.stderr)
+        return ERROR
+    arguments = {
+        "ndjson": options.get("format") == "ndjson",
+        "fail_on_relaxed": "fail-on-relaxed" in options,
+        "max_undocumented": max_undocumented,
+        "descriptions": "descriptions" in options,
+        "processes": processes,
+        "streaming": "streaming" in options,
+        "exact_paths": "exact-paths" in options,
+    }
+    if options.get("output"):
+        with open(options["output"], 'w', encoding='utf-8') as output:
+            return run(sources, output, **arguments)
+    return run(sources, **arguments)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
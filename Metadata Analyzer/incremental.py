@@ -0,0 +1,196 @@
+import hashlib
+import json
+from collections import Counter, defaultdict
+
+from analysis import RESERVOIR_SIZE, collect, field_counts, relationship_counts
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OBJECT_PREFIX = "subgraphs[*].objects[*]."
+
+def object_hash(obj):
+    if orjson is not None:
+        try:
+            return hashlib.blake2b(orjson.dumps(obj, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+        except TypeError:
+            pass
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def object_identity(obj, subgraph):
+    definition = obj.get("definition")
+    definition = definition if isinstance(definition, dict) else {}
+    name = definition.get("name") or definition.get("modelName") or definition.get("typeName") or ""
+    if obj.get("kind") == "Relationship":
+        name = f"{definition.get('sourceType') or definition.get('source', '')}.{name}"
+    return f"{subgraph}/{obj.get('kind')}/{name}"
+
+class Contribution:
+    # What one metadata object adds to the aggregates, with description
+    # paths relative to the object ("definition.fields[*].description").
+    __slots__ = ("identity", "fields", "examples", "relaxed_permissions", "relationships")
+
+    def __init__(self, obj, subgraph):
+        partial = collect(obj)
+        self.identity = object_identity(obj, subgraph)
+        self.fields = {path: (counts["null"], counts["non_null"])
+                       for path, counts in partial.descriptions.fields.items()}
+        self.examples = partial.descriptions.examples
+        self.relaxed_permissions = partial.relaxed_permissions
+        self.relationships = [(model, counts["source"], counts["target"])
+                              for model, counts in partial.relationships.items()]
+
+class IncrementalState:
+    # Everything needed to update a (normalized-path) analysis from the next
+    # build: per-object contributions keyed by content hash, the document
+    # layout, and the running aggregates. Examples are kept as
+    # (object hash, indices inside the object, value) so they survive objects
+    # moving around between builds.
+    def __init__(self, previous=None):
+        self.contributions = {}
+        self.layout = []
+        self.counts = Counter()
+        self.positions = {}
+        self.rest = None
+        self.fields = defaultdict(field_counts)
+        self.examples = {}
+        self.relationships = defaultdict(relationship_counts)
+        if previous is not None:
+            self.fields.update((path, dict(counts)) for path, counts in previous.fields.items())
+            self.relationships.update((model, dict(counts)) for model, counts in previous.relationships.items())
+
+    def apply(self, contribution, sign, prefix):
+        for path, (null, non_null) in contribution.fields.items():
+            field = self.fields[prefix + path]
+            field["null"] += sign * null
+            field["non_null"] += sign * non_null
+            if not field["null"] and not field["non_null"]:
+                del self.fields[prefix + path]
+        for model, source, target in contribution.relationships:
+            counts = self.relationships[model]
+            counts["source"] += sign * source
+            counts["target"] += sign * target
+            if not counts["source"] and not counts["target"]:
+                del self.relationships[model]
+
+    def sample(self, digest, contribution, paths=None):
+        prefix = "" if digest is None else OBJECT_PREFIX
+        for path, samples in contribution.examples.items():
+            path = prefix + path
+            if paths is not None and path not in paths:
+                continue
+            kept = self.examples.setdefault(path, [])
+            if paths is not None and any(example[0] == digest for example in kept):
+                continue
+            for indices, value in samples:
+                if len(kept) >= RESERVOIR_SIZE:
+                    break
+                kept.append((digest, indices, value))
+
+    def results(self):
+        relaxed_permissions = list(self.rest.relaxed_permissions)
+        for _, hashes in self.layout:
+            for digest in hashes:
+                relaxed_permissions.extend(self.contributions[digest].relaxed_permissions)
+
+        total = sum(field["null"] + field["non_null"] for field in self.fields.values())
+        rows = []
+        for path, examples in self.examples.items():
+            rows.append({
+                "path": path,
+                "count": self.fields[path]["non_null"],
+                "example_indices": [(list(self.positions[digest]) if digest else []) + list(indices)
+                                    for digest, indices, _ in examples],
+                "example_values": [value for _, _, value in examples],
+            })
+        return {
+            "description_fields": len(self.fields),
+            "null_description_percentage": sum(field["null"] for field in self.fields.values()) / total * 100 if total > 0 else 0,
+            "relaxed_permissions": relaxed_permissions,
+            "non_null_descriptions": rows,
+            "relationships": self.relationships,
+        }
+
+def split_document(data):
+    # Separates subgraphs[*].objects[*] from the rest of the document, which
+    # is analyzed whole on every build (it is tiny in practice).
+    if not isinstance(data, dict) or not isinstance(data.get("subgraphs"), list):
+        return data, []
+    subgraphs = []
+    layout = []
+    for subgraph in data["subgraphs"]:
+        if isinstance(subgraph, dict) and isinstance(subgraph.get("objects"), list):
+            layout.append((subgraph.get("name"), subgraph["objects"]))
+            subgraph = {**subgraph, "objects": []}
+        else:
+            layout.append((None, []))
+        subgraphs.append(subgraph)
+    return {**data, "subgraphs": subgraphs}, layout
+
+def analyze_incremental(data, previous=None):
+    # Re-analyzes `data` given the state returned for the previous build.
+    # Only objects whose content hash is new are traversed; unchanged ones
+    # reuse their stored contribution and the aggregates are updated by the
+    # difference. Returns (results, state, changes); counts, relaxed
+    # permissions and relationships match a full run of analyze_data, while
+    # description examples are a sample drawn differently.
+    state = IncrementalState(previous)
+    rest, layout = split_document(data)
+    if previous is not None:
+        state.apply(previous.rest, -1, "")
+    state.rest = Contribution(rest, None)
+    state.apply(state.rest, 1, "")
+
+    old_counts = previous.counts if previous else Counter()
+    old_contributions = previous.contributions if previous else {}
+    new_counts = state.counts
+    for s, (subgraph, objects) in enumerate(layout):
+        hashes = []
+        for o, obj in enumerate(objects):
+            digest = object_hash(obj)
+            hashes.append(digest)
+            new_counts[digest] += 1
+            if digest not in state.contributions:
+                state.positions[digest] = (s, o)
+                state.contributions[digest] = old_contributions.get(digest) or Contribution(obj, subgraph)
+        state.layout.append((subgraph, hashes))
+
+    for digest, count in (old_counts - new_counts).items():
+        for _ in range(count):
+            state.apply(old_contributions[digest], -1, OBJECT_PREFIX)
+    for digest, count in (new_counts - old_counts).items():
+        for _ in range(count):
+            state.apply(state.contributions[digest], 1, OBJECT_PREFIX)
+
+    # Keep examples whose object is still there, then top up from the rest
+    # of the document and the new objects, and only if that is not enough
+    # from unchanged objects.
+    if previous is not None:
+        for path, examples in previous.examples.items():
+            kept = [example for example in examples if example[0] is not None and example[0] in new_counts]
+            if kept and path in state.fields:
+                state.examples[path] = kept
+    added = {digest: None for digest in new_counts if digest not in old_counts}
+    state.sample(None, state.rest)
+    for digest in added:
+        state.sample(digest, state.contributions[digest])
+    short = {path for path, field in state.fields.items()
+             if field["non_null"] > len(state.examples.get(path, ())) and len(state.examples.get(path, ())) < RESERVOIR_SIZE}
+    if short:
+        for digest, contribution in state.contributions.items():
+            if digest not in added:
+                state.sample(digest, contribution, short)
+
+    removed = [digest for digest in old_counts if digest not in new_counts]
+    added_identities = {state.contributions[digest].identity for digest in added}
+    removed_identities = {old_contributions[digest].identity for digest in removed}
+    changes = {
+        "added": sorted(added_identities - removed_identities),
+        "removed": sorted(removed_identities - added_identities),
+        "modified": sorted(added_identities & removed_identities),
+        "unchanged": sum(count for digest, count in new_counts.items() if digest in old_counts),
+    }
+    return state.results(), state, changes
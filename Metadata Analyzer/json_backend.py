@@ -0,0 +1,137 @@
+import json
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Characters json.dumps(ensure_ascii=True) escapes that orjson writes raw.
+NON_ASCII = re.compile(r'[^\x00-\x7e]')
+# orjson turns integers beyond 64 bits into floats instead of failing. Any
+# run of 19+ digits (even inside a string) sends the document to the stdlib
+# parser, which keeps them exact. Digits are found by translating chunks of
+# the input to a two-symbol alphabet and substring-searching that, which is
+# several times faster than a regex scan.
+DIGIT_MASK = bytes(0x30 if 0x30 <= i <= 0x39 else 0x20 for i in range(256))
+LONG_DIGITS = b"0" * 19
+SCAN_CHUNK = 1 << 20
+
+def stdlib_loads(data):
+    if isinstance(data, (str, bytes, bytearray)):
+        return json.loads(data)
+    # memoryview / mmap: decode straight from the buffer instead of copying
+    # it to bytes first.
+    encoding = json.detect_encoding(bytes(data[:4]))
+    return json.loads(str(data, encoding))
+
+def stdlib_dumps_pretty(obj):
+    return json.dumps(obj, indent=2)
+
+def stdlib_dump_pretty(obj, file):
+    # Streams the output to the file instead of building it as one string
+    json.dump(obj, file, indent=2)
+
+def has_long_digits(data):
+    overlap = len(LONG_DIGITS) - 1
+    if isinstance(data, str):
+        chunks = (data[start:start + SCAN_CHUNK + overlap].encode()
+                  for start in range(0, len(data), SCAN_CHUNK))
+        return any(LONG_DIGITS in chunk.translate(DIGIT_MASK) for chunk in chunks)
+    with memoryview(data) as view:
+        for start in range(0, len(view), SCAN_CHUNK):
+            if LONG_DIGITS in view[start:start + SCAN_CHUNK + overlap].tobytes().translate(DIGIT_MASK):
+                return True
+    return False
+
+def orjson_loads(data):
+    if has_long_digits(data):
+        return stdlib_loads(data)
+    try:
+        if isinstance(data, (str, bytes, bytearray, memoryview)):
+            return orjson.loads(data)
+        with memoryview(data) as view:
+            return orjson.loads(view)
+    except orjson.JSONDecodeError:
+        # NaN/Infinity literals and BOMs are valid for the stdlib parser;
+        # anything else re-raises its usual error.
+        return stdlib_loads(data)
+
+def orjson_dumps_pretty(obj):
+    # orjson's float formatting differs from repr() for some values, so
+    # documents containing floats go through the stdlib encoder.
+    if contains_float(obj):
+        return stdlib_dumps_pretty(obj)
+    try:
+        text = orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    except TypeError:
+        return stdlib_dumps_pretty(obj)
+    return NON_ASCII.sub(escape_non_ascii, text)
+
+def simdjson_loads(data):
+    if has_long_digits(data):
+        return stdlib_loads(data)
+    try:
+        return simdjson.loads(bytes(data) if not isinstance(data, (str, bytes)) else data)
+    except ValueError:
+        return stdlib_loads(data)
+
+def escape_non_ascii(match):
+    # Same \uXXXX escaping (with surrogate pairs) as json.encoder.
+    n = ord(match.group())
+    if n < 0x10000:
+        return f"\\u{n:04x}"
+    n -= 0x10000
+    return f"\\u{0xd800 | (n >> 10):04x}\\u{0xdc00 | (n & 0x3ff):04x}"
+
+def contains_float(obj):
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            return True
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return False
+
+class Backend:
+    def __init__(self, name, loads, dumps_pretty, dump_pretty=None):
+        self.name = name
+        self.loads = loads
+        self.dumps_pretty = dumps_pretty
+        self.write_pretty = dump_pretty
+
+    def dump_pretty(self, obj, file):
+        if self.write_pretty is not None:
+            self.write_pretty(obj, file)
+        else:
+            file.write(self.dumps_pretty(obj))
+
+BACKENDS = {"stdlib": Backend("stdlib", stdlib_loads, stdlib_dumps_pretty, stdlib_dump_pretty)}
+if simdjson is not None:
+    if orjson is not None:
+        BACKENDS["simdjson"] = Backend("simdjson", simdjson_loads, orjson_dumps_pretty)
+    else:
+        BACKENDS["simdjson"] = Backend("simdjson", simdjson_loads, stdlib_dumps_pretty, stdlib_dump_pretty)
+if orjson is not None:
+    BACKENDS["orjson"] = Backend("orjson", orjson_loads, orjson_dumps_pretty)
+
+PREFERRED = ["orjson", "simdjson", "stdlib"]
+
+def get_backend(name=None):
+    # Fastest installed backend unless one is named here or in
+    # METADATA_JSON_BACKEND. All backends give identical results.
+    name = name or os.environ.get("METADATA_JSON_BACKEND")
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"JSON backend {name!r} is not available (installed: {', '.join(BACKENDS)})")
+        return BACKENDS[name]
+    return next(BACKENDS[name] for name in PREFERRED if name in BACKENDS)
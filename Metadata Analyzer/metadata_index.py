@@ -0,0 +1,207 @@
+import sys
+from collections import Counter, defaultdict
+
+from analysis import open_buffer
+from json_backend import get_backend
+
+INDEX_VERSION = 2
+
+class MetadataIndex:
+    # Compact, kind-bucketed view of a metadata document built in one walk.
+    # Only the fields the checks need are kept per object, so the index is a
+    # small fraction of the document and can be saved and reloaded without
+    # re-parsing the metadata.
+    def __init__(self):
+        self.kinds = Counter()
+        self.models = {}
+        self.commands = {}
+        self.object_types = {}
+        self.permissions = {}
+        self.command_permissions = {}
+        # Role unauthenticated requests run as, if the project allows them.
+        self.no_auth_role = None
+        self.relationships = []
+        self.relationships_by_source = defaultdict(list)
+        self.relationships_by_target = defaultdict(list)
+
+    def add(self, obj, subgraph=None):
+        kind = obj["kind"]
+        self.kinds[kind] += 1
+        definition = obj.get("definition")
+        if not isinstance(definition, dict):
+            return
+
+        if kind == "Model":
+            name = definition.get("name", "")
+            self.models[name] = {
+                "name": name,
+                "subgraph": subgraph,
+                "object_type": definition.get("objectType"),
+                "described": bool(definition.get("description")),
+                "connector": (definition.get("source") or {}).get("dataConnectorName"),
+                "deprecated": bool(definition.get("deprecated") or (definition.get("graphql") or {}).get("deprecated")),
+            }
+        elif kind == "Command":
+            name = definition.get("name", "")
+            self.commands[name] = {
+                "name": name,
+                "subgraph": subgraph,
+                "described": bool(definition.get("description")),
+                "connector": (definition.get("source") or {}).get("dataConnectorName"),
+                "deprecated": bool(definition.get("deprecated") or (definition.get("graphql") or {}).get("deprecated")),
+            }
+        elif kind == "CommandPermissions":
+            command = definition.get("commandName", "")
+            perm = self.command_permissions.setdefault(command, {"command": command, "subgraph": subgraph, "roles": []})
+            perm["roles"].extend(p.get("role") for p in definition.get("permissions") or [] if p.get("allowExecution"))
+        elif kind == "AuthConfig":
+            mode = definition.get("mode") or {}
+            if isinstance(mode.get("noAuth"), dict):
+                self.no_auth_role = mode["noAuth"].get("role")
+        elif kind == "ObjectType":
+            name = definition.get("name", "")
+            fields = definition.get("fields") or []
+            self.object_types[name] = {
+                "name": name,
+                "subgraph": subgraph,
+                "fields": len(fields),
+                "described_fields": sum(1 for field in fields if isinstance(field, dict) and field.get("description")),
+                "described": bool(definition.get("description")),
+            }
+        elif kind == "ModelPermissions":
+            model = definition.get("modelName", "")
+            roles = []
+            relaxed_roles = []
+            for perm in definition.get("permissions") or []:
+                roles.append(perm.get("role"))
+                if "select" in perm and perm["select"].get("filter") is None:
+                    relaxed_roles.append(perm.get("role"))
+            perm = self.permissions.setdefault(model, {
+                "model": model,
+                "subgraph": subgraph,
+                "roles": [],
+                "relaxed_roles": [],
+            })
+            perm["roles"].extend(roles)
+            perm["relaxed_roles"].extend(relaxed_roles)
+        elif kind == "Relationship":
+            target = definition.get("target", {}).get("model", {})
+            relationship = {
+                "name": definition.get("name", ""),
+                "subgraph": subgraph,
+                # Older metadata names the source object type "sourceType".
+                "source": definition.get("sourceType") or definition.get("source", ""),
+                "target": target.get("name", ""),
+                "target_subgraph": target.get("subgraph", subgraph),
+            }
+            self.add_relationship(relationship)
+
+    def merge(self, other):
+        # Adds the objects of `other`, as if its documents had been indexed
+        # after this index's.
+        self.kinds.update(other.kinds)
+        self.models.update(other.models)
+        self.commands.update(other.commands)
+        self.object_types.update(other.object_types)
+        for model, perm in other.permissions.items():
+            mine = self.permissions.setdefault(model, dict(perm, roles=[], relaxed_roles=[]))
+            mine["roles"].extend(perm["roles"])
+            mine["relaxed_roles"].extend(perm["relaxed_roles"])
+        for command, perm in other.command_permissions.items():
+            mine = self.command_permissions.setdefault(command, dict(perm, roles=[]))
+            mine["roles"].extend(perm["roles"])
+        if other.no_auth_role is not None:
+            self.no_auth_role = other.no_auth_role
+        for relationship in other.relationships:
+            self.add_relationship(relationship)
+        return self
+
+    def add_relationship(self, relationship):
+        self.relationships.append(relationship)
+        self.relationships_by_source[relationship["source"]].append(relationship)
+        self.relationships_by_target[relationship["target"]].append(relationship)
+
+    def roles_per_model(self):
+        return {model: sorted(set(perm["roles"]) - {None}) for model, perm in self.permissions.items()}
+
+    def models_without_permissions(self):
+        return sorted(name for name in self.models if name not in self.permissions)
+
+    def relaxed_permissions(self):
+        return {model: perm["relaxed_roles"] for model, perm in self.permissions.items() if perm["relaxed_roles"]}
+
+    def relationship_fan_out(self):
+        return {source: len(relationships) for source, relationships in self.relationships_by_source.items()}
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "kinds": dict(self.kinds),
+            "models": list(self.models.values()),
+            "commands": list(self.commands.values()),
+            "object_types": list(self.object_types.values()),
+            "permissions": list(self.permissions.values()),
+            "command_permissions": list(self.command_permissions.values()),
+            "no_auth_role": self.no_auth_role,
+            "relationships": self.relationships,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported metadata index version: {data.get('version')!r}")
+        index = cls()
+        index.kinds.update(data["kinds"])
+        index.models = {model["name"]: model for model in data["models"]}
+        index.commands = {command["name"]: command for command in data["commands"]}
+        index.object_types = {object_type["name"]: object_type for object_type in data["object_types"]}
+        index.permissions = {perm["model"]: perm for perm in data["permissions"]}
+        index.command_permissions = {perm["command"]: perm for perm in data["command_permissions"]}
+        index.no_auth_role = data["no_auth_role"]
+        for relationship in data["relationships"]:
+            index.add_relationship(relationship)
+        return index
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            get_backend().dump_pretty(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path):
+        with open_buffer(path) as buffer:
+            return cls.from_dict(get_backend().loads(buffer))
+
+def build_index(data, index=None):
+    # Every dict carrying a string "kind" is a metadata object. Objects under
+    # a {"name": ..., "objects": [...]} subgraph entry are tagged with it.
+    # Metadata objects do not nest, so the walk stops at each one instead of
+    # descending into its definition.
+    index = index or MetadataIndex()
+    stack = [(data, None)]
+    while stack:
+        obj, subgraph = stack.pop()
+        if isinstance(obj, dict):
+            if isinstance(obj.get("kind"), str):
+                index.add(obj, subgraph)
+                continue
+            if isinstance(obj.get("objects"), list) and isinstance(obj.get("name"), str):
+                subgraph = obj["name"]
+            stack.extend((value, subgraph) for value in reversed(obj.values()) if isinstance(value, (dict, list)))
+        elif isinstance(obj, list):
+            stack.extend((item, subgraph) for item in reversed(obj) if isinstance(item, (dict, list)))
+    return index
+
+def index_metadata(*sources):
+    index = MetadataIndex()
+    for source in sources:
+        with open_buffer(source) as buffer:
+            data = get_backend().loads(buffer)
+        build_index(data, index)
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python metadata_index.py metadata.json index.json")
+    else:
+        index_metadata(sys.argv[1]).save(sys.argv[2])
+        print(f"Metadata index has been saved to {sys.argv[2]}")
@@ -0,0 +1,205 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# Opt-in stage instrumentation. Code marks its stages with
+# `with stage("parse"):`, which costs nothing unless a Profiler is active.
+# A started Profiler is active in the context (thread) that started it, so
+# concurrent sessions each profile only their own run; ANALYZER_PROFILE=1
+# (or "memory") activates one for every thread of the process.
+active = ContextVar("profiler", default=None)
+process = None
+
+# tracemalloc is process-wide: it runs while any memory profiler does, and
+# is stopped by the last one only if a profiler started it.
+tracing_lock = threading.Lock()
+tracing = 0
+tracing_started = False
+
+def start_tracing():
+    global tracing, tracing_started
+    with tracing_lock:
+        if tracing == 0:
+            tracing_started = not tracemalloc.is_tracing()
+            if tracing_started:
+                tracemalloc.start()
+        tracing += 1
+
+def stop_tracing():
+    global tracing
+    with tracing_lock:
+        tracing -= 1
+        if tracing == 0 and tracing_started:
+            tracemalloc.stop()
+
+class Profiler:
+    # Wall time, call count and (with memory=True) tracemalloc peak above
+    # the stage's starting allocation, per stage name. Stages may nest;
+    # an outer stage's time and peak include its inner stages. Each thread
+    # keeps its own stage stack; peaks of stages running in several threads
+    # at once overlap, as tracemalloc has a single peak per process.
+    def __init__(self, memory=False, cprofile_path=None, tracemalloc_path=None):
+        self.memory = memory or tracemalloc_path is not None
+        self.cprofile_path = cprofile_path
+        self.tracemalloc_path = tracemalloc_path
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.profile = None
+        self.started = None
+        self.total = None
+        self.token = None
+
+    @property
+    def stack(self):
+        return self.local.__dict__.setdefault("stack", [])
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.memory:
+            start_tracing()
+        if self.cprofile_path:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.token = active.set(self)
+        return self
+
+    def stop(self):
+        active.reset(self.token)
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile_path)
+        if self.memory:
+            if self.tracemalloc_path:
+                tracemalloc.take_snapshot().dump(self.tracemalloc_path)
+            stop_tracing()
+        self.total = time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, name):
+        # Stack entries are [start time, starting memory, highest peak seen].
+        # Entering a stage resets the tracemalloc peak, so the peak reached
+        # so far is handed to the enclosing stage first.
+        stack = self.stack
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][2] = max(stack[-1][2], peak)
+            tracemalloc.reset_peak()
+            entry = [time.perf_counter(), current, current]
+        else:
+            entry = [time.perf_counter(), 0, 0]
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            stack.pop()
+            seconds = time.perf_counter() - entry[0]
+            if self.memory:
+                peak = max(entry[2], tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1][2] = max(stack[-1][2], peak)
+                tracemalloc.reset_peak()
+            with self.lock:
+                stats = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_bytes": 0})
+                stats["seconds"] += seconds
+                stats["calls"] += 1
+                if self.memory:
+                    stats["peak_bytes"] = max(stats["peak_bytes"], peak - entry[1])
+
+    def report(self):
+        with self.lock:
+            stages = [{"stage": name, **stats} for name, stats in self.stages.items()]
+        report = {
+            "total_seconds": self.total if self.total is not None else time.perf_counter() - self.started,
+            "stages": stages,
+        }
+        if not self.memory:
+            for stats in report["stages"]:
+                del stats["peak_bytes"]
+        if self.cprofile_path:
+            report["cprofile"] = self.cprofile_path
+        if self.tracemalloc_path:
+            report["tracemalloc"] = self.tracemalloc_path
+        return report
+
+def stage(name):
+    profiler = active.get() or process
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+@contextmanager
+def profiled(memory=False, cprofile_path=None, tracemalloc_path=None):
+    profiler = Profiler(memory, cprofile_path, tracemalloc_path).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+def profile_options(args):
+    # Pulls --profile=report.json, --cprofile=out.prof, --tracemalloc=out.snap
+    # and --memory out of a CLI argument list. Returns (remaining args,
+    # Profiler keyword arguments or None, report path or None).
+    options = {}
+    report = None
+    rest = []
+    for arg in args:
+        name, _, value = arg.partition("=")
+        if name == "--profile":
+            report = value or "-"
+        elif name == "--cprofile" and value:
+            options["cprofile_path"] = value
+        elif name == "--tracemalloc" and value:
+            options["tracemalloc_path"] = value
+        elif arg == "--memory":
+            options["memory"] = True
+        else:
+            rest.append(arg)
+    enabled = report is not None or bool(options)
+    return rest, options if enabled else None, report
+
+def write_report(profiler, path):
+    text = json.dumps(profiler.report(), indent=2)
+    if path in (None, "-"):
+        print(text)
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+if os.environ.get("ANALYZER_PROFILE"):
+    # Started but never made active in a context, so every thread sees it;
+    # it runs until the process exits.
+    process = Profiler(memory=os.environ["ANALYZER_PROFILE"] == "memory")
+    process.started = time.perf_counter()
+    if process.memory:
+        start_tracing()
+
+if __name__ == "__main__":
+    # Profiles the full analysis of metadata files: analysis, index and
+    # dashboard summary.
+    args, options, report = profile_options(sys.argv[1:])
+    streaming = "--streaming" in args
+    paths = [arg for arg in args if arg != "--streaming"]
+    if not paths:
+        print("Usage: python profiling.py metadata.json ... [--streaming] [--memory] "
+              "[--profile=report.json] [--cprofile=out.prof] [--tracemalloc=out.snap]")
+    else:
+        # The instrumented modules import this file as `profiling`, not
+        # __main__, so the profiler has to be started through that module
+        import profiling
+        from analysis import analyze_metadata
+        from metadata_index import index_metadata
+        from summary import build_summary
+        with profiling.profiled(**{"memory": True, **(options or {})}) as profiler:
+            for path in paths:
+                results = analyze_metadata(path, streaming=streaming)
+                with profiling.stage("index"):
+                    index = index_metadata(path)
+                with profiling.stage("summary"):
+                    build_summary(index, results)
+        profiling.write_report(profiler, report)
@@ -0,0 +1,55 @@
+import contextlib
+import io
+import os
+import sys
+
+import pandas as pd
+
+from analysis import analyze_metadata
+from chart_frames import graph_frame
+from metadata_index import index_metadata
+from relationship_graph import build_graph
+from summary import build_summary
+from synthetic import write_escaped, write_metadata
+from tool import format_json, format_json_chunked
+
+# The harness (regression_suite.py) is shared with the dashboards and lives
+# at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import regression_suite
+
+# Benchmark regression cases of the metadata analyzer, timed by
+# regression_suite.py against regression_baseline.json.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression_baseline.json")
+
+def quiet(func, *args):
+    # tool.py reports progress on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+def cases(tmp, scale):
+    # Ten subgraphs of 100 models per scale step, with four role
+    # permissions, up to five relationships and three levels of row filter
+    # nesting per model.
+    size = {"subgraphs": 10 * scale, "models": 100, "roles": 4, "relationships": 5, "depth": 3, "seed": 0}
+    path = os.path.join(tmp, "metadata.json")
+    escaped = os.path.join(tmp, "escaped.txt")
+    output = os.path.join(tmp, "formatted.json")
+    write_metadata(path, **size)
+    write_escaped(escaped, **size)
+    results = analyze_metadata(path)
+    index = index_metadata(path)
+    graph = build_graph(index)
+    return {
+        "analyze_metadata": lambda: analyze_metadata(path),
+        "analyze_metadata streaming": lambda: analyze_metadata(path, streaming=True),
+        "format_json": lambda: quiet(format_json, escaped, output),
+        "format_json chunked": lambda: quiet(format_json_chunked, escaped, output),
+        "create_charts DataFrames": lambda: (graph_frame(graph), pd.DataFrame(results["non_null_descriptions"])),
+        "index_metadata": lambda: index_metadata(path),
+        "build_summary": lambda: build_summary(index, results),
+        "build_graph": lambda: build_graph(index),
+    }
+
+if __name__ == "__main__":
+    regression_suite.main("Metadata analyzer benchmarks", cases, BASELINE, sys.argv[1:])
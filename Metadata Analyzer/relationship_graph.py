@@ -0,0 +1,161 @@
+import heapq
+import sys
+from array import array
+from collections import Counter
+
+from metadata_index import index_metadata
+
+# Bumped whenever the layout below changes, so cached graphs of an older
+# layout are rebuilt rather than loaded.
+GRAPH_VERSION = 1
+
+class RelationshipGraph:
+    # Relationships between models as a directed multigraph in compressed
+    # sparse row form. Models are numbered 0..n-1 (`names`, `subgraphs`);
+    # the targets of model i are targets[offsets[i]:offsets[i + 1]] and its
+    # sources are sources[reverse_offsets[i]:reverse_offsets[i + 1]].
+    # Degrees and cross-subgraph join counts are computed once, when the
+    # graph is built.
+    def __init__(self, names, subgraphs, offsets, targets, reverse_offsets, sources):
+        self.names = names
+        self.subgraphs = subgraphs
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.reverse_offsets = reverse_offsets
+        self.sources = sources
+        self.out_degrees = array("l", (offsets[i + 1] - offsets[i] for i in range(len(names))))
+        self.in_degrees = array("l", (reverse_offsets[i + 1] - reverse_offsets[i] for i in range(len(names))))
+        self.cross_subgraph = Counter()
+        for node in range(len(names)):
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                if subgraphs[node] != subgraphs[target]:
+                    self.cross_subgraph[subgraphs[node], subgraphs[target]] += 1
+
+    def __getstate__(self):
+        # The name lookup is rebuilt on load rather than cached.
+        state = dict(self.__dict__)
+        del state["ids"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_edges(cls, edges):
+        # `edges` are (source, source subgraph, target, target subgraph)
+        # tuples; a model's subgraph is the first one it is seen with.
+        ids = {}
+        subgraphs = []
+        pairs = array("l")
+        for source, source_subgraph, target, target_subgraph in edges:
+            for name, subgraph in ((source, source_subgraph), (target, target_subgraph)):
+                if name not in ids:
+                    ids[name] = len(subgraphs)
+                    subgraphs.append(subgraph)
+                pairs.append(ids[name])
+        size = len(subgraphs)
+        offsets = csr_offsets(pairs[0::2], size)
+        reverse_offsets = csr_offsets(pairs[1::2], size)
+        targets = array("l", bytes(len(pairs) // 2 * pairs.itemsize))
+        sources = array("l", targets)
+        filled = array("l", offsets[:-1])
+        reverse_filled = array("l", reverse_offsets[:-1])
+        for i in range(0, len(pairs), 2):
+            source, target = pairs[i], pairs[i + 1]
+            targets[filled[source]] = target
+            filled[source] += 1
+            sources[reverse_filled[target]] = source
+            reverse_filled[target] += 1
+        return cls(list(ids), subgraphs, offsets, targets, reverse_offsets, sources)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def edges(self):
+        return len(self.targets)
+
+    def degree(self, name):
+        node = self.ids.get(name)
+        return 0 if node is None else self.out_degrees[node] + self.in_degrees[node]
+
+    def fan_out(self, name):
+        # Distinct models `name` has relationships to.
+        node = self.ids.get(name)
+        return 0 if node is None else len(set(self.targets[self.offsets[node]:self.offsets[node + 1]]))
+
+    def top(self, limit=10):
+        # (model, outgoing, incoming) for the `limit` models with the most
+        # relationships either way, most first.
+        nodes = heapq.nlargest(limit, range(len(self.names)),
+                               key=lambda node: self.out_degrees[node] + self.in_degrees[node])
+        return [(self.names[node], self.out_degrees[node], self.in_degrees[node]) for node in nodes]
+
+    def reachable(self, name, hops=None):
+        # Models reachable from `name` by following at most `hops`
+        # relationships (any number if None), `name` itself excluded.
+        node = self.ids.get(name)
+        if node is None:
+            return []
+        seen = bytearray(len(self.names))
+        seen[node] = 1
+        frontier = [node]
+        found = []
+        depth = 0
+        while frontier and (hops is None or depth < hops):
+            following = []
+            for current in frontier:
+                for target in self.targets[self.offsets[current]:self.offsets[current + 1]]:
+                    if not seen[target]:
+                        seen[target] = 1
+                        following.append(target)
+            found.extend(following)
+            frontier = following
+            depth += 1
+        return [self.names[node] for node in found]
+
+    def cross_subgraph_joins(self):
+        # {(source subgraph, target subgraph): relationships} between
+        # different subgraphs.
+        return dict(self.cross_subgraph)
+
+def csr_offsets(nodes, size):
+    offsets = array("l", bytes((size + 1) * array("l").itemsize))
+    for node in nodes:
+        offsets[node + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    return offsets
+
+def build_graph(index):
+    # Relationships name their source by object type; it is resolved to the
+    # model over that type where there is one.
+    models_by_type = {}
+    for name, model in index.models.items():
+        models_by_type.setdefault(model["object_type"], name)
+
+    def edges():
+        for relationship in index.relationships:
+            source = models_by_type.get(relationship["source"], relationship["source"])
+            target = relationship["target"]
+            source_subgraph = index.models[source]["subgraph"] if source in index.models else relationship["subgraph"]
+            target_subgraph = (index.models[target]["subgraph"] if target in index.models
+                               else relationship["target_subgraph"])
+            yield source, source_subgraph, target, target_subgraph
+
+    return RelationshipGraph.from_edges(edges())
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python relationship_graph.py metadata.json [model [hops]]")
+    else:
+        graph = build_graph(index_metadata(sys.argv[1]))
+        print(f"{len(graph)} models, {graph.edges} relationships, "
+              f"{sum(graph.cross_subgraph.values())} across subgraphs")
+        for name, outgoing, incoming in graph.top():
+            print(f"  {name}: {outgoing} outgoing, {incoming} incoming")
+        if len(sys.argv) > 2:
+            hops = int(sys.argv[3]) if len(sys.argv) > 3 else None
+            print(f"Reachable from {sys.argv[2]}: {', '.join(graph.reachable(sys.argv[2], hops)) or 'none'}")
@@ -0,0 +1,347 @@
+import codecs
+import json
+import re
+from collections import deque
+from json.decoder import scanstring
+
+from analysis import PartialResult, analyze_permissions, analyze_relationship
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER = re.compile(r'(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?')
+NUMBER_CHARS = re.compile(r'[-+0-9.eE]*')
+LITERALS = {
+    "t": ("true", "boolean", True),
+    "f": ("false", "boolean", False),
+    "n": ("null", "null", None),
+}
+
+# Only the values under these keys are ever needed as objects: descriptions are
+# reported as-is and "definition" is what the permission/relationship checks read.
+MATERIALIZED_KEYS = ("description", "definition")
+ANALYZED_KINDS = ("ModelPermissions", "Relationship")
+
+def iter_events(fp, chunk_size=CHUNK_SIZE):
+    # (event, value) pairs in ijson's basic_parse format. ijson is used when
+    # installed, otherwise the pure-Python parser below.
+    if ijson is not None:
+        return ijson.basic_parse(fp, buf_size=chunk_size, use_float=True)
+    return parse_events(fp, chunk_size)
+
+def parse_events(fp, chunk_size=CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def read_text(size):
+        while True:
+            chunk = fp.read(size)
+            text = decoder.decode(chunk, final=not chunk)
+            if text or not chunk:
+                return text
+
+    return parse_text(read_text, chunk_size)
+
+def parse_text(read, chunk_size=CHUNK_SIZE, whole_values=False):
+    # Same events as parse_events, from a `read(size)` callable returning
+    # successive pieces of JSON text ('' at the end). With `whole_values`,
+    # an object or array that fits in the buffered text is decoded at once
+    # by the C scanner and yielded as a single ("value", value) event; one
+    # larger than a chunk is still taken apart event by event.
+    decode = json.JSONDecoder().raw_decode if whole_values else None
+    buf = ""
+    pos = 0
+    eof = False
+    containers = []
+    expect_key = False
+    started = False
+
+    def refill():
+        # Read at least as much as is already buffered so a token that keeps
+        # straddling chunk boundaries (a very long string) is re-scanned a
+        # logarithmic number of times rather than once per chunk.
+        nonlocal buf, pos, eof
+        chunk = read(max(chunk_size, len(buf) - pos))
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        pos = WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                break
+            refill()
+            continue
+
+        started = True
+        char = buf[pos]
+        if decode is not None and (char == "{" or char == "["):
+            try:
+                value, end = decode(buf, pos)
+            except json.JSONDecodeError:
+                # Maybe only cut off by the end of the buffer; more text is
+                # read once, after which the value is taken apart instead
+                if not eof and len(buf) - pos < chunk_size:
+                    refill()
+                    continue
+            else:
+                pos = end
+                expect_key = False
+                yield "value", value
+                continue
+        if char == '"':
+            try:
+                value, end = scanstring(buf, pos + 1)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            pos = end
+            if expect_key:
+                expect_key = False
+                yield "map_key", value
+            else:
+                yield "string", value
+        elif char == "{":
+            pos += 1
+            containers.append(True)
+            expect_key = True
+            yield "start_map", None
+        elif char == "}":
+            pos += 1
+            containers.pop()
+            expect_key = False
+            yield "end_map", None
+        elif char == "[":
+            pos += 1
+            containers.append(False)
+            yield "start_array", None
+        elif char == "]":
+            pos += 1
+            containers.pop()
+            yield "end_array", None
+        elif char == ",":
+            pos += 1
+            expect_key = bool(containers) and containers[-1]
+        elif char == ":":
+            pos += 1
+        elif char in LITERALS:
+            word, event, value = LITERALS[char]
+            if len(buf) - pos < len(word) and not eof:
+                refill()
+                continue
+            if not buf.startswith(word, pos):
+                raise json.JSONDecodeError("Expecting value", buf, pos)
+            pos += len(word)
+            yield event, value
+        else:
+            if NUMBER_CHARS.match(buf, pos).end() == len(buf) and not eof:
+                refill()
+                continue
+            match = NUMBER.match(buf, pos)
+            if match is None:
+                raise json.JSONDecodeError("Expecting value", buf, pos)
+            integer, frac, exp = match.groups()
+            pos = match.end()
+            if frac or exp:
+                yield "number", float(match.group())
+            else:
+                yield "number", int(integer)
+
+    if containers or not started:
+        raise json.JSONDecodeError("Unexpected end of document", buf, pos)
+
+class Frame:
+    __slots__ = ("is_map", "path", "obj", "key", "index", "collecting",
+                 "kind", "definition", "has_definition", "analyzed", "slot", "kind_slot", "name", "objects")
+
+    def __init__(self, is_map, path, obj):
+        self.is_map = is_map
+        self.path = path
+        self.obj = obj
+        self.key = None
+        self.index = 0
+        self.collecting = False
+        self.kind = None
+        self.definition = None
+        self.has_definition = False
+        self.analyzed = False
+        self.slot = None
+        self.kind_slot = None
+        self.name = None
+        self.objects = False
+
+def child_path(frame, normalized=False):
+    if frame.is_map:
+        return f"{frame.path}.{frame.key}" if frame.path else frame.key
+    if normalized:
+        return f"{frame.path}[*]"
+    return f"{frame.path}[{frame.index}]"
+
+def collect_events(events, exact_paths=False, index=None):
+    # With `index` (a MetadataIndex), metadata objects are also indexed into
+    # it as they end.
+    partial = PartialResult(exact_paths)
+    descriptions = partial.descriptions
+    relaxed_permissions = partial.relaxed_permissions
+    relationships = partial.relationships
+    normalized = descriptions.normalized
+
+    # Results are recorded in document order, as the tree walk records
+    # them. A description whose value is a container, or a kind seen before
+    # its object's definition, is only complete later, so it reserves a
+    # slot in `queue` and everything recorded after it waits behind it.
+    queue = deque()
+
+    def record(func, *args):
+        if queue:
+            queue.append([True, func, args])
+        else:
+            func(*args)
+
+    def reserve():
+        slot = [False, None, None]
+        queue.append(slot)
+        return slot
+
+    def fill(slot, func, *args):
+        slot[:] = True, func, args
+        while queue and queue[0][0]:
+            _, func, args = queue.popleft()
+            func(*args)
+
+    def analyze_kind(frame):
+        frame.analyzed = True
+        obj = {"definition": frame.definition} if frame.has_definition else {}
+        if frame.kind == "ModelPermissions":
+            analysis = (analyze_permissions, obj, relaxed_permissions)
+        else:
+            analysis = (analyze_relationship, obj, relationships)
+        if frame.kind_slot is not None:
+            fill(frame.kind_slot, *analysis)
+        else:
+            record(*analysis)
+
+    def index_object(frame):
+        # Like build_index, objects inside another object are skipped and
+        # objects are tagged with the innermost enclosing {"name": ...,
+        # "objects": [...]} entry. Without the whole document these are
+        # judged by the keys seen so far, so an entry counts if its "name"
+        # comes before the object does, as in metadata exports.
+        subgraph = None
+        for position in range(len(stack) - 1, -1, -1):
+            ancestor = stack[position]
+            if isinstance(ancestor.kind, str):
+                return
+            child = stack[position + 1] if position + 1 < len(stack) else frame
+            if subgraph is None and isinstance(ancestor.name, str) and (
+                    ancestor.objects or (ancestor.key == "objects" and not child.is_map)):
+                subgraph = ancestor.name
+        index.add({"kind": frame.kind, "definition": frame.definition} if frame.has_definition
+                  else {"kind": frame.kind}, subgraph)
+
+    stack = []
+    building = 0
+    for event, value in events:
+        if event == "map_key":
+            frame = stack[-1]
+            frame.key = value
+            if not building and value in MATERIALIZED_KEYS:
+                frame.collecting = True
+                building += 1
+            continue
+
+        frame = None
+        if event == "start_map" or event == "start_array":
+            is_map = event == "start_map"
+            obj = ({} if is_map else []) if building else None
+            path = child_path(stack[-1], normalized) if stack else ''
+            frame = Frame(is_map, path, obj)
+            if stack and stack[-1].is_map and stack[-1].key == "description":
+                frame.slot = reserve()
+            stack.append(frame)
+            continue
+
+        if event == "end_map" or event == "end_array":
+            frame = stack.pop()
+            if frame.kind in ANALYZED_KINDS and not frame.analyzed:
+                analyze_kind(frame)
+            # Metadata objects are never inside materialized values
+            if index is not None and frame.obj is None and isinstance(frame.kind, str):
+                index_object(frame)
+            value = frame.obj
+
+        # `value` is now a complete scalar or (materialized) container.
+        if not stack:
+            continue
+        parent = stack[-1]
+        if not parent.is_map:
+            if parent.obj is not None:
+                parent.obj.append(value)
+            parent.index += 1
+            continue
+
+        key = parent.key
+        if parent.obj is not None:
+            parent.obj[key] = value
+        if parent.collecting:
+            parent.collecting = False
+            building -= 1
+
+        if key == "description":
+            indices = [frame.index for frame in stack if not frame.is_map] if normalized else None
+            if frame is not None and frame.slot is not None:
+                fill(frame.slot, descriptions.add, child_path(parent), value, indices)
+            else:
+                record(descriptions.add, child_path(parent), value, indices)
+        elif key == "definition":
+            parent.definition = value
+            parent.has_definition = True
+        elif key == "kind":
+            parent.kind = value
+            # Metadata exports often list "definition" before "kind", so the
+            # object is complete enough to analyze right away; otherwise its
+            # place in the results is held until the object ends.
+            if value in ANALYZED_KINDS:
+                if parent.has_definition:
+                    analyze_kind(parent)
+                elif parent.kind_slot is None:
+                    parent.kind_slot = reserve()
+        elif key == "name":
+            parent.name = value
+        elif key == "objects":
+            parent.objects = frame is not None and not frame.is_map
+
+    # Only reachable with unfilled slots for malformed (truncated) input
+    for ready, func, args in queue:
+        if ready:
+            func(*args)
+    return partial
+
+class BufferReader:
+    # Binary file interface over a bytes-like object (upload buffer, mmap)
+    # that only ever copies one chunk at a time.
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.pos = 0
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(self.pos + size, len(self.view))
+        chunk = bytes(self.view[self.pos:end])
+        self.pos = end
+        return chunk
+
+    def close(self):
+        self.view.release()
+
+def collect_buffer(buffer, chunk_size=CHUNK_SIZE, exact_paths=False, index=None):
+    reader = BufferReader(buffer)
+    try:
+        return collect_events(iter_events(reader, chunk_size), exact_paths, index)
+    finally:
+        reader.close()
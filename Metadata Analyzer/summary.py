@@ -0,0 +1,97 @@
+import sys
+import time
+
+from analysis import collect, open_buffer
+from json_backend import get_backend
+from metadata_index import MetadataIndex, build_index
+
+# Bumped whenever the layout below changes; the dashboard's data_provider
+# refuses summaries of another version.
+SUMMARY_VERSION = 1
+# Catalog rows in the column order of the dashboard's models table.
+MODEL_COLUMNS = ("subgraph", "model", "kind", "protected", "documented", "public", "introspected",
+                 "has_relationships", "deprecated")
+
+def ratio(part, whole):
+    return part / whole if whole else None
+
+def build_summary(index, results=None):
+    # Dashboard catalog derived from a metadata index: one row per model and
+    # command, (role, model) grants, and the headline metrics computed from
+    # them. `results` (from analyze_metadata) adds the description stats.
+    related = set(index.relationships_by_target)
+    related.update(name for name, model in index.models.items()
+                   if model["object_type"] in index.relationships_by_source)
+    grants = {}
+    for model, perm in index.permissions.items():
+        grants[model] = sorted(set(perm["roles"]) - {None})
+    for command, perm in index.command_permissions.items():
+        grants.setdefault(command, sorted(set(perm["roles"]) - {None}))
+
+    models = []
+    for kind, entries in (("Model", index.models), ("Command", index.commands)):
+        for name, entry in entries.items():
+            roles = grants.get(name, [])
+            models.append({
+                "subgraph": entry["subgraph"],
+                "model": name,
+                "kind": kind,
+                "protected": int(bool(roles)),
+                "documented": int(entry["described"]),
+                "public": int(index.no_auth_role is not None and index.no_auth_role in roles),
+                "introspected": int(entry["connector"] is not None),
+                "has_relationships": int(name in related),
+                "deprecated": int(entry["deprecated"]),
+            })
+    roles = sorted((role, model) for model, model_roles in grants.items() for role in model_roles)
+
+    role_models = {}
+    for role, _ in roles:
+        role_models[role] = role_models.get(role, 0) + 1
+    catalog = [model for model in models if model["kind"] == "Model"]
+    metrics = {
+        "models": len(catalog),
+        "commands": len(models) - len(catalog),
+        "protected_ratio": ratio(sum(model["protected"] for model in catalog), len(catalog)),
+        "documented_ratio": ratio(sum(model["documented"] for model in catalog), len(catalog)),
+        "public_models": sum(model["public"] for model in catalog),
+        "introspected_ratio": ratio(sum(model["introspected"] for model in catalog), len(catalog)),
+        "relationship_ratio": ratio(sum(model["has_relationships"] for model in catalog), len(catalog)),
+        "roles": len(role_models),
+        "roles_per_model": ratio(len(roles), len(models)),
+        "role_with_most_models": min(role_models, key=lambda role: (-role_models[role], role)) if role_models else None,
+        "relaxed_permissions": len(index.relaxed_permissions()),
+    }
+    if results is not None:
+        metrics["description_fields"] = results["description_fields"]
+        metrics["null_description_percentage"] = results["null_description_percentage"]
+    return {
+        "version": SUMMARY_VERSION,
+        "generated_at": int(time.time()),
+        "models": models,
+        "roles": [list(grant) for grant in roles],
+        "metrics": metrics,
+    }
+
+def summarize_metadata(*sources):
+    # Each document is parsed once and both walks run over the parsed data.
+    index = MetadataIndex()
+    merged = None
+    for source in sources:
+        with open_buffer(source) as buffer:
+            data = get_backend().loads(buffer)
+        build_index(data, index)
+        partial = collect(data)
+        merged = partial if merged is None else merged.merge(partial)
+    return build_summary(index, merged.results() if merged is not None else None)
+
+def save_summary(summary, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        get_backend().dump_pretty(summary, file)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python summary.py summary.json metadata.json [metadata.json ...]")
+    else:
+        save_summary(summarize_metadata(*sys.argv[2:]), sys.argv[1])
+        print(f"Metadata summary has been saved to {sys.argv[1]}")
@@ -0,0 +1,145 @@
+import json
+import random
+import sys
+
+def predicate(field, depth):
+    # Row filter nested `depth` levels of _and/_or deep.
+    expression = {"fieldComparison": {"field": field, "operator": "_eq",
+                                      "value": {"sessionVariable": "x-hasura-user-id"}}}
+    for level in range(depth):
+        expression = {"and" if level % 2 else "or": [
+            expression,
+            {"fieldComparison": {"field": f"field_{level}", "operator": "_is_null", "value": {"literal": False}}},
+        ]}
+    return expression
+
+def generate_metadata(subgraphs=4, models=25, fields=8, seed=0, start=0, roles=2, relationships=3, depth=0):
+    # Same seed and sizes, same document. `roles` is the number of role
+    # permissions per model (admin and user first), `relationships` the most
+    # relationships per model and `depth` the nesting of row filters.
+    rng = random.Random(seed)
+    data = {"subgraphs": []}
+    for s in range(start, start + subgraphs):
+        subgraph = f"subgraph_{s}"
+        objects = []
+        for m in range(models):
+            model = f"Model_{s}_{m}"
+            objects.append({
+                "definition": {
+                    "description": rng.choice([None, "", f"The {model} object type"]),
+                    "fields": [
+                        {
+                            "description": rng.choice([None, f"Field {f} of {model}"]),
+                            "name": f"field_{f}",
+                            "type": rng.choice(["String!", "Int", "Uuid!", "Timestamptz"]),
+                        }
+                        for f in range(fields)
+                    ],
+                    "name": model,
+                },
+                "kind": "ObjectType",
+                "version": "v1",
+            })
+            objects.append({
+                "definition": {
+                    "description": rng.choice([None, f"All {model} rows"]),
+                    "name": model,
+                    "objectType": model,
+                    "source": {"collection": model.lower(), "dataConnectorName": "pg"},
+                },
+                "kind": "Model",
+                "version": "v1",
+            })
+            permissions = []
+            for r in range(roles):
+                role = ["admin", "user"][r] if r < 2 else f"role_{r}"
+                row_filter = None if r == 0 else rng.choice([None, predicate("id", depth)])
+                permissions.append({"role": role, "select": {"filter": row_filter}})
+            objects.append({
+                "definition": {
+                    "modelName": model,
+                    "permissions": permissions,
+                },
+                "kind": "ModelPermissions",
+                "version": "v1",
+            })
+            for _ in range(rng.randint(0, relationships)):
+                target = f"Model_{rng.randrange(start, start + subgraphs)}_{rng.randrange(models)}"
+                objects.append({
+                    "definition": {
+                        "mapping": [{"source": {"fieldPath": [{"fieldName": "id"}]},
+                                     "target": {"modelField": [{"fieldName": "id"}]}}],
+                        "name": target.lower(),
+                        "sourceType": model,
+                        "target": {"model": {"name": target, "relationshipType": "Object",
+                                             "subgraph": target.rsplit("_", 1)[0].replace("Model", "subgraph")}},
+                    },
+                    "kind": "Relationship",
+                    "version": "v1",
+                })
+        data["subgraphs"].append({"name": subgraph, "objects": objects})
+    return data
+
+def generate_nested(depth=50, width=5, seed=0):
+    # Irregular deep/wide documents for exercising traversal edge cases:
+    # descriptions at every level, kinds buried in lists, empty keys.
+    rng = random.Random(seed)
+
+    def leaf(level):
+        return rng.choice([None, "", 0, level, f"text {level}", [], {}, {"description": None}])
+
+    def node(level, spine):
+        if rng.random() < 0.3:
+            items = [leaf(level) for _ in range(width)]
+            if spine:
+                items.insert(rng.randrange(width), node(level + 1, level + 1 < depth))
+            return items
+        obj = {"description": rng.choice([None, "", f"level {level}", {"text": level}, ["a"]])}
+        for i in range(width):
+            obj[rng.choice(["", f"k{i}", "definition"])] = leaf(level)
+        if rng.random() < 0.2:
+            obj["kind"] = "ModelPermissions"
+            obj["definition"] = {"modelName": f"M{level}", "permissions": [{"select": {"filter": None}}]}
+        elif rng.random() < 0.2:
+            obj["kind"] = "Relationship"
+            obj["definition"] = {"sourceType": f"M{level}", "target": {"model": {"name": f"M{level + 1}"}}}
+        if spine:
+            obj[f"child{level}"] = node(level + 1, level + 1 < depth)
+        return obj
+
+    return node(0, depth > 0)
+
+def kind_first(data):
+    # Copy of `data` with "kind" moved to the front of every object, the
+    # key order of hand-written hml files.
+    if isinstance(data, dict):
+        return {key: kind_first(value) for key, value in sorted(data.items(), key=lambda item: item[0] != "kind")}
+    if isinstance(data, list):
+        return [kind_first(value) for value in data]
+    return data
+
+def write_metadata(path, **kwargs):
+    with open(path, 'w') as file:
+        json.dump(generate_metadata(**kwargs), file)
+
+def write_escaped(path, **kwargs):
+    # Escaped export in the shape tool.py expects: the metadata JSON
+    # serialized once more as a JSON string, without the outer quotes.
+    with open(path, 'w') as file:
+        file.write(json.dumps(json.dumps(generate_metadata(**kwargs)))[1:-1])
+
+def write_subgraphs(directory, subgraphs=40, **kwargs):
+    # One document per subgraph, the way a supergraph build ships them.
+    for s in range(subgraphs):
+        write_metadata(f"{directory}/subgraph_{s}.json", subgraphs=1, start=s, seed=s, **kwargs)
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    if not args:
+        print("Usage: python synthetic.py output_file [subgraphs] [models] [--roles=N] [--relationships=N] "
+              "[--depth=N] [--fields=N] [--seed=N] [--escaped]")
+    else:
+        sizes = dict(zip(["subgraphs", "models"], [int(arg) for arg in args[1:3]]))
+        sizes.update((name, int(value)) for name, value in options.items())
+        (write_escaped if "--escaped" in sys.argv else write_metadata)(args[0], **sizes)
@@ -1,27 +1,119 @@
 import json
+import os
 import sys
 
+from json_backend import get_backend
+from profiling import profile_options, profiled, stage, write_report
+from streaming import CHUNK_SIZE, parse_text
+
+# Longest escape sequence unicode_escape understands (\UXXXXXXXX), ignoring \N{...}
+MAX_ESCAPE = 10
+WRITE_BUFFER = 1 << 16
+LITERALS = {None: "null", True: "true", False: "false"}
+
 def unescape_json(escaped_json):
     # Remove the outer quotes and unescape the inner content
     return escaped_json.strip('"').encode().decode('unicode_escape')
 
-def format_json(input_file, output_file):
+def escape_start(data, end):
+    # Index where an escape sequence that may be cut off at `end` begins, or
+    # `end` itself. Escape bodies never contain a backslash, so only the last
+    # backslash run matters: an odd-length run leaves its final backslash
+    # unpaired, starting an escape.
+    i = data.rfind(b"\\", max(0, end - MAX_ESCAPE), end)
+    if i < 0:
+        return end
+    j = i
+    while j > 0 and data[j - 1] == 0x5C:
+        j -= 1
+    return i if (i - j) % 2 == 0 else end
+
+def unescape_chunks(file, chunk_size=CHUNK_SIZE):
+    # Incremental version of unescape_json over a binary file: escapes that
+    # straddle a chunk boundary and trailing quotes (which are only stripped
+    # at the very end) are carried into the next chunk.
+    carry = b""
+    at_start = True
+    while True:
+        chunk = file.read(chunk_size)
+        data = carry + chunk
+        if at_start:
+            data = data.lstrip(b'"')
+            at_start = not data
+        if not chunk:
+            yield data.rstrip(b'"').decode('unicode_escape')
+            return
+        end = escape_start(data, len(data.rstrip(b'"')))
+        carry = data[end:]
+        yield data[:end].decode('unicode_escape')
+
+def write_pretty(events, write, indent=2, dumps=None):
+    # Re-emits parse events exactly as json.dump(..., indent=indent) would
+    # lay out the same document, without building it. Whole values
+    # ("value" events) are laid out by `dumps` and shifted to their depth.
+    encode = json.encoder.encode_basestring_ascii
+    dumps = dumps or (lambda value: json.dumps(value, indent=indent))
+    counts = []
+    after_key = False
+    pending = []
+    size = 0
+    for event, value in events:
+        if event == "map_key":
+            piece = f"{',' if counts[-1] else ''}\n{' ' * (indent * len(counts))}{encode(value)}: "
+            counts[-1] += 1
+            after_key = True
+        elif event == "end_map" or event == "end_array":
+            closing = "}" if event == "end_map" else "]"
+            piece = f"\n{' ' * (indent * (len(counts) - 1))}{closing}" if counts[-1] else closing
+            counts.pop()
+        else:
+            if counts and not after_key:
+                piece = f"{',' if counts[-1] else ''}\n{' ' * (indent * len(counts))}"
+                counts[-1] += 1
+            else:
+                piece = ""
+            after_key = False
+            if event == "start_map" or event == "start_array":
+                piece += "{" if event == "start_map" else "["
+                counts.append(0)
+            elif event == "value":
+                piece += dumps(value).replace("\n", "\n" + " " * (indent * len(counts)))
+            elif event == "string":
+                piece += encode(value)
+            elif value is None or value is True or value is False:
+                piece += LITERALS[value]
+            elif isinstance(value, int):
+                piece += int.__repr__(value)
+            else:
+                piece += json.dumps(value)
+        pending.append(piece)
+        size += len(piece)
+        if size >= WRITE_BUFFER:
+            write("".join(pending))
+            pending.clear()
+            size = 0
+    write("".join(pending))
+
+def format_json(input_file, output_file, backend=None):
+    backend = get_backend(backend)
     try:
         # Read the entire content of the file
-        with open(input_file, 'r', encoding='utf-8') as file:
+        with stage("read"), open(input_file, 'r', encoding='utf-8') as file:
             content = file.read()
         
         print(f"File content length: {len(content)} characters")
         
         # Unescape the JSON content
-        unescaped_content = unescape_json(content)
+        with stage("unescape"):
+            unescaped_content = unescape_json(content)
         
         # Parse the unescaped JSON content
-        parsed_json = json.loads(unescaped_content)
+        with stage("parse"):
+            parsed_json = backend.loads(unescaped_content)
         
         # Write the formatted JSON to the output file
-        with open(output_file, 'w', encoding='utf-8') as file:
-            json.dump(parsed_json, file, indent=2)
+        with stage("write"), open(output_file, 'w', encoding='utf-8') as file:
+            backend.dump_pretty(parsed_json, file)
         
         print(f"Formatted JSON has been saved to {output_file}")
     except json.JSONDecodeError as e:
@@ -31,10 +123,55 @@ def format_json(input_file, output_file):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def format_json_chunked(input_file, output_file, chunk_size=CHUNK_SIZE, backend=None):
+    # Same output as format_json with memory bounded by the chunk size: the
+    # input is unescaped, parsed and re-serialized as a stream. Objects and
+    # arrays that fit in a chunk are parsed and laid out whole, by the C
+    # scanner and the JSON backend; only larger ones go event by event.
+    backend = get_backend(backend)
+    head = []
+    try:
+        print(f"File size: {os.path.getsize(input_file)} bytes")
+
+        with open(input_file, 'rb') as source, open(output_file, 'w', encoding='utf-8') as target:
+            pieces = unescape_chunks(source, chunk_size)
+
+            def read(size):
+                text = []
+                length = 0
+                for piece in pieces:
+                    if len(head) < 500:
+                        head.append(piece[:500])
+                    text.append(piece)
+                    length += len(piece)
+                    if length >= size:
+                        break
+                return "".join(text)
+
+            # Reading, unescaping, parsing and writing are interleaved
+            with stage("read + unescape + parse + write (chunked)"):
+                write_pretty(parse_text(read, chunk_size, whole_values=True), target.write,
+                             dumps=backend.dumps_pretty)
+
+        print(f"Formatted JSON has been saved to {output_file}")
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON: {e}")
+        print("First 500 characters of the unescaped content:")
+        print("".join(head)[:500])
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python script.py input_file output_file")
+    args, profile, report = profile_options(sys.argv[1:])
+    args = [arg for arg in args if arg != "--chunked"]
+    if len(args) != 2:
+        print("Usage: python script.py input_file output_file [--chunked] [--memory] "
+              "[--profile=report.json] [--cprofile=out.prof] [--tracemalloc=out.snap]")
     else:
-        input_file = sys.argv[1]
-        output_file = sys.argv[2]
-        format_json(input_file, output_file)
\ No newline at end of file
+        format_file = format_json_chunked if "--chunked" in sys.argv else format_json
+        if profile is None:
+            format_file(args[0], args[1])
+        else:
+            with profiled(**profile) as profiler:
+                format_file(args[0], args[1])
+            write_report(profiler, report)
\ No newline at end of file
@@ -0,0 +1,126 @@
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Benchmark regression harness shared by the metadata analyzer's and the
+# dashboards' regression.py, which only supply their cases: a function of
+# (temporary directory, scale) returning {case name: function}. Cases run on
+# seeded data, so runs at the same scale time the same work.
+#
+# Each round times every case once, as CPU time per call relative to a
+# fixed pure-Python loop timed in the same round, so a baseline recorded on
+# one machine still means something on another. Short cases are called
+# repeatedly within a round until the round takes at least MIN_SECONDS, so
+# no case is timed at the resolution of scheduler noise.
+#
+# A run keeps each case's median over `repeat` rounds ("relative") and its
+# best round ("best"). Shared machines have slow spells and occasional fast
+# ones, so the baseline is the median, and a run is judged by its best
+# round: a case fails only when even that is more than THRESHOLD slower
+# than the baseline and also more than NOISE_FLOOR seconds slower per call.
+THRESHOLD = 0.25
+NOISE_FLOOR = 0.001
+MIN_SECONDS = 0.1
+REPEAT = 7
+
+def calibration():
+    total = 0
+    for i in range(1_000_000):
+        total += i % 7
+    return total
+
+def timed(func, calls=1):
+    gc.collect()
+    start = time.process_time()
+    for _ in range(calls):
+        func()
+    return (time.process_time() - start) / calls
+
+def calls_for(func, min_seconds=MIN_SECONDS):
+    # Calls per round that take at least `min_seconds`, from a first call.
+    elapsed = timed(func)
+    return 1 if elapsed >= min_seconds else min(math.ceil(min_seconds / max(elapsed, 1e-6)), 10_000)
+
+def run_suite(cases, scale=1, repeat=REPEAT):
+    # Rounds interleave the cases, so a slow spell on a shared machine
+    # spoils one round of every case rather than every round of one. Each
+    # case is also kept relative to the calibration of its own round.
+    seconds = {"calibration": []}
+    relative = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        suite = cases(tmp, scale)
+        calls = {name: calls_for(func) for name, func in suite.items()}
+        for _ in range(repeat):
+            base = timed(calibration)
+            seconds["calibration"].append(base)
+            for name, func in suite.items():
+                elapsed = timed(func, calls[name])
+                seconds.setdefault(name, []).append(elapsed)
+                relative.setdefault(name, []).append(elapsed / base)
+    return {
+        "scale": scale,
+        "python": platform.python_version(),
+        "calibration_seconds": statistics.median(seconds.pop("calibration")),
+        "seconds": {name: statistics.median(values) for name, values in seconds.items()},
+        "relative": {name: statistics.median(values) for name, values in relative.items()},
+        "best": {name: min(values) for name, values in relative.items()},
+    }
+
+def compare(run, baseline):
+    # {case: change of the run's best round against the baseline's median,
+    # relative to calibration}, positive when slower. Cases missing from
+    # either side are left out.
+    return {name: value / baseline["relative"][name] - 1 for name, value in run["best"].items()
+            if baseline["relative"].get(name)}
+
+def report(run, baseline, threshold=THRESHOLD, noise_floor=NOISE_FLOOR):
+    # Prints the run against the baseline; returns the regressed cases. The
+    # slowdown in seconds puts both relative times on this run's
+    # calibration, so it is measured on this machine.
+    changes = compare(run, baseline) if baseline else {}
+    regressions = []
+    for name, seconds in run["seconds"].items():
+        line = f"  {name}: {seconds * 1000:.1f} ms"
+        if name in changes:
+            line += f" ({changes[name]:+.0%})"
+            slower = (run["best"][name] - baseline["relative"][name]) * run["calibration_seconds"]
+            if changes[name] > threshold and slower > noise_floor:
+                line += " REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+def main(title, cases, path, args):
+    # Command line of both regression.py scripts: --save records the
+    # baseline at `path`, otherwise the run is compared against it and
+    # exits 1 on regressions.
+    options = dict(arg[2:].partition("=")[::2] for arg in args if arg.startswith("--"))
+    path = options.get("baseline") or path
+    threshold = float(options.get("threshold") or THRESHOLD)
+    noise_floor = float(options.get("noise-floor") or NOISE_FLOOR)
+    baseline = None
+    if "save" not in options and os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            baseline = json.load(file)
+    scale = int(options.get("scale") or (baseline["scale"] if baseline else 1))
+    run = run_suite(cases, scale, int(options.get("repeat") or REPEAT))
+    if baseline is not None and baseline["scale"] != scale:
+        print(f"The baseline was recorded at --scale={baseline['scale']}; not comparing")
+        baseline = None
+    print(f"{title} (scale {scale}, calibration {run['calibration_seconds'] * 1000:.1f} ms):")
+    regressions = report(run, baseline, threshold, noise_floor)
+    if "save" in options:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(run, file, indent=2)
+        print(f"Baseline saved to {path}")
+    elif baseline is None:
+        print("No baseline to compare against; record one with --save")
+    elif regressions:
+        print(f"{len(regressions)} case(s) more than {threshold:.0%} slower than the baseline")
+        sys.exit(1)